@@ -1,7 +1,12 @@
 from random import randint
 from fastapi import Request, HTTPException, Depends
 from typing import Annotated
-from firebase_admin import auth
+from firebase import app as firebase_app
+from verifier import TokenVerifier
+from cachetools import TLRUCache, TTLCache
+from threading import Lock
+from os import getenv
+import hashlib, time
 from models.User import User
 from controllers.householdController import HouseholdController
 from controllers.userController import UserController
@@ -19,6 +24,69 @@ def get_test_user(request: Request) -> dict:
 
     return {'uid':auth_header.split(" ")[1], 'name':'Bob Testerman'}
 
+# AUTH_KEY_FILE points at a local {kid: pem} json file to verify against instead of Google's published keys.
+token_verifier = TokenVerifier(getenv('FIREBASE_PROJECT_ID') or firebase_app.project_id, key_file=getenv('AUTH_KEY_FILE'))
+
+# Firebase ID tokens live for an hour, so this only bounds how long a cached token can outlive a revocation we didn't hear about.
+TOKEN_CACHE_MAX_TTL = 300
+TOKEN_CACHE_SIZE = 1024
+
+def _token_expiration(key: str, claims: dict, now: float) -> float:
+    # never keep a token past its own exp claim
+    return min(claims.get('exp', now), now + TOKEN_CACHE_MAX_TTL)
+
+_token_cache = TLRUCache(maxsize=TOKEN_CACHE_SIZE, ttu=_token_expiration, timer=time.time)
+# uid -> time of revocation. Anything issued up to then is refused until it expires on its own.
+_revocations = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=60 * 60, timer=time.time)
+_token_lock = Lock()
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _is_revoked(claims: dict) -> bool:
+    revoked_at = _revocations.get(claims.get('uid'))
+    # iat is in whole seconds, so a token issued in the same second as the revocation is refused too
+    return revoked_at is not None and claims.get('iat', 0) <= revoked_at
+
+async def verify_token(token: str) -> dict:
+    """
+    Verifies an ID token, reusing the result of an earlier verification of the same token while it is still valid.
+    """
+    key = _token_key(token)
+    with _token_lock:
+        claims = _token_cache.get(key)
+    if claims is None:
+        claims = await token_verifier.verify(token)
+        with _token_lock:
+            _token_cache[key] = claims
+    with _token_lock:
+        revoked = _is_revoked(claims)
+    if revoked:
+        raise ValueError("token has been revoked")
+    return claims
+
+def revoke_token(token: str) -> None:
+    """
+    Drops a single token from the cache, so it will be verified again the next time it is seen.
+    """
+    with _token_lock:
+        _token_cache.pop(_token_key(token), None)
+
+def revoke_user_tokens(uid: str) -> None:
+    """
+    Refuses every token issued to the user up to now, cached or not.
+    Call this alongside firebase_admin's auth.revoke_refresh_tokens when signing a user out everywhere.
+    """
+    with _token_lock:
+        _revocations[uid] = time.time()
+        for key in [k for k, claims in _token_cache.items() if claims.get('uid') == uid]:
+            _token_cache.pop(key, None)
+
+def clear_token_cache() -> None:
+    with _token_lock:
+        _token_cache.clear()
+        _revocations.clear()
+
 async def get_user(request: Request) -> dict:
         auth_header = request.headers.get("Authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
@@ -26,22 +94,25 @@ async def get_user(request: Request) -> dict:
 
         # Remove the Bearer part and verify token with firebase
         try:
-            return auth.verify_id_token(auth_header.split(" ")[1])
+            return await verify_token(auth_header.split(" ")[1])
         except:
             raise HTTPException(status_code=401, detail="Invalid auth token")
 
-async def provide_household_id(request: Request, user_controller: Annotated[UserController, Depends()], user: Annotated[dict, Depends(get_user)], household_controller: Annotated[HouseholdController, Depends()]):
+def provide_household_id(request: Request, user_controller: Annotated[UserController, Depends()], user: Annotated[dict, Depends(get_user)], household_controller: Annotated[HouseholdController, Depends()]):
     if 'uid' in user:
         uid = user['uid']
         request.state.user_id = uid
-        user_info = user_controller.get_user(uid)
-        if user_info == None:
-            res = user_controller.create_user(User(full_name=user['name'],google_id=uid))
-            if res == None:
-                raise HTTPException(status_code=500, detail="Failed to create new user in database")
-        household_id = household_controller.find_household(uid)
+        # a user we already know the household of must already exist, so the database can be skipped entirely.
+        household_id = household_controller.find_cached_household(uid)
         if household_id is None:
-            household_id = household_controller.create_household(uid)
+            user_info = user_controller.get_user(uid)
+            if user_info == None:
+                res = user_controller.create_user(User(full_name=user['name'],google_id=uid))
+                if res == None:
+                    raise HTTPException(status_code=500, detail="Failed to create new user in database")
+            household_id = household_controller.find_household(uid, user_info.household_id if user_info else None)
+            if household_id is None:
+                household_id = household_controller.create_household(uid)
         request.state.household_id = household_id
     else:
         raise HTTPException(status_code=401, detail="User information incomplete")
\ No newline at end of file
@@ -0,0 +1,86 @@
+from collections import deque
+from threading import Lock
+from typing import Callable
+import time
+
+class CircuitOpen(Exception):
+    pass
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that keeps failing or answering slowly, so callers fall back straight away instead of waiting on it.
+    While closed it watches the calls of the last window seconds, and opens once at least min_calls were made and
+    failure_rate of them failed. A call slower than slow_after counts as failed even if it succeeded.
+    While open every call is refused. After open_for seconds it lets a single probe through:
+    if that succeeds it closes again, otherwise it stays open for another open_for.
+    """
+    def __init__(self, failure_rate: float = 0.5, slow_after: float = 5, min_calls: int = 5, window: float = 60,
+                 open_for: float = 30, timer: Callable[[], float] = time.monotonic):
+        self.failure_rate = failure_rate
+        self.slow_after = slow_after
+        self.min_calls = min_calls
+        self.window = window
+        self.open_for = open_for
+        self.timer = timer
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._calls: deque[tuple[float, bool]] = deque()
+        self._probing = False
+        self._lock = Lock()
+
+    def allow(self) -> None:
+        """
+        Raises CircuitOpen if a call shouldn't be made now. Every call that is allowed must be followed by record,
+        or by release if it was abandoned before it said anything about the upstream.
+        """
+        with self._lock:
+            if self.state == 'open' and self.timer() - self.opened_at >= self.open_for:
+                self.state = 'half_open'
+            if self.state == 'closed':
+                return
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+            raise CircuitOpen()
+
+    def record(self, ok: bool, latency: float) -> None:
+        ok = ok and latency < self.slow_after
+        now = self.timer()
+        with self._lock:
+            if self.state == 'half_open':
+                self._probing = False
+                if ok:
+                    self.state = 'closed'
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+            if self.state == 'open':
+                # a call that was already in flight when it opened
+                return
+            self._calls.append((now, ok))
+            while self._calls and self._calls[0][0] < now - self.window:
+                self._calls.popleft()
+            failures = sum(1 for _, call_ok in self._calls if not call_ok)
+            if len(self._calls) >= self.min_calls and failures >= self.failure_rate * len(self._calls):
+                self._open(now)
+
+    def release(self) -> None:
+        """
+        Ends an allowed call without counting it either way, such as one its caller cancelled.
+        A probe that is released lets the next call probe instead.
+        """
+        with self._lock:
+            if self.state == 'half_open':
+                self._probing = False
+
+    def _open(self, now: float) -> None:
+        self.state = 'open'
+        self.opened_at = now
+        self._calls.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'state': self.state, 'recent_calls': len(self._calls), 'rejected': self.rejected}
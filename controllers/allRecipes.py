@@ -4,6 +4,8 @@ from unittest.mock import MagicMock
 from fastapi import Depends
 from typing_extensions import Annotated
 from repositories.webRecipesRepository import WebRecipesRepository
+from fanout import gather
+from functools import partial
 
 import urllib.parse
 
@@ -15,16 +17,17 @@ class AllRecipes():
         """
         Find all recipes on the page
         """
-        try:
+        def parse() -> list[RecipeLite]:
             soup = self.web_recipes_repo.get_soup(url)
+            articles = soup.find_all("a", {"class": card_class})
+            return [RecipeCard(a).get_recipe_lite(tag=tag) for a in articles if "-recipe-" in a["href"] or "/recipe/" in a['href']]
+
+        try:
+            return self.web_recipes_repo.cached(('recipes', url, card_class, tag), parse)
         except Exception as e:
             print('Allrecipes error: ',e)
             return []
 
-        articles = soup.find_all("a", {"class": card_class})
-
-        return [RecipeCard(a).get_recipe_lite(tag=tag) for a in articles if "-recipe-" in a["href"] or "/recipe/" in a['href']]
-
     def search(self,search_string) -> list[RecipeLite]:
         """
         Search recipes parsing the returned html data.
@@ -49,19 +52,20 @@ class AllRecipes():
         return self.get_recipes_from_page("https://www.allrecipes.com/recipes/78/breakfast-and-brunch/", 'mntl-document-card',"Breakfast")
     
     def get_recipes_by_tag(self, tags: list[str]) -> list[RecipeLite]:
-        out = []
-        for tag in tags:
+        def get_tag(tag: str) -> list[RecipeLite]:
             match (tag.upper()):
                 case 'BREAKFAST':
-                    recipes = self.get_breakfasts()
+                    return self.get_breakfasts()
                 case 'DESSERTS':
-                    recipes = self.get_desserts()
+                    return self.get_desserts()
                 case 'MAINDISHES':
-                    recipes = self.get_main_dishes()
+                    return self.get_main_dishes()
                 case 'SOUPS':
-                    recipes = self.get_soups()
+                    return self.get_soups()
                 case _:
-                    recipes = []
+                    return []
+        out = []
+        for recipes in gather(*[partial(get_tag, tag) for tag in tags]):
             out.extend(recipes)
         return out
 
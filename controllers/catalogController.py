@@ -0,0 +1,75 @@
+from models.Recipe import Recipe, CatalogEntry
+from models.Record import Record
+from typing import Annotated
+from fastapi import Depends
+from repositories.householdRepository import HouseholdRepository
+from repositories.userRepository import UserRepository
+
+class CatalogController:
+    """
+    Keeps each household's recipe catalog: one small document with what the menu and feed need from every member's recipes.
+    Recipe writes go through here so the catalog changes in the same batch as the recipe.
+    A catalog that is missing or out of date is rebuilt from the recipes the next time it is read.
+    """
+    def __init__(self, repo: Annotated[HouseholdRepository, Depends()], user_repo: Annotated[UserRepository, Depends()]):
+        self.repo = repo
+        self.user_repo = user_repo
+        # catalogs read during this request
+        self._catalogs: dict[str, dict[str, CatalogEntry]] = {}
+
+    def get_catalog(self, household_id: str) -> dict[str, CatalogEntry]:
+        if household_id not in self._catalogs:
+            catalog = self.repo.get_catalog(household_id)
+            if catalog is None:
+                catalog = self.rebuild_catalog(household_id)
+            self._catalogs[household_id] = catalog
+        return self._catalogs[household_id]
+
+    def get_stored_catalog(self, household_id: str) -> dict[str, CatalogEntry]:
+        """
+        The catalog as it is stored, or an empty one if it has to be rebuilt, for reads that mustn't write.
+        The next get_catalog rebuilds it.
+        """
+        if household_id in self._catalogs:
+            return self._catalogs[household_id]
+        catalog = self.repo.get_catalog(household_id)
+        if catalog is None:
+            return {}
+        self._catalogs[household_id] = catalog
+        return catalog
+
+    def rebuild_catalog(self, household_id: str) -> dict[str, CatalogEntry]:
+        recipes = self.user_repo.get_users_recipes(self.repo.get_user_ids(household_id))
+        catalog = {recipe_id: self._entry(user_id, recipe) for user_id, user_recipes in recipes.items() for recipe_id, recipe in user_recipes.items()}
+        self.repo.save_catalog(household_id, catalog)
+        return catalog
+
+    @staticmethod
+    def _entry(user_id: str, recipe: Recipe) -> CatalogEntry:
+        entry = CatalogEntry.make_from_recipe(recipe)
+        # the catalog groups recipes by the member whose collection they are in
+        entry.author_id = user_id
+        return entry
+
+    def add_recipe(self, household_id: str, user_id: str, recipe: Recipe) -> str:
+        batch = self.repo.batch()
+        recipe_id = self.user_repo.add_recipe(user_id, recipe, batch=batch)
+        self.repo.put_catalog_entry(household_id, recipe_id, self._entry(user_id, recipe), batch=batch)
+        batch.commit()
+        self._catalogs.pop(household_id, None)
+        return recipe_id
+
+    def update_recipe(self, household_id: str, user_id: str, recipe_id: str, recipe: Recipe) -> str:
+        batch = self.repo.batch()
+        self.user_repo.update_recipe(user_id, recipe_id, recipe, batch=batch)
+        self.repo.put_catalog_entry(household_id, recipe_id, self._entry(user_id, recipe), batch=batch)
+        batch.commit()
+        self._catalogs.pop(household_id, None)
+        return recipe_id
+
+    def add_recipe_record(self, household_id: str, user_id: str, recipe_id: str, record: Record) -> None:
+        batch = self.repo.batch()
+        self.user_repo.add_recipe_record(user_id, recipe_id, record, batch=batch)
+        self.repo.record_in_catalog(household_id, recipe_id, record, batch=batch)
+        batch.commit()
+        self._catalogs.pop(household_id, None)
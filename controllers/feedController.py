@@ -6,36 +6,47 @@ from controllers.allRecipes import AllRecipes
 from uuid import uuid4
 from fastapi import UploadFile, Depends, HTTPException
 from fastapi.responses import RedirectResponse
+from fastapi.concurrency import run_in_threadpool
 from typing import Annotated
 from repositories.householdRepository import HouseholdRepository
 from repositories.userRepository import UserRepository
+from controllers.catalogController import CatalogController
+from fanout import gather
+from deadline import within
+from suggestions import SuggestedRecipes, get_suggested_recipes
 import random
 
+# how long a search will wait on allrecipes before going ahead with whatever pages it has
+SCRAPE_TIMEOUT = 8
+
 class FeedController:
-    def __init__(self, repo: Annotated[HouseholdRepository, Depends()], user_repo: Annotated[UserRepository, Depends()], all_recipes: Annotated[AllRecipes, Depends()]):
+    def __init__(self, repo: Annotated[HouseholdRepository, Depends()], user_repo: Annotated[UserRepository, Depends()], all_recipes: Annotated[AllRecipes, Depends()], catalog: Annotated[CatalogController, Depends()], suggested: Annotated[SuggestedRecipes, Depends(get_suggested_recipes)]):
         self.repo = repo
         self.user_repo = user_repo
         self.all_recipes = all_recipes
+        self.catalog = catalog
+        self.suggested = suggested
 
-    def add_recipe(self, user_id: str, recipe: Recipe) -> str:
+    def add_recipe(self, user_id: str, recipe: Recipe, household_id: str) -> str:
         # Add a recipe to the user's feed
         recipe.author_id = user_id
         recipe.tags.append("MyRecipes")
         if recipe.src_name is None:
             recipe.src_name = self.user_repo.get_user(user_id).full_name
-        recipe_id = self.user_repo.add_recipe(user_id, recipe)
+        recipe_id = self.catalog.add_recipe(household_id, user_id, recipe)
         return recipe_id
     
     def update_recipe(self, household_id: str, recipe_id: str, recipe: Recipe) -> str:
-        old_recipe = [recipe for user_id in self.repo.get_user_ids(household_id) for recipe in self.user_repo.get_user_recipes(user_id).values() if recipe.id == recipe_id]
-        if len(old_recipe) != 1:
+        author_id = self.user_repo.find_recipe_author(self.repo.get_user_ids(household_id), recipe_id)
+        if author_id is None:
             return ""
-        return self.user_repo.update_recipe(old_recipe[0].author_id, recipe_id, recipe)
+        return self.catalog.update_recipe(household_id, author_id, recipe_id, recipe)
 
     async def upload_image(self, user_id:str, file: UploadFile) -> str:
         file_name = user_id + "/" + uuid4().__str__() + Path(file.filename).suffix
         blob = bucket.blob(file_name)
-        blob.upload_from_string(await file.read(), content_type=file.content_type)
+        # the upload blocks, so keep it off the event loop
+        await run_in_threadpool(blob.upload_from_string, await file.read(), content_type=file.content_type)
         return file_name
     
     def _tag_hits(self, recipe: RecipeOut, tags: set[str]):
@@ -48,9 +59,11 @@ class FeedController:
     def get_user_recipes(self, household_id: str, keywords: list[str] = [], tags: list[str] = [], page: int = -1) -> list[tuple[RecipeLite, int]]:
         recipes = []
         tags = set([t.upper() for t in tags])
+        by_author: dict[str, list[RecipeLite]] = {}
+        for recipe_id, entry in self.catalog.get_catalog(household_id).items():
+            by_author.setdefault(entry.author_id, []).append(entry.to_recipe_lite(recipe_id, household_id))
         for user_id in self.repo.get_user_ids(household_id):
-            user_recipes = self.user_repo.get_user_recipes(user_id)
-            sorted_recipes = self.sort_recipes(household_id,[RecipeLite.make_from_full(x) for x in list(user_recipes.values())])
+            sorted_recipes = self.sort_recipes(household_id, by_author.get(user_id, []))
             if page * 10 < len(sorted_recipes) or page == -1:
                 # if page is -1, we just want the whole thing.
                 if page == -1:
@@ -71,21 +84,25 @@ class FeedController:
     
     def search_all_recipes(self, keywords: str, tags: list[str]) -> list[tuple[RecipeLite, int]]:
         out = []
-        if len(tags) != 0:
-            recipes = self.all_recipes.get_recipes_by_tag(tags)
-            for recipe in recipes:
-                if len(keywords.strip()) != 0:
-                    out.append((recipe, 1 + self._keyword_hits(recipe, keywords.split(' '))))
-                else:
-                    out.append((recipe,1))
-        if len(keywords.strip()) != 0:
-            recipes = self.all_recipes.search(keywords)
-            for recipe in recipes:
-                out.append((recipe, self._keyword_hits(recipe, keywords.split(' '))))
+        # fetches still running when the budget is up are abandoned, and the search goes ahead with what came back
+        with within(SCRAPE_TIMEOUT) as deadline:
+            tag_recipes, search_recipes = gather(
+                lambda: self.all_recipes.get_recipes_by_tag(tags) if len(tags) != 0 else [],
+                lambda: self.all_recipes.search(keywords) if len(keywords.strip()) != 0 else [],
+                timeout=deadline.remaining(), default=[])
+        for recipe in tag_recipes:
+            if len(keywords.strip()) != 0:
+                out.append((recipe, 1 + self._keyword_hits(recipe, keywords.split(' '))))
+            else:
+                out.append((recipe,1))
+        for recipe in search_recipes:
+            out.append((recipe, self._keyword_hits(recipe, keywords.split(' '))))
         return out
-    
+
     def get_suggested_recipes(self,page:int=0):
-        pages = [self.all_recipes.get_main_dishes(), self.all_recipes.get_soups(), self.all_recipes.get_breakfasts(), self.all_recipes.get_desserts()]
+        return self._combine_pages(self.suggested.get_pages(), page)
+
+    def _combine_pages(self, pages: list[list[RecipeLite]], page: int) -> list[RecipeLite]:
         combined = []
         try:
             combined.extend(pages[page%len(pages)][:20])
@@ -96,16 +113,20 @@ class FeedController:
             print('one of the allrecipes pages did not have 50 items, so it was not added to the feed.')
 
         return combined
+
+    def get_feed(self, household_id: str, page: int = 0) -> list[RecipeLite]:
+        user_recipes = [x[0] for x in self.get_user_recipes(household_id, page=page)]
+        # the allrecipes pages are kept warm in the background, so this never waits on allrecipes
+        combined_recipes = self.remove_duplicates(user_recipes, self.get_suggested_recipes(page), household_id)
+        return self.sort_recipes(household_id, combined_recipes)
     
     def remove_duplicates(self, user_recipes: list[RecipeLite],other_recipes: list[RecipeLite], household_id: str) -> list[RecipeLite]:
-        all_user_recipes = [recipe for user_id in self.repo.get_user_ids(household_id) for recipe in self.user_repo.get_user_recipes(user_id).values()]
-        user_titles = set(recipe.title for recipe in all_user_recipes)
+        user_titles = set(recipe.title for recipe in self.catalog.get_catalog(household_id).values())
         user_recipes.extend([recipe for recipe in other_recipes if recipe.title not in user_titles])
         return user_recipes
 
     def remove_duplicates_search(self, user_recipes: list[tuple[RecipeLite,int]],other_recipes: list[tuple[RecipeLite,int]], household_id: str) -> list[tuple[RecipeLite,int]]:
-        all_user_recipes = [recipe for user_id in self.repo.get_user_ids(household_id) for recipe in self.user_repo.get_user_recipes(user_id).values()]
-        user_titles = set(recipe.title for recipe in all_user_recipes)
+        user_titles = set(recipe.title for recipe in self.catalog.get_catalog(household_id).values())
         user_recipes.extend([recipe for recipe in other_recipes if recipe[0].title not in user_titles])
         return user_recipes
     
@@ -3,6 +3,7 @@ from models.Household import Household, JoinCode
 from models.User import User, UserLite
 from typing import Annotated
 from fastapi import Depends
+from google.cloud.firestore_v1.batch import WriteBatch
 from repositories.householdRepository import HouseholdRepository
 from repositories.userRepository import UserRepository
 import string, random
@@ -19,8 +20,18 @@ class HouseholdController:
         users = self.user_repo.get_users(self.repo.get_user_ids(household_id))
         return [User.make_user_lite(user) for user in users]
     
-    def find_household(self, user_id: str) -> str | None:
+    def find_household(self, user_id: str, household_id: str | None = None) -> str | None:
+        """
+        household_id is the value stored on the user's own document, when the caller has already read it.
+        Users that have not been backfilled yet fall back to querying the households.
+        """
+        if household_id is not None:
+            self.repo.remember_membership(user_id, household_id)
+            return household_id
         return self.repo.find_household(user_id)
+
+    def find_cached_household(self, user_id: str) -> str | None:
+        return self.repo.find_cached_household(user_id)
     
     def get_join_code(self, household_id: str) -> JoinCode:
         # Get the household code
@@ -56,6 +67,7 @@ class HouseholdController:
         if household.join_code.expiration_date < datetime.now(timezone.utc):
             return None
         household_id = household.id
+        batch = self.repo.batch()
         # Check if the user is already in a household
         old_household_id = self.repo.find_household(user_id)
         if old_household_id is not None:
@@ -64,27 +76,48 @@ class HouseholdController:
                 return [User.make_user_lite(user) for user in users]
             else:
                 # Remove the user from their current household
-                self.kick_user(old_household_id, user_id)
+                self._kick_user(old_household_id, user_id, self.repo.get_user_ids(old_household_id), batch)
 
-        self.repo.add_user(household_id, user_id)
+        self.repo.add_user(household_id, user_id, batch=batch)
+        self.user_repo.set_household(user_id, household_id, batch=batch)
+        # the new member's recipes have to be added to the catalog
+        self.repo.forget_catalog(household_id, batch=batch)
+        batch.commit()
         users = self.user_repo.get_users(self.repo.get_user_ids(household_id))
         return [User.make_user_lite(user) for user in users]
+
+    def _kick_user(self, household_id: str, user_id: str, user_ids: list[str], batch: WriteBatch) -> None:
+        """
+        Adds the writes for removing a member of the household to the batch.
+        """
+        # if this is the household owned by the user, it is deleted.
+        if user_ids[0] == user_id:
+            self.repo.delete_household(household_id, batch=batch)
+            for member_id in user_ids:
+                self.user_repo.set_household(member_id, None, batch=batch)
+        else:
+            self.repo.kick_user(household_id, user_id, batch=batch)
+            self.user_repo.set_household(user_id, None, batch=batch)
+        self.repo.forget_catalog(household_id, batch=batch)
     
     def kick_user(self,household_id: str, user_id: str) -> list[UserLite] | None:
         """
         Returns the list of users after the kick.
         """
         user_ids = self.repo.get_user_ids(household_id)
-        # if this is the household owned by the user, it is deleted.
-        if user_ids[0] == user_id:
-            self.repo.delete_household(household_id)
+        if user_id not in user_ids:
             return None
-        elif user_id in user_ids:
-            self.repo.kick_user(household_id, user_id)
-            users = self.user_repo.get_users(self.repo.get_user_ids(household_id))
-            return [User.make_user_lite(user) for user in users]
-        else:
+        batch = self.repo.batch()
+        self._kick_user(household_id, user_id, user_ids, batch)
+        batch.commit()
+        if user_ids[0] == user_id:
             return None
+        users = self.user_repo.get_users(self.repo.get_user_ids(household_id))
+        return [User.make_user_lite(user) for user in users]
         
     def create_household(self,user_id: str) -> str:
-        return self.repo.create_household(user_id)
\ No newline at end of file
+        batch = self.repo.batch()
+        household_id = self.repo.create_household(user_id, batch=batch)
+        self.user_repo.set_household(user_id, household_id, batch=batch)
+        batch.commit()
+        return household_id
\ No newline at end of file
@@ -8,15 +8,22 @@ from typing import Annotated
 from repositories.householdRepository import HouseholdRepository
 from repositories.userRepository import UserRepository
 from repositories.webRecipesRepository import WebRecipesRepository
+from controllers.catalogController import CatalogController
+from deadline import within
+
+# how long importing a recipe from a link will wait on the recipe's site
+RECIPE_TIMEOUT = 10
 
 class MenuController:
     def __init__(self, 
                  repo: Annotated[HouseholdRepository, Depends()], 
                  user_repo: Annotated[UserRepository, Depends()], 
-                 web_recipes_repo: Annotated[WebRecipesRepository, Depends()]):
+                 web_recipes_repo: Annotated[WebRecipesRepository, Depends()],
+                 catalog: Annotated[CatalogController, Depends()]):
         self.repo = repo
         self.user_repo = user_repo
         self.web_recipes_repo = web_recipes_repo
+        self.catalog = catalog
 
     def add_recipe(self, household_id, menu_item: MenuItem, user_id: str):
         # save the recipe first before adding it to the menu
@@ -24,23 +31,20 @@ class MenuController:
             if menu_item.recipe is None:
                 raise HTTPException(status_code=422, detail="either recipe or recipe_id is required to add recipe")
             menu_item.recipe.author_id = user_id
-            recipe_id = self.user_repo.add_recipe(user_id, menu_item.recipe)
+            recipe_id = self.catalog.add_recipe(household_id, user_id, menu_item.recipe)
             menu_item.recipe_id = recipe_id
             menu_item.recipe = None
-        menu_items = self.repo.get_menu_items(household_id)
-        item = [x for x in menu_items if x.recipe_id == menu_item.recipe_id]
-        if len(item) > 0:
-            raise HTTPException(status_code=409, detail="That recipe is already added to the menu.")
+        # raises a 409 if the recipe is already on the menu
         self.repo.add_recipe_to_menu(household_id, menu_item)
     
     def get_menu(self, household_id: str) -> list[MenuItemLite]:
         menu = self.repo.get_menu_items(household_id)
         out_list = []
-        recipes = self._get_household_recipes(household_id)
+        catalog = self.catalog.get_catalog(household_id)
 
         for menu_item in menu:
-            if menu_item.recipe_id in recipes:
-                recipe = recipes[menu_item.recipe_id]
+            if menu_item.recipe_id in catalog:
+                recipe = catalog[menu_item.recipe_id]
                 out_list.append(MenuItem.get_menu_item_lite(menu_item, recipe.img_link, recipe.title))
 
         return out_list
@@ -63,24 +67,12 @@ class MenuController:
         return menu_item
 
 
-    def _get_household_recipes(self, household_id: str) -> dict[str,RecipeLite]:
-        recipes = {}
-        for user_id in self.repo.get_user_ids(household_id):
-            recipes.update(self.user_repo.get_user_recipes(user_id))
-
-        for recipe_id in recipes.keys():
-            recipes[recipe_id] = RecipeLite.make_from_full(recipes[recipe_id])
-        return recipes
-        
     def get_recipe(self, household_id: str, recipe_id: str) -> RecipeOut | None:
-        for user_id in self.repo.get_user_ids(household_id):
-            recipes = self.user_repo.get_user_recipes(user_id)
-            if recipe_id in recipes:
-                return recipes[recipe_id]
-        return None
+        return self.user_repo.find_user_recipe(self.repo.get_user_ids(household_id), recipe_id)
     
     def get_recipe_online(self, link: str) -> Recipe:
-        recipe_data: RecipeData = self.web_recipes_repo.get(link)
+        with within(RECIPE_TIMEOUT):
+            recipe_data: RecipeData = self.web_recipes_repo.get(link)
         if len(recipe_data.failures):
             print('failed to retrieve these items:',recipe_data.failures)
         return recipe_data.recipe
@@ -91,10 +83,10 @@ class MenuController:
 
         #add a record for this interaction
         record = Record(household_id=household_id,timestamp=datetime.now(timezone.utc), rating = rating)
-        recipe = self.get_recipe(household_id, recipe_id)
-        if recipe == None:
+        author_id = self.user_repo.find_recipe_author(self.repo.get_user_ids(household_id), recipe_id)
+        if author_id == None:
             raise HTTPException(status_code=404,detail="Issue occurred with finding recipe to add rating to.")
-        self.user_repo.add_recipe_record(recipe.author_id, recipe_id, record)
+        self.catalog.add_recipe_record(household_id, author_id, recipe_id, record)
 
     def remove_menu_item(self, household_id: str, recipe_id: str) -> None:
         # remove from menu
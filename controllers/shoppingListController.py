@@ -1,46 +1,71 @@
 from datetime import datetime, timezone, timedelta
-from models.ShoppingItem import ShoppingItem, ShoppingItemOut
+from models.ShoppingItem import ShoppingItem, ShoppingItemOut, ShoppingListOperation
 from repositories.householdRepository import HouseholdRepository
 from repositories.userRepository import UserRepository
+from controllers.catalogController import CatalogController
 from typing import Annotated
-from fastapi import Depends
+from fastapi import Depends, HTTPException
+from fanout import gather
+from functools import partial
+
+# checked items drop off the list this long after they were checked
+CHECKED_ITEM_TTL = timedelta(hours=12)
+
+def is_expired(time_checked: datetime | None, recipe_id: str | None, menu_ids: set[str], now: datetime) -> bool:
+    """
+    Whether an item should no longer show on the list: it was checked too long ago, or its recipe left the menu.
+    """
+    if time_checked is not None:
+        if time_checked.tzinfo is None:
+            time_checked = time_checked.replace(tzinfo=timezone.utc)
+        if now - time_checked > CHECKED_ITEM_TTL:
+            return True
+    return recipe_id is not None and recipe_id != '' and recipe_id not in menu_ids
 
 class ShoppingListController:
-    def __init__(self, repo: Annotated[HouseholdRepository, Depends()], user_repo: Annotated[UserRepository, Depends()]):
+    def __init__(self, repo: Annotated[HouseholdRepository, Depends()], user_repo: Annotated[UserRepository, Depends()], catalog: Annotated[CatalogController, Depends()]):
         self.repo = repo
         self.user_repo = user_repo
+        self.catalog = catalog
 
     def get_shopping_list(self, household_id: str) -> list[ShoppingItemOut]:
+        return self.convert_list(household_id, self._shown(household_id))
+
+    def _shown(self, household_id: str) -> list[ShoppingItem]:
+        """
+        The list as it is shown. Expired items are left out here rather than deleted, so reading never writes.
+        The sweeper deletes them later.
+        """
         shopping_list = self.repo.get_shopping_list(household_id)
-        return self.convert_list(household_id, shopping_list)
+        # the menu is only needed to tell whether recipe items are orphaned
+        menu_ids = self._menu_ids(household_id) if any(item.recipe_id for item in shopping_list) else set()
+        now = datetime.now(timezone.utc)
+        return [item for item in shopping_list if not is_expired(item.time_checked, item.recipe_id, menu_ids, now)]
+
+    def _menu_ids(self, household_id: str) -> set[str]:
+        return {x.recipe_id for x in self.repo.get_menu_items(household_id)}
     
     def convert_list(self,household_id: str, shopping_list: list[ShoppingItem]) -> list[ShoppingItemOut]:
-        user_cache = {}
-        recipe_cache = {}
+        # every author's name in one read and every recipe title from the household's catalog, at the same time.
+        # A catalog that has to be rebuilt isn't rebuilt here, so reading the list never writes. The titles it doesn't
+        # have are read from the recipes instead, all in one more read
+        user_ids = list(set(item.user_id for item in shopping_list))
+        has_recipes = any(item.recipe_id for item in shopping_list)
+        users, catalog = gather(partial(self.user_repo.get_many, user_ids, field_paths=['full_name']),
+                                partial(self.catalog.get_stored_catalog, household_id) if has_recipes else dict)
+        titles = {recipe_id: entry.title for recipe_id, entry in catalog.items()}
+        missing = {item.recipe_id for item in shopping_list if item.recipe_id and item.recipe_id not in titles}
+        if len(missing) > 0:
+            titles.update(self.user_repo.get_recipe_titles(self.repo.get_user_ids(household_id), missing))
+
         out_list = []
         for item in shopping_list:
-            if item.user_id not in user_cache:
-                user = self.user_repo.get_user(item.user_id)
-                if user is None:
-                    raise Exception("unable to get user for " + item.user_id)
-                user_cache[item.user_id] = user
-            else:
-                user = user_cache[item.user_id]
-            user_initial = user.full_name[0]
-
-            if item.recipe_id is not None:
-                if item.recipe_id not in recipe_cache:
-                    recipe = self.user_repo.find_user_recipe(self.repo.get_user_ids(household_id), item.recipe_id)
-                    recipe_cache[item.recipe_id] = recipe
-                else:
-                    recipe = recipe_cache[item.recipe_id]
-
-                if recipe is not None:
-                    recipe_title = recipe.title
-                else:
-                    recipe_title = recipe.title
-            else:
-                recipe_title = ""
+            user = users.get(item.user_id)
+            if user is None:
+                raise Exception("unable to get user for " + item.user_id)
+            user_initial = user['full_name'][0]
+
+            recipe_title = titles.get(item.recipe_id, "") if item.recipe_id is not None else ""
             out_list.append(ShoppingItemOut(
                 name = item.name, 
                 id = item.id,
@@ -54,20 +79,12 @@ class ShoppingListController:
         return out_list
 
     def clean_list(self,household_id: str) -> None:
-        menu = self.repo.get_household(household_id).menu_recipes
-        menu_ids = [x.recipe_id for x in menu]
-
-        def item_is_valid(item):
-            # if an item has been checked for more than 12 hours, remove it from the list
-            if 'time_checked' in item and item['time_checked'] is not None:
-                if datetime.now(timezone.utc) - item['time_checked'] > timedelta(hours=12):
-                    return False
-            if 'recipe_id' in item and item['recipe_id'] != None and  item['recipe_id'] not in menu_ids:
-                return False
-            return True
-        
-        self.repo.remove_items(household_id, item_is_valid)
-        
+        """
+        Deletes the items get_shopping_list hides.
+        """
+        menu_ids = self._menu_ids(household_id)
+        now = datetime.now(timezone.utc)
+        self.repo.remove_items(household_id, lambda item: not is_expired(item.get('time_checked'), item.get('recipe_id'), menu_ids, now))
 
     def add_item(self, household_id, user_id, shopping_item: ShoppingItem) -> None:
         self.repo.add_item(household_id, shopping_item)
@@ -86,13 +103,49 @@ class ShoppingListController:
         self.repo.update_item(household_id, id, shopping_item)
 
     def remove_item(self, household_id: str, index: int) -> None:
-        self.repo.remove_item(household_id, index)
+        # indexes come from the list as it was shown, which leaves out expired items, so they are looked up in that
+        shown = self._shown(household_id)
+        if not 0 <= index < len(shown):
+            raise HTTPException(status_code=400, detail="The removed item did not exist")
+        self.repo.remove_item(household_id, shown[index].id)
     
     def move_item(self, household_id: str, from_index: int, to_index: int) -> None:
-        self.repo.move_item(household_id, from_index, to_index)
+        shown = self._shown(household_id)
+        if not 0 <= from_index < len(shown):
+            raise HTTPException(status_code=400, detail="The moved item did not exist")
+        rest = shown[:from_index] + shown[from_index + 1:]
+        self.repo.move_item(household_id, shown[from_index].id, rest[to_index].id if 0 <= to_index < len(rest) else None)
 
     def reorder_items(self, household_id: str, ordered_list: list[ShoppingItem] ) -> None:
         self.repo.reorder_items(household_id, ordered_list)
 
+    def apply_operations(self, household_id: str, user_id: str, operations: list[ShoppingListOperation]) -> None:
+        """
+        Applies the operations in order. The request's unit of work holds the list writes, so they are committed once
+        at the end, and not at all if an operation fails here. An operation can still fail when the unit of work
+        re-applies it to the stored list, with a 409 if its item was removed by someone else, and then the ones after it
+        aren't written. The added items' names are saved as suggestions straight away, since they're only hints.
+        """
+        suggestions = []
+        for operation in operations:
+            if operation.op == 'add':
+                if operation.item.user_id == None:
+                    operation.item.user_id = user_id
+                self.repo.add_item(household_id, operation.item)
+                suggestions.append(operation.item.name)
+            elif operation.op == 'check':
+                self.repo.check_item(household_id, operation.id)
+            elif operation.op == 'edit':
+                self.repo.update_item(household_id, operation.id, operation.item)
+            elif operation.op == 'move':
+                # against the list as the operations before it left it
+                self.move_item(household_id, operation.from_index, operation.to_index)
+            elif operation.op == 'remove':
+                self.remove_item(household_id, operation.index)
+            elif operation.op == 'reorder':
+                self.repo.reorder_items(household_id, operation.items)
+        if len(suggestions) > 0:
+            self.user_repo.add_user_suggestions(user_id, suggestions)
+
     def add_shopping_strings(self, household_id,item_strings: list[str], user_id: str, recipe_id: str) -> None:
         self.add_items(household_id,[ShoppingItem(name=name, user_id=user_id, recipe_id=recipe_id) for name in item_strings])
\ No newline at end of file
@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+import time
+
+class DeadlineExceeded(Exception):
+    pass
+
+class Deadline:
+    """
+    A time budget for one request. While it applies, outgoing calls shorten their timeouts to fit what is left of it,
+    and calls started after it has run out fail straight away, so a slow upstream can't hold a request past its budget.
+    """
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0)
+
+    def bound(self, timeout: float) -> float:
+        """
+        timeout cut down to what is left. Raises DeadlineExceeded if nothing is.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded()
+        return min(timeout, remaining)
+
+_current: ContextVar[Deadline | None] = ContextVar('deadline', default=None)
+
+def current_deadline() -> Deadline | None:
+    return _current.get()
+
+@contextmanager
+def within(seconds: float) -> Iterator[Deadline]:
+    """
+    Applies a budget of seconds to the block. Inside another budget, whichever runs out first applies.
+    """
+    outer = _current.get()
+    deadline = Deadline(seconds)
+    if outer is not None and outer.expires_at < deadline.expires_at:
+        deadline = outer
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
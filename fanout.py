@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Any
+from os import getenv
+from deadline import within
+import contextvars, threading
+
+# Shared by every request in the worker, so the number of calls in flight to Firestore and allrecipes stays bounded.
+_executor = ThreadPoolExecutor(max_workers=int(getenv("FANOUT_THREADS", "16")), thread_name_prefix="fanout")
+# Calls made from inside a gather get a pool of their own, since waiting on the shared pool from one of its own
+# threads could use up every thread and never finish.
+_nested_executor = ThreadPoolExecutor(max_workers=int(getenv("FANOUT_NESTED_THREADS", "16")), thread_name_prefix="fanout-nested")
+_local = threading.local()
+
+def _run(depth: int, timeout: float | None, call: Callable[[], Any]) -> Any:
+    outer, _local.depth = getattr(_local, "depth", 0), depth
+    try:
+        if timeout is None:
+            return call()
+        # outgoing calls made under a deadline give up with it, so a call we stop waiting for doesn't keep its thread
+        with within(timeout):
+            return call()
+    finally:
+        _local.depth = outer
+
+def gather(*calls: Callable[[], Any], timeout: float | None = None, default: Any = None) -> list[Any]:
+    """
+    Runs independent calls at the same time and returns their results in the order they were given.
+    Any call that hasn't finished when the timeout runs out gives default instead, so the caller gets whatever is ready.
+    The calls run under a deadline of the same timeout, so requests they make through the http client are cut off with it.
+    Exceptions from a call are raised here.
+
+    Calls made from inside another gather run on a second pool, and calls made from inside those one after the other.
+    Calls see the caller's context variables, such as the request's deadline.
+    """
+    depth = getattr(_local, "depth", 0)
+    if depth >= 2:
+        return [_run(depth, timeout, call) for call in calls]
+
+    executor = _executor if depth == 0 else _nested_executor
+    futures = [executor.submit(contextvars.copy_context().run, _run, depth + 1, timeout, call) for call in calls]
+    wait(futures, timeout=timeout)
+    results = []
+    for future in futures:
+        if future.done():
+            results.append(future.result())
+        else:
+            future.cancel()
+            results.append(default)
+    return results
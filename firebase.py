@@ -2,6 +2,8 @@ import firebase_admin
 from firebase_admin import credentials, firestore, storage
 from google.cloud.firestore_v1.collection import CollectionReference
 from google.cloud.firestore_v1.document import DocumentReference
+from google.cloud.firestore_v1.batch import WriteBatch
+from typing import Callable
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -15,15 +17,54 @@ bucket = storage.bucket()
 
 db = firestore.client()
 
+# Firestore allows at most 500 writes in a batch
+BATCH_SIZE = 400
+
+class Batch(WriteBatch):
+    """
+    A WriteBatch that runs callbacks once it has committed, so caches only learn about writes that were saved.
+    """
+    def __init__(self, client=db):
+        super().__init__(client)
+        self._after_commit: list[Callable[[], None]] = []
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        self._after_commit.append(callback)
+
+    def commit(self, *args, **kwargs):
+        results = super().commit(*args, **kwargs)
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+        return results
+
+def after_commit(batch: WriteBatch | None, callback: Callable[[], None]) -> None:
+    """
+    Runs callback once batch has committed, or straight away when there is no batch and the write has already been made.
+    """
+    if batch is None:
+        callback()
+    else:
+        batch.after_commit(callback)
+
 def household_ref() -> CollectionReference:
     return db.collection('households')
 
 def user_ref() -> CollectionReference:
     return db.collection('users')
 
+def recipe_author_ref() -> CollectionReference:
+    return db.collection('recipe_authors')
+
+def lease_ref() -> CollectionReference:
+    return db.collection('leases')
+
 # Use these for end-to-end testing, as these collections are in the real database but are reserved for testing.
 def household_test_ref() -> CollectionReference:
     return db.collection('test_household')
 
 def user_test_ref() -> CollectionReference:
-    return db.collection('test_user')
\ No newline at end of file
+    return db.collection('test_user')
+
+def recipe_author_test_ref() -> CollectionReference:
+    return db.collection('test_recipe_authors')
\ No newline at end of file
@@ -0,0 +1,191 @@
+from bisect import bisect_left
+
+# Fractional indexing, after https://observablehq.com/@dgreensp/implementing-fractional-indexing
+# A key is an integer part, whose first character gives its length, followed by a fraction with no trailing zero.
+# Keys sort as plain strings, so there is always room for a new key between any two others.
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+SMALLEST_INTEGER = "A" + DIGITS[0] * 26
+
+def _midpoint(a: str, b: str | None) -> str:
+    """
+    Returns a fraction between a and b, where b of None means the end of the range.
+    """
+    if b is not None:
+        # skip the prefix the two share, padding a with zeros
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"invalid order key head: {head}")
+
+def _integer_part(key: str) -> str:
+    if key == "":
+        raise ValueError("order keys can't be empty")
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f"invalid order key: {key}")
+    return key[:length]
+
+def _validate(key: str) -> None:
+    if key == SMALLEST_INTEGER:
+        raise ValueError(f"invalid order key: {key}")
+    integer = _integer_part(key)
+    if key[len(integer):].endswith(DIGITS[0]):
+        raise ValueError(f"invalid order key: {key}")
+
+def _increment_integer(x: str) -> str | None:
+    head, digits = x[0], list(x[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) + 1
+        if d < len(DIGITS):
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = DIGITS[0]
+    if head == "Z":
+        return "a" + DIGITS[0]
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+def _decrement_integer(x: str) -> str | None:
+    head, digits = x[0], list(x[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) - 1
+        if d >= 0:
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = DIGITS[-1]
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+def key_between(a: str | None, b: str | None) -> str:
+    """
+    Returns a key that sorts after a and before b. None stands for the start or end of the list.
+    """
+    if a is not None:
+        _validate(a)
+    if b is not None:
+        _validate(b)
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"{a} is not before {b}")
+    if a is None:
+        if b is None:
+            return "a" + DIGITS[0]
+        integer_b = _integer_part(b)
+        if integer_b == SMALLEST_INTEGER:
+            return integer_b + _midpoint("", b[len(integer_b):])
+        if integer_b < b:
+            return integer_b
+        key = _decrement_integer(integer_b)
+        if key is None:
+            raise ValueError("cannot decrement any more")
+        return key
+    integer_a = _integer_part(a)
+    fraction_a = a[len(integer_a):]
+    if b is None:
+        key = _increment_integer(integer_a)
+        return integer_a + _midpoint(fraction_a, None) if key is None else key
+    integer_b = _integer_part(b)
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, b[len(integer_b):])
+    key = _increment_integer(integer_a)
+    if key is None:
+        raise ValueError("cannot increment any more")
+    if key < b:
+        return key
+    return integer_a + _midpoint(fraction_a, None)
+
+def keys_between(a: str | None, b: str | None, n: int) -> list[str]:
+    """
+    Returns n keys in order between a and b, spread out so they stay short.
+    """
+    if n == 0:
+        return []
+    if n == 1:
+        return [key_between(a, b)]
+    if b is None:
+        keys = [key_between(a, b)]
+        for _ in range(n - 1):
+            keys.append(key_between(keys[-1], b))
+        return keys
+    if a is None:
+        keys = [key_between(a, b)]
+        for _ in range(n - 1):
+            keys.append(key_between(a, keys[-1]))
+        return list(reversed(keys))
+    middle = n // 2
+    key = key_between(a, b)
+    return [*keys_between(a, key, middle), key, *keys_between(key, b, n - middle - 1)]
+
+def _longest_increasing(keys: list[str | None]) -> set[int]:
+    """
+    Returns the positions of the longest run of keys, not necessarily next to each other, that are already in order.
+    """
+    tails: list[str] = []
+    tail_positions: list[int] = []
+    previous: dict[int, int | None] = {}
+    for i, key in enumerate(keys):
+        if key is None:
+            continue
+        j = bisect_left(tails, key)
+        previous[i] = tail_positions[j - 1] if j > 0 else None
+        if j == len(tails):
+            tails.append(key)
+            tail_positions.append(i)
+        else:
+            tails[j] = key
+            tail_positions[j] = i
+    kept = set()
+    i = tail_positions[-1] if tail_positions else None
+    while i is not None:
+        kept.add(i)
+        i = previous[i]
+    return kept
+
+def rekey(keys: list[str | None]) -> list[str]:
+    """
+    Given the current keys of a list in its new order, with None for items that don't have one yet,
+    returns keys that sort in that order while changing as few of them as possible.
+    """
+    kept = _longest_increasing(keys)
+    result = list(keys)
+    i = 0
+    previous = None
+    while i < len(keys):
+        if i in kept:
+            previous = keys[i]
+            i += 1
+            continue
+        j = i
+        while j < len(keys) and j not in kept:
+            j += 1
+        result[i:j] = keys_between(previous, keys[j] if j < len(keys) else None, j - i)
+        i = j
+    return result
@@ -0,0 +1,175 @@
+from dataclasses import dataclass
+from importlib.util import find_spec
+from os import getenv
+from threading import Lock, Thread
+from typing import Any, Callable, Coroutine
+from concurrent.futures import TimeoutError as FutureTimeout
+from breaker import CircuitBreaker
+from deadline import DeadlineExceeded, current_deadline
+import asyncio, time, urllib.parse
+import httpx
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36'
+
+class ResponseTooLarge(Exception):
+    pass
+
+@dataclass
+class FetchResponse:
+    url: str
+    status_code: int
+    headers: dict[str, str]
+    body: bytes
+
+class HttpClient:
+    """
+    One pooled connection set for every page we scrape, so fetches reuse kept-alive connections (HTTP/2 if h2 is installed)
+    instead of opening a new one each time. At most per_host requests go to one host at a time,
+    and a body bigger than max_bytes is abandoned rather than read into memory.
+
+    Each host has its own circuit breaker, so once a host starts failing or crawling, requests to it fail straight away
+    with CircuitOpen instead of tying up workers. A request made under a deadline fails with DeadlineExceeded once it runs out.
+
+    The client lives on its own event loop thread, so blocking code calls get and async code awaits fetch.
+    """
+    def __init__(self, per_host: int = 4, max_connections: int = 32, connect_timeout: float = 5, read_timeout: float = 10,
+                 max_bytes: int = 5 * 1024 * 1024, breaker: Callable[[], CircuitBreaker] = CircuitBreaker):
+        self.per_host = per_host
+        self.max_connections = max_connections
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.max_bytes = max_bytes
+        self.http2 = find_spec('h2') is not None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._hosts: dict[str, asyncio.Semaphore] = {}
+        self._new_breaker = breaker
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self._lock = Lock()
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                Thread(target=loop.run_forever, name='http-client', daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # only ever called on the client's loop, so no lock is needed
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                # the sites we scrape have been served with broken certificate chains before
+                verify=False,
+                follow_redirects=True,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                headers={'User-Agent': USER_AGENT})
+        return self._client
+
+    def _host(self, url: str) -> asyncio.Semaphore:
+        host = urllib.parse.urlsplit(url).netloc.lower()
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return self._hosts[host]
+
+    def _breaker(self, url: str) -> CircuitBreaker:
+        host = urllib.parse.urlsplit(url).netloc.lower()
+        with self._lock:
+            if host not in self.breakers:
+                self.breakers[host] = self._new_breaker()
+            return self.breakers[host]
+
+    async def _fetch(self, url: str, headers: dict[str, str] | None, timeout: float | None) -> FetchResponse:
+        request_timeout = self.timeout if timeout is None else httpx.Timeout(timeout)
+        breaker = self._breaker(url)
+        async with self._host(url):
+            # only once our turn comes, so time spent queued behind our own requests isn't put down to the host
+            breaker.allow()
+            started = time.monotonic()
+            ok = False
+            cancelled = False
+            try:
+                async with self._get_client().stream('GET', url, headers=headers, timeout=request_timeout) as response:
+                    # the host answered, whatever we make of the answer below
+                    ok = response.status_code < 500 and response.status_code != 429
+                    length = response.headers.get('Content-Length')
+                    if length is not None and length.isdigit() and int(length) > self.max_bytes:
+                        raise ResponseTooLarge(f"{url} is {length} bytes")
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body.extend(chunk)
+                        if len(body) > self.max_bytes:
+                            raise ResponseTooLarge(f"{url} is over {self.max_bytes} bytes")
+                    return FetchResponse(str(response.url), response.status_code, dict(response.headers), bytes(body))
+            except ResponseTooLarge:
+                raise
+            except asyncio.CancelledError:
+                # we gave up on it, usually because the caller's deadline ran out, which says nothing about the host
+                cancelled = True
+                raise
+            except BaseException:
+                # timeouts and refused connections
+                ok = False
+                raise
+            finally:
+                if cancelled:
+                    breaker.release()
+                else:
+                    breaker.record(ok, time.monotonic() - started)
+
+    def _submit(self, coroutine: Coroutine) -> Any:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._start())
+
+    def _remaining(self) -> float | None:
+        """
+        How long a request may take in all under the caller's deadline, or None without one.
+        """
+        deadline = current_deadline()
+        if deadline is None:
+            return None
+        # a request is cancelled when the deadline runs out, so it doesn't need a shorter timeout as well
+        return deadline.bound(float('inf'))
+
+    async def fetch(self, url: str, headers: dict[str, str] | None = None, timeout: float | None = None) -> FetchResponse:
+        """
+        Fetches url without blocking the calling loop. timeout replaces both the connect and read timeouts.
+        Raises httpx.HTTPError when the request fails, ResponseTooLarge when the body is over max_bytes,
+        CircuitOpen when the host's breaker is open and DeadlineExceeded when the caller's deadline runs out.
+        Any status code is returned rather than raised, so callers can handle a 304.
+        """
+        total = self._remaining()
+        future = self._submit(self._fetch(url, headers, timeout))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), total)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(url)
+
+    def get(self, url: str, headers: dict[str, str] | None = None, timeout: float | None = None) -> FetchResponse:
+        """
+        The blocking form of fetch, for code running in a thread pool.
+        """
+        total = self._remaining()
+        future = self._submit(self._fetch(url, headers, timeout))
+        try:
+            return future.result(total)
+        except FutureTimeout:
+            future.cancel()
+            raise DeadlineExceeded(url)
+
+    def close(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result()
+            self._client = None
+        self._hosts = {}
+        loop.call_soon_threadsafe(loop.stop)
+
+http_client = HttpClient(
+    per_host=int(getenv('SCRAPE_PER_HOST', '4')),
+    connect_timeout=float(getenv('SCRAPE_CONNECT_TIMEOUT', '5')),
+    read_timeout=float(getenv('SCRAPE_READ_TIMEOUT', '10')),
+    max_bytes=int(getenv('SCRAPE_MAX_BYTES', str(5 * 1024 * 1024))))
@@ -4,10 +4,42 @@ from models.Household import User
 from routes import shopping_list, household, feed, user, menu
 from typing_extensions import Annotated
 from os import getenv
-from auth import provide_household_id, get_user, get_test_user_fixed
+from contextlib import asynccontextmanager
+from anyio import to_thread
+from auth import provide_household_id, get_user, get_test_user_fixed, token_verifier
+from repositories.householdRepository import household_unit_of_work
+from firebase import household_ref, lease_ref
+from sweeper import ShoppingListSweeper
+from repositories.webRecipesRepository import prune_pages
+from suggestions import suggested_recipes
+from httpclient import http_client
 
+# deletes expired shopping list items so GET /shopping-list/ only has to hide them
+# only one worker at a time sweeps, the one holding the lease
+sweeper = ShoppingListSweeper(household_ref(), interval=float(getenv("SHOPPING_LIST_SWEEP_SECONDS", "600")),
+                              lease=lease_ref().document('shopping_list_sweeper'))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Routes and dependencies that talk to Firestore are plain functions, which FastAPI runs in this thread pool
+    # so a slow read only holds up its own request. THREADPOOL_SIZE sets how many can be in flight per worker.
+    threads = getenv("THREADPOOL_SIZE")
+    if threads is not None:
+        to_thread.current_default_thread_limiter().total_tokens = int(threads)
+    # keep the token signing keys warm so verifying a token never waits on Google
+    token_verifier.start()
+    sweeper.start()
+    # fetches the allrecipes pages feeds mix in right away, then keeps them fresh
+    suggested_recipes.start()
+    # scraped pages too old to serve even when allrecipes is down
+    await to_thread.run_sync(prune_pages)
+    yield
+    await suggested_recipes.stop()
+    await sweeper.stop()
+    await token_verifier.stop()
+    http_client.close()
     
-app = FastAPI(dependencies=[Depends(provide_household_id)])
+app = FastAPI(dependencies=[Depends(household_unit_of_work), Depends(provide_household_id)], lifespan=lifespan)
 env = getenv("ENVIRONMENT")
 if env != None and 'Dev' in env:
     app.dependency_overrides[get_user] = get_test_user_fixed
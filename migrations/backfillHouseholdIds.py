@@ -0,0 +1,34 @@
+"""
+One-shot job that copies every household's membership onto its users' documents as household_id.
+It is safe to run more than once. Run it from the project root with:
+    python -m migrations.backfillHouseholdIds
+"""
+from firebase import db, household_ref, user_ref, BATCH_SIZE
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.collection import CollectionReference
+
+
+def backfill(client: Client, households: CollectionReference, users: CollectionReference) -> int:
+    """
+    Streams the households so the whole collection never has to fit in memory.
+    Returns the number of users updated.
+    """
+    batch = client.batch()
+    pending = 0
+    updated = 0
+    for household in households.select(['owner_id', 'users']).stream():
+        data = household.to_dict()
+        for user_id in [data['owner_id'], *data.get('users', [])]:
+            batch.set(users.document(user_id), {'household_id': household.id}, merge=True)
+            pending += 1
+            updated += 1
+            if pending == BATCH_SIZE:
+                batch.commit()
+                batch = client.batch()
+                pending = 0
+    if pending > 0:
+        batch.commit()
+    return updated
+
+if __name__ == "__main__":
+    print(f"Backfilled household_id for {backfill(db, household_ref(), user_ref())} users")
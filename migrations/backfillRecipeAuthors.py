@@ -0,0 +1,36 @@
+"""
+One-shot job that adds every existing recipe to the recipe_authors index.
+Run it after moveRecipesToSubcollection. It is safe to run more than once. Run it from the project root with:
+    python -m migrations.backfillRecipeAuthors
+"""
+from firebase import db, user_ref, recipe_author_ref, BATCH_SIZE
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.collection import CollectionReference
+
+
+def backfill(client: Client, users: CollectionReference, authors: CollectionReference) -> int:
+    """
+    Streams every user's recipes at once through a collection group query, only reading their ids.
+    The query also finds recipes under other collections, such as the test ones, so only those under users are indexed.
+    Returns the number of recipes indexed.
+    """
+    batch = client.batch()
+    pending = 0
+    indexed = 0
+    for recipe in client.collection_group('recipes').select([]).stream():
+        # recipes live at users/{user id}/recipes/{recipe id}
+        if recipe.reference.parent.parent.parent.id != users.id:
+            continue
+        batch.set(authors.document(recipe.id), {'author_id': recipe.reference.parent.parent.id})
+        pending += 1
+        indexed += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = client.batch()
+            pending = 0
+    if pending > 0:
+        batch.commit()
+    return indexed
+
+if __name__ == "__main__":
+    print(f"Indexed {backfill(db, user_ref(), recipe_author_ref())} recipes")
@@ -0,0 +1,50 @@
+"""
+One-shot job that moves every household's menu_recipes array into the menu map, keyed by recipe id and ordered as the array was.
+Run it before starting the API with MENU_STORAGE=map. It is safe to run more than once. Run it from the project root with:
+    python -m migrations.moveMenuToMap
+"""
+from firebase import db, household_ref
+from writequeue import ContentionCounters, retry_on_conflict
+from functools import partial
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.collection import CollectionReference
+from google.cloud.firestore_v1.document import DocumentReference
+from google.cloud.firestore_v1.field_path import FieldPath
+
+
+def move_menus(client: Client, households: CollectionReference) -> int:
+    """
+    Items already in the map are left alone, since the map is what reads use for them.
+    Returns the number of menu items moved.
+    """
+    moved = 0
+    conflicts = ContentionCounters()
+    for household in households.select(['menu_recipes']).stream():
+        if not (household.to_dict() or {}).get('menu_recipes'):
+            continue
+        moved += retry_on_conflict(partial(_move_menu, client, households.document(household.id)), (FailedPrecondition,), conflicts)
+    return moved
+
+def _move_menu(client: Client, household_doc: DocumentReference) -> int:
+    """
+    Moves one household's menu in a single update, made only if the household hasn't changed since it was read,
+    so a menu edit made meanwhile isn't lost. The household is then read again.
+    """
+    snapshot = household_doc.get(field_paths=['menu_recipes', 'menu'])
+    data = snapshot.to_dict() or {}
+    menu_recipes = data.get('menu_recipes')
+    if not menu_recipes:
+        return 0
+    menu = data.get('menu') or {}
+    # the array comes before anything added to the map, which is ordered by timestamps
+    changes = {
+        FieldPath('menu', item['recipe_id']).to_api_repr(): {**item, 'order': index}
+        for index, item in enumerate(menu_recipes)
+        if item.get('recipe_id') and item['recipe_id'] not in menu
+    }
+    household_doc.update({**changes, 'menu_recipes': []}, option=client.write_option(last_update_time=snapshot.update_time))
+    return len(changes)
+
+if __name__ == "__main__":
+    print(f"Moved {move_menus(db, household_ref())} menu items")
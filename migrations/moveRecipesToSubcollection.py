@@ -0,0 +1,62 @@
+"""
+One-shot job that moves every recipe out of the recipes map on its user's document and into users/{id}/recipes/{recipe id}.
+It is safe to run more than once, and stopping it partway loses nothing. Run it from the project root with:
+    python -m migrations.moveRecipesToSubcollection
+"""
+from firebase import db, user_ref, BATCH_SIZE
+from writequeue import ContentionCounters, retry_on_conflict
+from functools import partial
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud.firestore_v1 import DELETE_FIELD, Increment
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.collection import CollectionReference
+from google.cloud.firestore_v1.document import DocumentReference
+
+
+def move_recipes(client: Client, users: CollectionReference) -> int:
+    """
+    Streams the users so the whole collection never has to fit in memory.
+    Returns the number of recipes moved.
+    """
+    moved = 0
+    conflicts = ContentionCounters()
+    for user in users.select(['recipes']).stream():
+        if (user.to_dict() or {}).get('recipes') is None:
+            continue
+        moved += retry_on_conflict(partial(_move_user, client, users.document(user.id)), (FailedPrecondition,), conflicts)
+    return moved
+
+def _move_user(client: Client, user_doc: DocumentReference) -> int:
+    """
+    The map is only deleted once all of its recipes have been copied, and only if the user's document hasn't changed
+    since it was read, so a record added to a recipe in the map meanwhile isn't lost. The user is then redone.
+    """
+    snapshot = user_doc.get(field_paths=['recipes'])
+    recipes = (snapshot.to_dict() or {}).get('recipes')
+    if recipes is None:
+        return 0
+    # recipes edited since they were saved, or copied by an earlier run, are in the subcollection already and reads prefer it
+    copied = {doc.id for doc in user_doc.collection('recipes').select([]).stream()}
+    batch = client.batch()
+    pending = 0
+    moved = 0
+    for recipe_id, recipe in recipes.items():
+        if recipe_id in copied:
+            continue
+        if recipe.get('author_id') is None:
+            recipe['author_id'] = user_doc.id
+        batch.set(user_doc.collection('recipes').document(recipe_id), recipe)
+        pending += 1
+        moved += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = client.batch()
+            pending = 0
+    # an increment, so recipes added through the new layout while this runs are still counted
+    batch.update(user_doc, {'recipes': DELETE_FIELD, 'recipe_count': Increment(len(recipes))},
+                 option=client.write_option(last_update_time=snapshot.update_time))
+    batch.commit()
+    return moved
+
+if __name__ == "__main__":
+    print(f"Moved {move_recipes(db, user_ref())} recipes")
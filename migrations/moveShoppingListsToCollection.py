@@ -0,0 +1,55 @@
+"""
+One-shot job that moves every household's shopping_list array into households/{id}/shopping_list/{item id},
+ordered by fractional keys. Run it before starting the API with SHOPPING_LIST_STORAGE=collection.
+It is safe to run more than once, and stopping it partway loses nothing. Run it from the project root with:
+    python -m migrations.moveShoppingListsToCollection
+"""
+from firebase import db, household_ref, BATCH_SIZE
+from fractional import keys_between
+from writequeue import ContentionCounters, retry_on_conflict
+from functools import partial
+from uuid import uuid4
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.collection import CollectionReference
+from google.cloud.firestore_v1.document import DocumentReference
+
+
+def move_shopping_lists(client: Client, households: CollectionReference) -> int:
+    """
+    Returns the number of items moved.
+    """
+    moved = 0
+    conflicts = ContentionCounters()
+    for household in households.select(['shopping_list']).stream():
+        if not (household.to_dict() or {}).get('shopping_list'):
+            continue
+        moved += retry_on_conflict(partial(_move_list, client, households.document(household.id)), (FailedPrecondition,), conflicts)
+    return moved
+
+def _move_list(client: Client, household_doc: DocumentReference) -> int:
+    """
+    The array is only emptied once all of its items have been copied, and only if the household hasn't changed
+    since it was read, so an edit made to the list meanwhile isn't lost. The household is then redone.
+    """
+    snapshot = household_doc.get(field_paths=['shopping_list'])
+    shopping_list = (snapshot.to_dict() or {}).get('shopping_list')
+    if not shopping_list:
+        return 0
+    batch = client.batch()
+    pending = 0
+    for item, key in zip(shopping_list, keys_between(None, None, len(shopping_list))):
+        if item.get('id') is None:
+            item['id'] = str(uuid4())
+        batch.set(household_doc.collection('shopping_list').document(item['id']), {**item, 'order': key})
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch = client.batch()
+            pending = 0
+    batch.update(household_doc, {'shopping_list': []}, option=client.write_option(last_update_time=snapshot.update_time))
+    batch.commit()
+    return len(shopping_list)
+
+if __name__ == "__main__":
+    print(f"Moved {move_shopping_lists(db, household_ref())} shopping list items")
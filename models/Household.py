@@ -15,10 +15,36 @@ class JoinCode(BaseModel):
 class ActiveItems(BaseModel):
     items: list[str] = []
 
-class Household(BaseModel):
+class MenuFields(BaseModel):
+    # menu_recipes is the original layout, menu keys each item by its recipe_id and orders them by an order field
+    menu_recipes: list[MenuItem] = []
+    menu: dict[str, dict] = {}
+
+    def menu_items(self) -> list[MenuItem]:
+        """
+        The menu in order. Items still in the array come first, since they were added before the map was used.
+        """
+        # a field path update of a removed item can leave an entry without a recipe_id behind
+        keyed = sorted((entry for entry in self.menu.values() if entry.get('recipe_id')), key=lambda entry: entry.get('order', 0))
+        return [x for x in self.menu_recipes if x.recipe_id not in self.menu] + [MenuItem.model_validate(entry) for entry in keyed]
+
+class Household(MenuFields):
     id: str | None = None
     users: list[str] = []
     owner_id: str
     join_code: JoinCode | None = None
-    menu_recipes: list[MenuItem] = []
-    shopping_list: list[ShoppingItem] = []
\ No newline at end of file
+    shopping_list: list[ShoppingItem] = []
+
+# Partial views of a household, for reads that only need some of its fields.
+class HouseholdMembers(BaseModel):
+    owner_id: str
+    users: list[str] = []
+
+class HouseholdJoinCode(BaseModel):
+    join_code: JoinCode | None = None
+
+class HouseholdMenu(MenuFields):
+    pass
+
+class HouseholdShoppingList(BaseModel):
+    shopping_list: list[ShoppingItem] = []
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from models.Ingredient import Ingredient
 from models.Record import Record
@@ -63,7 +63,9 @@ class RecipeLite(BaseModel):
     # Either an id or src_link is required to be able to retrieve the full recipe.
     id: str | None = None
     src_link: str | None = None
-    history: list[Record] = []
+    # recipes read from the household catalog only carry a summary of their history, see CatalogEntry.to_recipe_lite
+    history: list[Record] = Field(default=[], description="When the recipe was made and rated. For the household's own recipes this is a "
+                                  "single record summarising the history: when it was last made, rated with the average of every rating.")
     title: str
     img_link: str
     tags: list[str] = []
@@ -79,6 +81,46 @@ class RecipeLite(BaseModel):
                           history=recipe.history
                           )
 
+class CatalogEntry(BaseModel):
+    # what the menu and feed need from a recipe, with its history rolled up so the household catalog stays small
+    title: str
+    img_link: str
+    tags: list[str] = []
+    src_link: str = ""
+    author_id: str | None = None
+    times_made: int = 0
+    last_made: datetime | None = None
+    rating_sum: float = 0
+    rating_count: int = 0
+    @staticmethod
+    def make_from_recipe(recipe: object):
+        ratings = [x.rating for x in recipe.history if x.rating is not None]
+        return CatalogEntry(title=recipe.title,
+                            img_link=recipe.img_link,
+                            tags=recipe.tags,
+                            src_link=recipe.src_link,
+                            author_id=recipe.author_id,
+                            times_made=len(recipe.history),
+                            last_made=max((x.timestamp for x in recipe.history), default=None),
+                            rating_sum=sum(ratings),
+                            rating_count=len(ratings)
+                            )
+
+    def to_recipe_lite(self, recipe_id: str, household_id: str) -> RecipeLite:
+        # the feed only looks at when a recipe was last made and its average rating, so one record can stand in for the history.
+        # It is sent to clients as it is, which the description of RecipeLite.history states.
+        history = []
+        if self.last_made is not None:
+            rating = self.rating_sum / self.rating_count if self.rating_count > 0 else None
+            history.append(Record(household_id=household_id, timestamp=self.last_made, rating=rating))
+        return RecipeLite(id=recipe_id,
+                          tags=self.tags,
+                          src_link=self.src_link,
+                          title=self.title,
+                          img_link=self.img_link,
+                          history=history
+                          )
+
 class MenuItem(BaseModel):
     note: str = ''
     date: datetime | None = None
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from uuid import uuid4
+from typing import Annotated, Literal, Union
 
 class ShoppingItem(BaseModel):
     name: str
@@ -19,3 +20,35 @@ class ShoppingItemOut(BaseModel):
     user_initial: str
     recipe_id: str | None
     recipe_title: str | None
+
+class AddOperation(BaseModel):
+    op: Literal['add']
+    item: ShoppingItem
+
+class CheckOperation(BaseModel):
+    op: Literal['check']
+    id: str
+
+class EditOperation(BaseModel):
+    op: Literal['edit']
+    id: str
+    item: ShoppingItem
+
+class MoveOperation(BaseModel):
+    op: Literal['move']
+    from_index: int
+    to_index: int
+
+class RemoveOperation(BaseModel):
+    op: Literal['remove']
+    index: int
+
+class ReorderOperation(BaseModel):
+    op: Literal['reorder']
+    items: list[ShoppingItem]
+
+# one step of a POST /shopping-list/batch, told apart by its op
+ShoppingListOperation = Annotated[
+    Union[AddOperation, CheckOperation, EditOperation, MoveOperation, RemoveOperation, ReorderOperation],
+    Field(discriminator='op')
+]
@@ -1,15 +1,18 @@
-from pydantic import BaseModel
-from models.Recipe import Recipe
+from pydantic import BaseModel, Field
 
 class UserLite(BaseModel):
     full_name: str
     id: str
     recipes: str
+    # only used server side to find the user's household, never sent to clients
+    household_id: str | None = Field(default=None, exclude=True)
 
 class User(BaseModel):
     full_name: str
     google_id: str
-    recipes: dict[str,Recipe] = {}
+    # the recipes themselves are in the users/{id}/recipes collection
+    recipe_count: int = 0
+    household_id: str | None = None
     suggestions: set[str] = set()
 
     @staticmethod
@@ -17,4 +20,5 @@ class User(BaseModel):
         return UserLite(
             full_name=user.full_name, 
             id=user.google_id,
-            recipes= f"{len(user.recipes)} recipes")
+            recipes= f"{user.recipe_count} recipes",
+            household_id=user.household_id)
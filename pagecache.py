@@ -0,0 +1,179 @@
+from dataclasses import dataclass
+from httpclient import HttpClient, http_client
+from threading import Lock
+import urllib.parse
+import hashlib, json, os, tempfile, time, zlib
+
+class PageError(Exception):
+    pass
+
+def canonical_url(url: str) -> str:
+    """
+    The form of url used as its cache key, so trivially different spellings of a page share one entry.
+    """
+    parts = urllib.parse.urlsplit(url)
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parts.query, keep_blank_values=True)))
+    return urllib.parse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', query, ''))
+
+@dataclass
+class CachedPage:
+    url: str
+    body: bytes
+    fetched_at: float
+    etag: str | None = None
+    last_modified: str | None = None
+
+class PageCache:
+    """
+    Keeps fetched pages on disk, compressed, so a new or restarted worker doesn't have to scrape them again.
+    Every worker on a machine can share one directory: entries are written to a temporary file and renamed into place,
+    so a reader only ever sees a whole entry.
+
+    A page younger than fresh_for is served without asking the origin. An older one is revalidated with its ETag and
+    Last-Modified, and if the origin doesn't answer within revalidate_timeout the old copy is served anyway,
+    as long as it is younger than max_stale.
+
+    The directory is kept to about max_bytes: once this worker has written a tenth of that since it last looked,
+    the entries written longest ago are deleted until the rest fit.
+    """
+    def __init__(self, directory: str, fresh_for: float = 60 * 60, max_stale: float = 7 * 24 * 60 * 60,
+                 timeout: float | None = None, revalidate_timeout: float = 2, client: HttpClient = http_client,
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.client = client
+        self.fresh_for = fresh_for
+        self.max_stale = max_stale
+        self.timeout = timeout
+        self.revalidate_timeout = revalidate_timeout
+        self.max_bytes = max_bytes
+        # bytes written since the directory was last trimmed, so it isn't listed on every write
+        self._written = 0
+        self._lock = Lock()
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + '.page')
+
+    def read(self, url: str) -> CachedPage | None:
+        """
+        The stored copy of url, however old, or None if there isn't a readable one.
+        """
+        url = canonical_url(url)
+        try:
+            with open(self._path(url), 'rb') as f:
+                header, body = f.read().split(b'\n', 1)
+            meta = json.loads(header)
+            if meta['url'] != url:
+                return None
+            return CachedPage(url, zlib.decompress(body), meta['fetched_at'], meta.get('etag'), meta.get('last_modified'))
+        except (OSError, ValueError, KeyError, zlib.error):
+            return None
+
+    def write(self, page: CachedPage) -> None:
+        meta = {'url': page.url, 'fetched_at': page.fetched_at, 'etag': page.etag, 'last_modified': page.last_modified}
+        os.makedirs(self.directory, exist_ok=True)
+        entry = json.dumps(meta).encode() + b'\n' + zlib.compress(page.body)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(entry)
+            os.replace(temp_path, self._path(page.url))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        with self._lock:
+            self._written += len(entry)
+            due = self._written >= self.max_bytes // 10
+            if due:
+                self._written = 0
+        if due:
+            self.trim()
+
+    def _request(self, url: str, cached: CachedPage | None, timeout: float | None) -> CachedPage:
+        headers = {}
+        if cached is not None and cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached is not None and cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
+
+        response = self.client.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached is not None:
+            return CachedPage(url, cached.body, time.time(), response.headers.get('etag') or cached.etag,
+                              response.headers.get('last-modified') or cached.last_modified)
+        if response.status_code != 200:
+            raise PageError(f"{url} returned {response.status_code}")
+        return CachedPage(url, response.body, time.time(), response.headers.get('etag'), response.headers.get('last-modified'))
+
+    def fetch(self, url: str) -> bytes:
+        """
+        Returns the body of url, from disk when it can. Raises whatever the request raised if there is no copy to fall back on.
+        """
+        url = canonical_url(url)
+        cached = self.read(url)
+        age = time.time() - cached.fetched_at if cached is not None else None
+        if age is not None and age < self.fresh_for:
+            return cached.body
+
+        usable = age is not None and age < self.max_stale
+        try:
+            page = self._request(url, cached, self.revalidate_timeout if usable else self.timeout)
+        except Exception:
+            if usable:
+                return cached.body
+            raise
+        try:
+            self.write(page)
+        except OSError as e:
+            print('Page cache write failed: ', e)
+        return page.body
+
+    def prune(self) -> int:
+        """
+        Deletes entries too old to be served and returns how many were deleted.
+        """
+        removed = 0
+        cutoff = time.time() - self.max_stale
+        if not os.path.isdir(self.directory):
+            return 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                # revalidating rewrites the file, so its mtime is when it was last known to be current
+                if os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def trim(self) -> int:
+        """
+        Deletes the entries written longest ago until the rest fit in max_bytes, and returns how many were deleted.
+        """
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return 0
+        for name in names:
+            # temporary files belong to writes still in progress
+            if not name.endswith('.page'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(os.path.join(self.directory, name))
+                removed += 1
+            except OSError:
+                # another worker deleted it first
+                pass
+            total -= size
+        return removed
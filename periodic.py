@@ -0,0 +1,43 @@
+from typing import Awaitable, Callable
+import asyncio
+
+class PeriodicTask:
+    """
+    Runs a job over and over on the event loop until it is stopped, waiting next_delay() seconds before each run.
+    A run that fails is printed under name and followed by another retry_after seconds of waiting,
+    so one bad run never ends the loop.
+    """
+    def __init__(self, name: str, run: Callable[[], Awaitable[None]], next_delay: Callable[[], float], retry_after: float = 60):
+        self.name = name
+        self.run = run
+        self.next_delay = next_delay
+        self.retry_after = retry_after
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.sleep(max(self.next_delay(), 0))
+                await self.run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f'{self.name} failed: ', e)
+                await asyncio.sleep(self.retry_after)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
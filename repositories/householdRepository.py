@@ -1,24 +1,307 @@
 from models.User import User 
-from models.Recipe import Recipe, RecipeOut, MenuItem
+from models.Recipe import Recipe, RecipeOut, MenuItem, CatalogEntry
+from models.Record import Record
 from models.ShoppingItem import ShoppingItem
-from models.Household import Household, JoinCode
-from firebase import household_ref
+from models.Household import Household, JoinCode, HouseholdMembers, HouseholdJoinCode, HouseholdMenu, HouseholdShoppingList
+from firebase import household_ref, db, Batch, after_commit, BATCH_SIZE
 from fastapi import Depends, HTTPException
-from typing import Annotated
+from typing import Annotated, TypeVar, Callable, Any
+from functools import partial
+from pydantic import BaseModel, ValidationError
 from datetime import datetime, timezone
 from uuid import uuid4
+from copy import deepcopy
 from google.cloud.firestore_v1.collection import CollectionReference
-from google.cloud.firestore_v1 import ArrayUnion, ArrayRemove, FieldFilter, Or
+from google.cloud.firestore_v1.batch import WriteBatch
+from google.cloud.firestore_v1 import ArrayUnion, ArrayRemove, FieldFilter, Or, Increment, Query, DELETE_FIELD
+from google.cloud.firestore_v1.field_path import FieldPath
+from google.cloud.firestore_v1.document import DocumentReference
+from google.cloud.firestore_v1.transaction import Transaction, transactional
+from google.api_core.exceptions import FailedPrecondition, Aborted
+from cachetools import TTLCache
+from threading import Lock, RLock
+from fractional import rekey, key_between
+from writequeue import WriteQueue, ContentionCounters, retry_on_conflict
+from os import getenv
+
+# (collection id, user id) -> household id, shared by every request in this worker.
+# Every membership change goes through this repository and updates it once the change is committed, so it is exact within a worker.
+# The ttl only bounds how long another worker's join or kick can go unnoticed.
+_memberships = TTLCache(maxsize=10000, ttl=60)
+_memberships_lock = Lock()
+
+View = TypeVar('View', bound=BaseModel)
+
+# 'document' keeps the shopping list as an array on the household, 'collection' keeps each item in its own
+# document under households/{id}/shopping_list, ordered by a fractional key, so a change only writes the items it touches.
+SHOPPING_LIST_STORAGE = getenv('SHOPPING_LIST_STORAGE', 'document')
+# 'array' keeps the menu in menu_recipes, 'map' keeps it in menu keyed by recipe id, so adding, editing and removing
+# an item is a single field path write that only reads that item first, not the whole menu. Reads understand both.
+MENU_STORAGE = getenv('MENU_STORAGE', 'array')
+
+# Edits to the same array of a household that arrive within this many milliseconds are written together.
+# Shared by every request in the worker, keyed by (collection id, household id, field).
+_write_queue = WriteQueue(window=float(getenv('SHOPPING_LIST_WRITE_WINDOW_MS', '10')) / 1000)
+# how often those writes found the household changed since they read it
+_contention = ContentionCounters()
+
+def write_metrics() -> dict:
+    return {'queue': _write_queue.metrics.snapshot(), 'contention': _contention.snapshot()}
+
+class _ItemEdit:
+    """
+    A change to one shopping list item, found by its id. It can be applied to the whole list like any other mutation,
+    but in collection mode a round made only of these reads and writes just the items they name, see _write_item_edits.
+    """
+    def __init__(self, item_id: str, change: Callable[[dict], dict | None], missing: str, to_checked: bool = False,
+                 status: int = 400):
+        self.item_id = item_id
+        # returns the changed item, or None to delete it
+        self.change = change
+        # what to fail with if the item isn't on the list
+        self.missing = missing
+        self.status = status
+        # whether the item moves to the top of the checked items, as checking one does
+        self.to_checked = to_checked
+
+    def __call__(self, shopping_list: list[dict]) -> list[dict]:
+        index = next((i for i, item in enumerate(shopping_list) if item['id'] == self.item_id), None)
+        if index is None:
+            print(f'item with id {self.item_id} did not exist and so was not updated')
+            raise HTTPException(status_code=self.status, detail=self.missing)
+        item = self.change(shopping_list.pop(index))
+        if item is None:
+            return shopping_list
+        if self.to_checked:
+            index = next((i for i, other in enumerate(shopping_list) if other['checked']), len(shopping_list))
+        shopping_list.insert(index, item)
+        return shopping_list
+
+class _ItemEdits:
+    """
+    The item edits a request queued together, which succeed or fail as one.
+    """
+    def __init__(self, edits: list[_ItemEdit]):
+        self.edits = edits
+
+    def __call__(self, shopping_list: list[dict]) -> list[dict]:
+        for edit in self.edits:
+            shopping_list = edit(shopping_list)
+        return shopping_list
 
 class HouseholdRepository:
+    """
+    FastAPI builds one of these per request and shares it between every controller in that request,
+    so it doubles as the request's unit of work: each household document is read at most once,
+    validated at most once per change, and with defer_writes the changes are held until flush commits them.
+    Deferred changes are written without a precondition, so an array changed more than once in a request is written
+    as this request last saw it, and an edit another request made to that array between our read and flush is lost.
+    Read-modify-write changes made through _mutate don't have this window, since they are re-applied to a fresh read.
+    Reads that only need some fields fetch just those fields, and the rest of the document is filled in if something needs it later.
+    """
     def __init__(self, household_ref: Annotated[CollectionReference, Depends(household_ref)]):
         self.household_ref = household_ref
+        # raw household documents read during this request, kept up to date with our own writes
+        self._documents: dict[str, dict] = {}
+        # which fields of each snapshot have been read, None once the whole document has been
+        self._loaded: dict[str, set[str] | None] = {}
+        self._households: dict[str, Household] = {}
+        self._views: dict[str, dict[type, BaseModel]] = {}
+        self._pending: dict[str, dict] = {}
+        self.items_in_collection = SHOPPING_LIST_STORAGE == 'collection'
+        self.menu_in_map = MENU_STORAGE == 'map'
+        # shopping lists stored as items
+        self._lists: dict[str, list[dict]] = {}
+        # (household id, field) -> read-modify-write changes of that array deferred until flush
+        self._mutations: dict[tuple[str, str], list[Callable[[list[dict]], list[dict]]]] = {}
+        self._deferred = False
+        # controllers may fan reads out across threads within the request
+        self._lock = RLock()
+
+    def _document(self, household_id: str, fields: list[str] | None = None) -> dict:
+        """
+        Returns the snapshot of a household with at least the given fields read, or all of them if fields is None.
+        """
+        with self._lock:
+            if household_id in self._loaded:
+                loaded = self._loaded[household_id]
+                if loaded is None or (fields is not None and loaded.issuperset(fields)):
+                    return self._documents[household_id]
+
+            ref = self.household_ref.document(household_id)
+            data = ref.get().to_dict() if fields is None else ref.get(field_paths=fields).to_dict()
+            document = self._documents.get(household_id)
+            if data is not None and document is not None:
+                fresh = set(data) - set(document)
+                # fields we already have may hold writes that aren't flushed yet, so they win
+                data.update(document)
+                # changes inside maps that weren't read yet still have to be laid over them
+                pending = self._pending.get(household_id, {})
+                self._apply(data, {f: v for f, v in pending.items() if self._top(f) != f and self._top(f) in fresh})
+            self._documents[household_id] = data
+            self._loaded[household_id] = None if fields is None else self._loaded.get(household_id, set()) | set(fields)
+            return data
+
+    def _field(self, household_id: str, field: str):
+        # a copy, so an edit that fails halfway can't leave the snapshot half changed
+        return deepcopy(self._document(household_id, [field])[field])
+
+    def _view(self, household_id: str, model: type[View]) -> View:
+        """
+        Validates only the fields the model declares. A household that has already been fully validated is reused,
+        since it has every field the partial models have. Callers get a copy, like get_household.
+        """
+        with self._lock:
+            if household_id in self._households:
+                return self._households[household_id].model_copy(deep=True)
+            views = self._views.setdefault(household_id, {})
+            if model not in views:
+                views[model] = model.model_validate(self._document(household_id, list(model.model_fields)))
+            return views[model].model_copy(deep=True)
+
+    @staticmethod
+    def _apply(document: dict, changes: dict) -> None:
+        for path, value in changes.items():
+            # nested field paths like menu.{recipe id} change a key inside a map
+            *parents, field = FieldPath.from_api_repr(path).parts
+            target = document
+            for parent in parents:
+                if not isinstance(target.get(parent), dict):
+                    target[parent] = {}
+                target = target[parent]
+            if value is DELETE_FIELD:
+                target.pop(field, None)
+            elif isinstance(value, ArrayUnion):
+                current = target.get(field, [])
+                target[field] = current + [x for x in value.values if x not in current]
+            elif isinstance(value, ArrayRemove):
+                target[field] = [x for x in target.get(field, []) if x not in value.values]
+            else:
+                target[field] = value
+
+    @staticmethod
+    def _top(path: str) -> str:
+        return FieldPath.from_api_repr(path).parts[0]
+
+    @staticmethod
+    def _defer(pending: dict, path: str, value) -> None:
+        """
+        Adds a plain value to the pending changes. Firestore rejects an update where one path is inside another,
+        so a change inside a pending map is folded into it, and a change to a whole map replaces changes inside it.
+        """
+        parts = FieldPath.from_api_repr(path).parts
+        for other in list(pending):
+            other_parts = FieldPath.from_api_repr(other).parts
+            if other_parts[:len(parts)] == parts:
+                del pending[other]
+            elif parts[:len(other_parts)] == other_parts:
+                if not isinstance(pending[other], dict):
+                    pending[other] = {}
+                HouseholdRepository._apply(pending[other], {FieldPath(*parts[len(other_parts):]).to_api_repr(): value})
+                return
+        pending[path] = value
+
+    def _mirror(self, household_id: str, changes: dict) -> dict | None:
+        """
+        Applies changes to the snapshot of a household, if there is one, and returns it.
+        """
+        with self._lock:
+            if household_id in self._documents:
+                # array transforms can only be mirrored onto the field's current value
+                self._document(household_id, [f for f, v in changes.items() if isinstance(v, (ArrayUnion, ArrayRemove))])
+            document = self._documents.get(household_id)
+            self._households.pop(household_id, None)
+            self._views.pop(household_id, None)
+            if document is not None:
+                loaded = self._loaded[household_id]
+                # a change inside a map that hasn't been read is laid over it when it is, see _document
+                mirrored = {f: v for f, v in changes.items() if loaded is None or self._top(f) in loaded or self._top(f) == f}
+                self._apply(document, mirrored)
+                if loaded is not None:
+                    loaded.update(f for f in mirrored if self._top(f) == f)
+            return document
+
+    def _save(self, household_id: str, changes: dict) -> None:
+        with self._lock:
+            document = self._mirror(household_id, changes)
+            if self._deferred and document is not None:
+                pending = self._pending.setdefault(household_id, {})
+                for field, value in changes.items():
+                    if isinstance(value, (ArrayUnion, ArrayRemove)) and field in pending:
+                        # a field changed twice is written as where it ended up, rather than stacking transforms
+                        pending[field] = deepcopy(document[field])
+                    elif isinstance(value, (ArrayUnion, ArrayRemove)):
+                        pending[field] = value
+                    else:
+                        self._defer(pending, field, value)
+            else:
+                self.household_ref.document(household_id).update(changes)
+
+    def _forget_document(self, household_id: str) -> None:
+        """
+        For writes that can't be mirrored in the snapshot. Anything deferred for the household is written first.
+        """
+        if household_id in self._pending:
+            self.household_ref.document(household_id).update(self._pending.pop(household_id))
+        self._documents.pop(household_id, None)
+        self._loaded.pop(household_id, None)
+        self._households.pop(household_id, None)
+        self._views.pop(household_id, None)
+
+    def defer_writes(self) -> None:
+        self._deferred = True
+
+    def flush(self) -> None:
+        """
+        Commits every deferred change. Read-modify-write changes of arrays go through the write queue, one write per array,
+        and the other changes follow in a single batch. These are separate writes, so this is not all-or-nothing:
+        if a queued change can no longer be applied, for example because its item has been removed, it raises and the
+        changes after it aren't written, but the arrays written before it stay written.
+        """
+        pending, self._pending = self._pending, {}
+        mutations, self._mutations = self._mutations, {}
+        # the queued changes are the ones that can fail, so they go first and a failure leaves less half written
+        for (household_id, field), field_mutations in mutations.items():
+            self._commit_mutations(household_id, field, field_mutations)
+        self._commit([('update', self.household_ref.document(household_id), changes) for household_id, changes in pending.items()])
+
+    def _commit(self, writes: list[tuple]) -> None:
+        for start in range(0, len(writes), BATCH_SIZE):
+            batch = self.batch()
+            for method, *args in writes[start:start + BATCH_SIZE]:
+                getattr(batch, method)(*args)
+            batch.commit()
+
+    def batch(self) -> Batch:
+        """
+        Starts a batch that the write methods can add to, so related writes across collections land atomically.
+        """
+        return Batch(db)
+
+    def remember_membership(self, user_id: str, household_id: str) -> None:
+        with _memberships_lock:
+            _memberships[(self.household_ref.id, user_id)] = household_id
+
+    def _forget_membership(self, user_id: str) -> None:
+        with _memberships_lock:
+            _memberships.pop((self.household_ref.id, user_id), None)
+
+    def find_cached_household(self, user_id: str) -> str | None:
+        """
+        Returns the household the user was last seen in without touching the database, or None if it isn't known.
+        """
+        with _memberships_lock:
+            return _memberships.get((self.household_ref.id, user_id))
     
     def find_household(self,user_id: str) -> str | None:
         """
         Finds the id of the household which the user belongs in.
         Returns None if the user does not belong to one.
         """
+        household_id = self.find_cached_household(user_id)
+        if household_id is not None:
+            return household_id
+
         # Find the household that the user is in
         households = self.household_ref.where(filter=Or([
             FieldFilter('users', 'array_contains', user_id),
@@ -27,29 +310,67 @@ class HouseholdRepository:
         if len(households) == 0:
             return None
         else:
+            self.remember_membership(user_id, households[0].id)
             return households[0].id
 
-    def create_household(self,user_id: str) -> str:
+    def create_household(self,user_id: str, batch: WriteBatch | None = None) -> str:
         # Create a new household
         household = Household(owner_id=user_id)
-        household_ref = self.household_ref.add( household.model_dump())
-        return household_ref[1].id
+        if batch is not None:
+            ref = self.household_ref.document()
+            batch.set(ref, household.model_dump())
+            household_id = ref.id
+        else:
+            household_id = self.household_ref.add( household.model_dump())[1].id
+        after_commit(batch, partial(self.remember_membership, user_id, household_id))
+        return household_id
 
     def get_join_code(self,household_id: str) -> JoinCode | None:
-        return self.get_household(household_id).join_code
+        return self._view(household_id, HouseholdJoinCode).join_code
     
-    def add_user(self, household_id: str, user_id: str) -> None:
-        self.household_ref.document(household_id).update({
-            'users': ArrayUnion([user_id])
-        })
+    def add_user(self, household_id: str, user_id: str, batch: WriteBatch | None = None) -> None:
+        self._forget_document(household_id)
+        ref = self.household_ref.document(household_id)
+        changes = {'users': ArrayUnion([user_id])}
+        if batch is not None:
+            batch.update(ref, changes)
+        else:
+            ref.update(changes)
+        after_commit(batch, partial(self.remember_membership, user_id, household_id))
 
-    def kick_user(self, household_id: str, user_id: str) -> None:
-        self.household_ref.document(household_id).update({
-            'users': ArrayRemove([user_id])
-        })
+    def kick_user(self, household_id: str, user_id: str, batch: WriteBatch | None = None) -> None:
+        self._forget_document(household_id)
+        ref = self.household_ref.document(household_id)
+        changes = {'users': ArrayRemove([user_id])}
+        if batch is not None:
+            batch.update(ref, changes)
+        else:
+            ref.update(changes)
+        after_commit(batch, partial(self._forget_membership, user_id))
 
-    def delete_household(self, household_id: str) -> None:
-        self.household_ref.document(household_id).delete()
+    def delete_household(self, household_id: str, batch: WriteBatch | None = None) -> None:
+        self._pending.pop(household_id, None)
+        self._forget_document(household_id)
+        ref = self.household_ref.document(household_id)
+        # items in a subcollection outlive their parent unless they are deleted too
+        items = [doc.reference for doc in self._items_ref(household_id).select([]).stream()] if self.items_in_collection else []
+        for key in [key for key in self._mutations if key[0] == household_id]:
+            del self._mutations[key]
+        self._lists.pop(household_id, None)
+        if batch is not None:
+            batch.delete(ref)
+            for item in items:
+                batch.delete(item)
+        elif len(items) > 0:
+            self._commit([('delete', ref)] + [('delete', item) for item in items])
+        else:
+            ref.delete()
+        after_commit(batch, partial(self._forget_household_members, household_id))
+
+    def _forget_household_members(self, household_id: str) -> None:
+        with _memberships_lock:
+            for key in [k for k, v in _memberships.items() if k[0] == self.household_ref.id and v == household_id]:
+                _memberships.pop(key, None)
 
     def get_household_by_code(self, code: str) -> Household | None:
         ref = self.household_ref.where(filter=FieldFilter("join_code","!=",None)).where(filter=FieldFilter("join_code.code","==",code))
@@ -65,191 +386,454 @@ class HouseholdRepository:
 
     
     def update_code(self, household_id: str, new_code: JoinCode) -> None:
-        self.household_ref.document(household_id).update({
+        self._save(household_id, {
             'join_code': new_code.model_dump()
         })
 
-    def add_items(self, household_id: str, items: list[ShoppingItem]) -> None:
+    def _items_ref(self, household_id: str) -> CollectionReference:
+        return self.household_ref.document(household_id).collection('shopping_list')
+
+    def _read_list(self, household_id: str) -> list[dict]:
+        """
+        Returns a copy of the household's shopping list as raw items, in order.
+        """
+        if not self.items_in_collection:
+            return self._field(household_id, 'shopping_list')
+        with self._lock:
+            if household_id not in self._lists:
+                self._lists[household_id] = [{**doc.to_dict(), 'id': doc.id} for doc in self._items_ref(household_id).order_by('order').stream()]
+            return deepcopy(self._lists[household_id])
+
+    def _read_mutable(self, household_id: str, field: str) -> list[dict]:
+        if field == 'shopping_list':
+            return self._read_list(household_id)
+        return self._field(household_id, field)
+
+    def _remember(self, household_id: str, field: str, value: list[dict]) -> None:
+        with self._lock:
+            if field == 'shopping_list' and self.items_in_collection:
+                self._lists[household_id] = deepcopy(value)
+                return
+            document = self._documents.get(household_id)
+            if document is not None:
+                document[field] = deepcopy(value)
+                if self._loaded[household_id] is not None:
+                    self._loaded[household_id].add(field)
+            self._households.pop(household_id, None)
+            self._views.pop(household_id, None)
+
+    def _mutate(self, household_id: str, field: str, mutation: Callable[[list[dict]], list[dict]]) -> None:
+        """
+        Changes an array field through the write queue, which re-applies the mutation to the stored value
+        together with any other requests' mutations of the same field, so concurrent edits are never lost.
+        When writes are deferred the mutation is tried on the snapshot straight away, so bad edits fail early
+        and later reads see it, and it is queued by flush.
+        """
+        if not self._deferred:
+            self._commit_mutations(household_id, field, [mutation])
+            return
+        with self._lock:
+            before = self._read_mutable(household_id, field)
+            after = mutation(deepcopy(before))
+            if after != before:
+                self._mutations.setdefault((household_id, field), []).append(mutation)
+                self._remember(household_id, field, after)
+
+    def _commit_mutations(self, household_id: str, field: str, mutations: list[Callable[[list[dict]], list[dict]]]) -> None:
+        def apply_all(value: list[dict]) -> list[dict]:
+            for mutation in mutations:
+                value = mutation(value)
+            return value
+
+        mutation = _ItemEdits(mutations) if all(isinstance(m, _ItemEdit) for m in mutations) else apply_all
+        value = _write_queue.run((self.household_ref.id, household_id, field), mutation, partial(self._write_mutations, household_id, field))
+        if value is None:
+            # only the edited items were read, so what we have of the list is out of date
+            with self._lock:
+                self._lists.pop(household_id, None)
+            return
+        self._remember(household_id, field, value)
+
+    @staticmethod
+    def _apply_mutations(before: list[dict], mutations: list[Callable[[list[dict]], list[dict]]]) -> tuple[list[dict], list]:
+        """
+        A mutation that raises is skipped and gets its exception back as its outcome, the rest get the final value.
+        """
+        value = before
+        outcomes = []
+        for mutation in mutations:
+            try:
+                value = mutation(deepcopy(value))
+                outcomes.append(None)
+            except Exception as e:
+                outcomes.append(e)
+        return value, [value if outcome is None else outcome for outcome in outcomes]
+
+    def _write_mutations(self, household_id: str, field: str, mutations: list[Callable[[list[dict]], list[dict]]]) -> list:
+        """
+        Applies a round of queued mutations to the stored value and writes it once.
+        A field on the household is written only if the document hasn't changed since it was read, and is re-read and
+        retried if it has. Shopping list items in their own documents are written in a transaction instead,
+        since preconditions only cover one document.
+        """
+        if field == 'shopping_list' and self.items_in_collection:
+            if all(isinstance(m, _ItemEdits) for m in mutations) and sum(e.to_checked for m in mutations for e in m.edits) <= 1:
+                return self._run_transaction(partial(self._write_item_edits, household_id, mutations))
+
+            def write_items(transaction: Transaction) -> list:
+                before = [{**doc.to_dict(), 'id': doc.id} for doc in self._items_ref(household_id).order_by('order').stream(transaction=transaction)]
+                shopping_list, outcomes = self._apply_mutations(before, mutations)
+                for method, *args in self._list_writes(household_id, before, shopping_list):
+                    getattr(transaction, method)(*args)
+                return outcomes
+            return self._run_transaction(write_items)
+
         ref = self.household_ref.document(household_id)
-        shopping_list: list = ref.get().to_dict()['shopping_list']
+        def write() -> list:
+            snapshot = ref.get(field_paths=[field])
+            if not snapshot.exists:
+                raise HTTPException(status_code=404, detail="The household does not exist")
+            before = (snapshot.to_dict() or {}).get(field, [])
+            value, outcomes = self._apply_mutations(before, mutations)
+            if value != before:
+                ref.update({field: value}, option=db.write_option(last_update_time=snapshot.update_time))
+            return outcomes
+        try:
+            return retry_on_conflict(write, (FailedPrecondition, Aborted), _contention)
+        except (FailedPrecondition, Aborted):
+            raise HTTPException(status_code=409, detail="The household is being changed by someone else, try again")
+
+    def _run_transaction(self, write: Callable[[Transaction], Any]) -> Any:
+        return transactional(write)(db.transaction())
+
+    def _write_item_edits(self, household_id: str, mutations: list[_ItemEdits], transaction: Transaction) -> list:
+        """
+        Writes a round of item edits in collection mode, reading only the items they name rather than the whole list.
+        At most one edit in the round moves its item, and finding its new place also reads the checked items,
+        which the sweeper keeps few, and the item before them.
+        Edits that succeed get None back instead of the list, since only part of it was read.
+        """
+        items = self._items_ref(household_id)
+        ids = {edit.item_id for mutation in mutations for edit in mutation.edits}
+        docs = transaction.get_all([items.document(item_id) for item_id in ids])
+        before = sorted([{**doc.to_dict(), 'id': doc.id} for doc in docs if doc.exists and doc.id in ids], key=lambda item: item['order'])
+        after, outcomes = self._apply_mutations(before, mutations)
+        stored = {item['id']: item for item in before}
+        changed = {item['id']: item for item in after}
+
+        for mutation, outcome in zip(mutations, outcomes):
+            if isinstance(outcome, Exception):
+                continue
+            for edit in mutation.edits:
+                if edit.to_checked and edit.item_id in changed:
+                    changed[edit.item_id]['order'] = self._checked_top_key(items, (stored.keys() - changed.keys()) | {edit.item_id}, transaction)
+
+        for item_id, item in stored.items():
+            if item_id not in changed:
+                transaction.delete(items.document(item_id))
+            elif changed[item_id] != item:
+                transaction.set(items.document(item_id), changed[item_id])
+        return [outcome if isinstance(outcome, Exception) else None for outcome in outcomes]
+
+    @staticmethod
+    def _checked_top_key(items: CollectionReference, skip: set[str], transaction: Transaction) -> str:
+        """
+        The key that puts an item at the top of the checked items, or at the end of the list if none are, leaving out the items in skip.
+        """
+        checked = items.where(filter=FieldFilter('checked', '==', True)).select(['order']).stream(transaction=transaction)
+        first = min((doc.to_dict()['order'] for doc in checked if doc.id not in skip), default=None)
+        query = items.order_by('order', direction=Query.DESCENDING)
+        if first is not None:
+            query = query.start_after({'order': first})
+        # the items in skip may be among the ones just before, so enough are read to get past them
+        previous = [doc for doc in query.limit(len(skip) + 1).select(['order']).stream(transaction=transaction) if doc.id not in skip]
+        return key_between(previous[0].to_dict()['order'] if len(previous) > 0 else None, first)
+
+    def _list_writes(self, household_id: str, before: list[dict], shopping_list: list[dict]) -> list[tuple]:
+        """
+        The writes that turn the stored items from before into shopping_list. Only the items that changed or moved
+        are written, and moved items get new keys between their neighbours rather than renumbering the list.
+        """
+        stored = {item['id']: item for item in before}
+        # items that changed are written anyway, so they are free to take a new key
+        keys = [item.get('order') if stored.get(item['id']) == item else None for item in shopping_list]
+        for item, key in zip(shopping_list, rekey(keys)):
+            item['order'] = key
+        items = self._items_ref(household_id)
+        writes = [('set', items.document(item['id']), item) for item in shopping_list if stored.get(item['id']) != item]
+        for item_id in stored.keys() - {item['id'] for item in shopping_list}:
+            writes.append(('delete', items.document(item_id)))
+        return writes
+
+    def add_items(self, household_id: str, items: list[ShoppingItem]) -> None:
         for item in items:
             if item.id == None:
                 item.id = uuid4().__str__()
-            shopping_list.insert(0, item.model_dump())
-        ref.update({"shopping_list": shopping_list})
+
+        def add(shopping_list: list) -> list:
+            for item in items:
+                shopping_list.insert(0, item.model_dump())
+            return shopping_list
+        self._mutate(household_id, 'shopping_list', add)
     
     def add_item(self, household_id: str, item: ShoppingItem) -> None:
-        ref = self.household_ref.document(household_id)
-        shopping_list: list = ref.get().to_dict()["shopping_list"]
-
-        if item.id == None:
-            item.id = uuid4().__str__()
-
-        shopping_list.insert(0, item.model_dump())
-        ref.update({
-            "shopping_list": shopping_list
-        })
+        self.add_items(household_id, [item])
     
     def get_household(self, household_id: str) -> Household:
-        return Household.model_validate(self.household_ref.document(household_id).get().to_dict())
+        """
+        Returns a copy of the household as this request sees it, so changing it can't change what later reads return.
+        """
+        with self._lock:
+            if household_id not in self._households:
+                self._households[household_id] = Household.model_validate(self._document(household_id))
+            return self._households[household_id].model_copy(deep=True)
     
     def get_shopping_list(self, household_id: str) -> list[ShoppingItem]:
-        household = self.get_household(household_id)
-        return household.shopping_list
+        if self.items_in_collection:
+            return [ShoppingItem.model_validate(item) for item in self._read_list(household_id)]
+        return self._view(household_id, HouseholdShoppingList).shopping_list
     
     def check_item(self, household_id: str, id: str) -> None:
-        ref = self.household_ref.document(household_id)
-        shopping_list: list = ref.get().to_dict()["shopping_list"]
-
-        try:
-            index = [x["id"] for x in shopping_list].index(id)
-        except:
-            print(f'item with id {id} did not exist and so was not updated')
-            raise HTTPException(status_code=400,detail="The checked item did not exist")
-
-        shopping_list[index]["checked"] = not shopping_list[index]["checked"]
+        def check(item: dict) -> dict:
+            item["checked"] = not item["checked"]
 
-        # track when the item was checked
-        if shopping_list[index]["checked"]:
-            shopping_list[index]["time_checked"] = datetime.now(timezone.utc)
-        else:
-            shopping_list[index]["time_checked"] = None
-        
-        # Insert the checked item at the top of the checked items, whether it is now checked or unchecked
-        checked = shopping_list.pop(index)
-        new_index = -1
-        for i,item in enumerate(shopping_list):
+            # track when the item was checked
             if item["checked"]:
-                new_index = i
-                break
-        if new_index == -1:
-            shopping_list.append(checked)
-        else:
-            shopping_list.insert(new_index, checked)
+                item["time_checked"] = datetime.now(timezone.utc)
+            else:
+                item["time_checked"] = None
+            return item
 
-        ref.update({
-            "shopping_list": shopping_list
-        })
+        # Insert the checked item at the top of the checked items, whether it is now checked or unchecked
+        self._mutate(household_id, 'shopping_list', _ItemEdit(id, check, "The checked item did not exist", to_checked=True))
     
     def update_item(self, household_id: str, id: str, item: ShoppingItem) -> None:
-        ref = self.household_ref.document(household_id)
-        shopping_list = ref.get().to_dict()["shopping_list"]
+        def update(stored: dict) -> dict:
+            stored['name'] = item.name
+            return stored
 
-        try:
-            index = [x["id"] for x in shopping_list].index(id)
-        except:
-            print(f'item with id {id} did not exist and so was not updated')
-            raise HTTPException(status_code=400,detail="The updated item did not exist")
-
-
-        shopping_list[index]['name'] = item.name
-        ref.update({
-            "shopping_list": shopping_list
-        })
+        self._mutate(household_id, 'shopping_list', _ItemEdit(id, update, "The updated item did not exist"))
     
-    def move_item(self, household_id: str, from_index: int, to_index: int) -> None:
-        ref = self.household_ref.document(household_id)
-        shopping_list: list = ref.get().to_dict()["shopping_list"]
+    def move_item(self, household_id: str, id: str, before_id: str | None) -> None:
+        """
+        Moves the item in front of the item before_id, or to the end if it is None. Items are named by id rather than
+        by position, so the move means the same thing when the write queue applies it to a list others have changed.
+        Fails with a 409 if either item has been removed.
+        """
+        def move(shopping_list: list) -> list:
+            ids = [x['id'] for x in shopping_list]
+            if id not in ids or (before_id is not None and before_id not in ids):
+                raise HTTPException(status_code=409, detail="The item was removed by someone else, try again")
+            item = shopping_list.pop(ids.index(id))
+            ids.remove(id)
+            shopping_list.insert(ids.index(before_id) if before_id is not None else len(shopping_list), item)
+            return shopping_list
 
-        shopping_list.insert(to_index,shopping_list.pop(from_index))
-        ref.update({
-            "shopping_list": shopping_list
-        })
+        self._mutate(household_id, 'shopping_list', move)
     
     def reorder_items(self, household_id: str, ordered_list: list[ShoppingItem]) -> None:
-        ref = self.household_ref.document(household_id)
-        shopping_list: list = ref.get().to_dict()["shopping_list"]
-        shopping_items: dict = {}
-        out_list = []
-
-        # put the content from the stored shopping list in the order of the ordered list
-        for item in shopping_list:
-            shopping_items[item["id"]] = item
-
-        for item in ordered_list:
-            if item.id in shopping_items and shopping_items[item.id]['checked'] == item.checked:
-                out_list.append(shopping_items[item.id])
-                del shopping_items[item.id]
-        
-        for item in shopping_items.values():
-            if item['checked']:
-                out_list.append(item)
-            else:
-                out_list.insert(0,item)
-        
-        ref.update({
-            "shopping_list": out_list
-        })
+        def reorder(shopping_list: list) -> list:
+            shopping_items: dict = {}
+            out_list = []
 
+            # put the content from the stored shopping list in the order of the ordered list
+            for item in shopping_list:
+                shopping_items[item["id"]] = item
 
-    def remove_item(self, household_id: str, index: int) -> None:
-        ref = self.household_ref.document(household_id)
-        shopping_list = ref.get().to_dict()["shopping_list"]
+            for item in ordered_list:
+                if item.id in shopping_items and shopping_items[item.id]['checked'] == item.checked:
+                    out_list.append(shopping_items[item.id])
+                    del shopping_items[item.id]
+            
+            for item in shopping_items.values():
+                if item['checked']:
+                    out_list.append(item)
+                else:
+                    out_list.insert(0,item)
+            return out_list
 
-        shopping_list.pop(index)
-        ref.update({
-            "shopping_list": shopping_list
-        })
+        self._mutate(household_id, 'shopping_list', reorder)
+
+
+    def remove_item(self, household_id: str, id: str) -> None:
+        # by id rather than position, for the same reason as move_item
+        self._mutate(household_id, 'shopping_list', _ItemEdit(id, lambda item: None, "The item was removed by someone else, try again", status=409))
     
     def remove_items(self, household_id: str, valid_condition):
-        ref = self.household_ref.document(household_id)
-        shopping_list = ref.get().to_dict()['shopping_list']
-
-        initial_size = len(shopping_list)
-        shopping_list = list(filter(valid_condition, shopping_list))
-        if len(shopping_list) < initial_size:
-            ref.update({
-                "shopping_list": shopping_list
-            })
+        self._mutate(household_id, 'shopping_list', lambda shopping_list: list(filter(valid_condition, shopping_list)))
     
     def get_menu_items(self, household_id: str) -> list[MenuItem]:
-        return self.get_household(household_id).menu_recipes
+        return self._view(household_id, HouseholdMenu).menu_items()
+
+    @staticmethod
+    def _menu_path(recipe_id: str, *fields: str) -> str:
+        return FieldPath('menu', recipe_id, *fields).to_api_repr()
     
-    def add_recipe_to_menu(self, household_id: str, menu_item: MenuItem) -> None:
+    def _write_menu_entry(self, household_id: str, recipe_id: str, change: Callable[[dict | None, bool], dict | None]) -> dict | None:
+        """
+        Changes one item of the menu map, reading only that item and the old array rather than the whole menu.
+        change gets the item, or None if it isn't in the map, and whether the recipe is still in the array,
+        and returns the field path writes to make, if any. They are written only if the household hasn't changed
+        since it was read, and retried if it has, so an item removed in between isn't brought back as a stub.
+        These writes aren't deferred to flush, since a precondition covers the whole household.
+        Returns the writes that were made.
+        """
         ref = self.household_ref.document(household_id)
-        ref.update({
+        def write() -> dict | None:
+            snapshot = ref.get(field_paths=[self._menu_path(recipe_id), 'menu_recipes'])
+            if not snapshot.exists:
+                raise HTTPException(status_code=404, detail="The household does not exist")
+            data = snapshot.to_dict() or {}
+            entry = data.get('menu', {}).get(recipe_id)
+            # edits to a removed item can leave a stub without a recipe id, which reads skip as well
+            if not isinstance(entry, dict) or not entry.get('recipe_id'):
+                entry = None
+            in_array = any(x.get('recipe_id') == recipe_id for x in data.get('menu_recipes', []))
+            changes = change(entry, in_array)
+            if changes:
+                ref.update(changes, option=db.write_option(last_update_time=snapshot.update_time))
+            return changes
+        try:
+            changes = retry_on_conflict(write, (FailedPrecondition, Aborted), _contention)
+        except (FailedPrecondition, Aborted):
+            raise HTTPException(status_code=409, detail="The household is being changed by someone else, try again")
+        if changes:
+            self._mirror(household_id, changes)
+        return changes
+
+    def add_recipe_to_menu(self, household_id: str, menu_item: MenuItem) -> None:
+        """
+        Raises a 409 if the recipe is already on the menu.
+        """
+        # an item without a recipe id has nothing to be keyed by, so it stays in the array
+        if self.menu_in_map and menu_item.recipe_id is not None:
+            def add(entry: dict | None, in_array: bool) -> dict:
+                if entry is not None or in_array:
+                    raise HTTPException(status_code=409, detail="That recipe is already added to the menu.")
+                # ordered by when they were added
+                return {self._menu_path(menu_item.recipe_id): {**menu_item.model_dump(), 'order': datetime.now(timezone.utc).timestamp()}}
+            self._write_menu_entry(household_id, menu_item.recipe_id, add)
+            return
+        if menu_item.recipe_id is not None and any(x.recipe_id == menu_item.recipe_id for x in self.get_menu_items(household_id)):
+            raise HTTPException(status_code=409, detail="That recipe is already added to the menu.")
+        self._save(household_id, {
             "menu_recipes": ArrayUnion([menu_item.model_dump()])
         })
     
     def get_menu_item_by_index(self, household_id: str, index: int) -> MenuItem:
-        menu = self.get_household(household_id).menu_recipes
+        menu = self.get_menu_items(household_id)
         assert index < len(menu), "Invalid index for menu item"
-        return MenuItem.model_validate(menu[index])
+        return menu[index]
     
     def get_user_ids(self, household_id: str) -> list[str]:
-        household = self.get_household(household_id)
+        household = self._view(household_id, HouseholdMembers)
         return [household.owner_id, *household.users]
     
     def remove_menu_item(self, household_id: str, recipe_id: str) -> None:
-        ref = self.household_ref.document(household_id)
-        menu_items_raw = ref.get().to_dict()['menu_recipes']
-
-        menu_items_raw = [x for x in menu_items_raw if x['recipe_id'] != recipe_id]
-        ref.update({
-            "menu_recipes" : menu_items_raw
-        })
+        in_array = True
+        if self.menu_in_map:
+            def remove(entry: dict | None, listed: bool) -> dict | None:
+                nonlocal in_array
+                in_array = listed
+                return {self._menu_path(recipe_id): DELETE_FIELD} if entry is not None else None
+            self._write_menu_entry(household_id, recipe_id, remove)
+        # items added before the map was used are still in the array
+        if in_array:
+            self._mutate(household_id, 'menu_recipes', lambda menu_items_raw: [x for x in menu_items_raw if x['recipe_id'] != recipe_id])
 
     def update_menu_item(self, household_id: str, index: int, updated: MenuItem) -> None:
-        ref = self.household_ref.document(household_id)
-        menu_items_raw = ref.get().to_dict()['menu_recipes']
+        if self.menu_in_map:
+            # the index refers to the menu as it was shown, so it has to be read
+            if self.get_menu_items(household_id)[index].recipe_id == updated.recipe_id:
+                self.update_menu_item_by_recipe_id(household_id, updated.recipe_id, updated)
+            return
+
+        def update(menu_items_raw: list) -> list:
+            if menu_items_raw[index]['recipe_id'] == updated.recipe_id:
+                menu_items_raw[index]['note'] = updated.note
+                menu_items_raw[index]['date'] = updated.date
+            return menu_items_raw
 
-        if menu_items_raw[index]['recipe_id'] == updated.recipe_id:
-            menu_items_raw[index]['note'] = updated.note
-            menu_items_raw[index]['date'] = updated.date
-            ref.update({
-                "menu_recipes" : menu_items_raw
-            })
+        self._mutate(household_id, 'menu_recipes', update)
 
     def update_menu_item_by_recipe_id(self, household_id: str, recipe_id: str, updated: MenuItem) -> None:
-        ref = self.household_ref.document(household_id)
-        menu_items_raw = ref.get().to_dict()['menu_recipes']
-
-        for menu_item in menu_items_raw:
-            if menu_item['recipe_id'] == recipe_id:
-                menu_item['note'] = updated.note
-                menu_item['date'] = updated.date
-                ref.update({
-                    "menu_recipes" : menu_items_raw
-                })
-                break
-    
\ No newline at end of file
+        if self.menu_in_map:
+            def update_entry(entry: dict | None, in_array: bool) -> dict | None:
+                if entry is None:
+                    return None
+                return {self._menu_path(recipe_id, 'note'): updated.note, self._menu_path(recipe_id, 'date'): updated.date}
+            if self._write_menu_entry(household_id, recipe_id, update_entry):
+                return
+
+        # not in the map, so it is either still in the array or not on the menu at all
+        def update(menu_items_raw: list) -> list:
+            for menu_item in menu_items_raw:
+                if menu_item['recipe_id'] == recipe_id:
+                    menu_item['note'] = updated.note
+                    menu_item['date'] = updated.date
+                    break
+            return menu_items_raw
+
+        self._mutate(household_id, 'menu_recipes', update)
+    
+    def _catalog_ref(self, household_id: str) -> DocumentReference:
+        return self.household_ref.document(household_id).collection('catalog').document('recipes')
+
+    def get_catalog(self, household_id: str) -> dict[str, CatalogEntry] | None:
+        """
+        Returns the household's recipe catalog keyed by recipe id, or None if it has to be rebuilt.
+        """
+        data = self._catalog_ref(household_id).get().to_dict()
+        # a recipe write after forget_catalog leaves a catalog with only that recipe in it
+        if data is None or not data.get('complete', False):
+            return None
+        try:
+            return {recipe_id: CatalogEntry.model_validate(entry) for recipe_id, entry in data.get('recipes', {}).items()}
+        except ValidationError:
+            # a record was added for a recipe the catalog didn't have yet
+            return None
+
+    def save_catalog(self, household_id: str, catalog: dict[str, CatalogEntry], batch: WriteBatch | None = None) -> None:
+        # merged, so an entry put by a recipe write that landed while the catalog was being rebuilt isn't dropped
+        changes = {'recipes': {recipe_id: entry.model_dump() for recipe_id, entry in catalog.items()}, 'complete': True}
+        if batch is not None:
+            batch.set(self._catalog_ref(household_id), changes, merge=True)
+        else:
+            self._catalog_ref(household_id).set(changes, merge=True)
+
+    def put_catalog_entry(self, household_id: str, recipe_id: str, entry: CatalogEntry, batch: WriteBatch | None = None) -> None:
+        changes = {'recipes': {recipe_id: entry.model_dump()}}
+        if batch is not None:
+            batch.set(self._catalog_ref(household_id), changes, merge=True)
+        else:
+            self._catalog_ref(household_id).set(changes, merge=True)
+
+    def record_in_catalog(self, household_id: str, recipe_id: str, record: Record, batch: WriteBatch | None = None) -> None:
+        rollup = {'times_made': Increment(1), 'last_made': record.timestamp}
+        if record.rating is not None:
+            rollup['rating_sum'] = Increment(record.rating)
+            rollup['rating_count'] = Increment(1)
+        changes = {'recipes': {recipe_id: rollup}}
+        if batch is not None:
+            batch.set(self._catalog_ref(household_id), changes, merge=True)
+        else:
+            self._catalog_ref(household_id).set(changes, merge=True)
+
+    def forget_catalog(self, household_id: str, batch: WriteBatch | None = None) -> None:
+        """
+        Drops the catalog so it is rebuilt on its next read, for when the household's members change.
+        """
+        if batch is not None:
+            batch.delete(self._catalog_ref(household_id))
+        else:
+            self._catalog_ref(household_id).delete()
+    
+
+def household_unit_of_work(repo: Annotated[HouseholdRepository, Depends()]):
+    """
+    Makes the request's HouseholdRepository hold its writes until the route has finished, then commits them with flush.
+    Nothing it holds is written if the route raises, but flush itself can fail partway, see flush.
+    """
+    repo.defer_writes()
+    yield repo
+    repo.flush()
@@ -1,18 +1,35 @@
 from models.User import User
 from models.Recipe import Recipe, RecipeOut
 from models.Record import Record
-from firebase import user_ref
+from firebase import user_ref, recipe_author_ref, db, after_commit
 from fastapi import Depends
 from typing import Annotated
 from uuid import uuid4
 from google.cloud.firestore_v1.collection import CollectionReference
-from google.cloud.firestore_v1 import ArrayUnion, ArrayRemove
+from google.cloud.firestore_v1.batch import WriteBatch
+from google.cloud.firestore_v1 import ArrayUnion, ArrayRemove, Increment
 from google.cloud.firestore_v1.field_path import FieldPath
+from fanout import gather
+from functools import partial
+from cachetools import LRUCache
+from threading import Lock
 
+# Firestore rejects 'in' filters with more values than this
+IN_QUERY_LIMIT = 30
+# fields a User can't be built without, added to every projection
+REQUIRED_FIELDS = ['full_name', 'google_id']
+
+# (index collection id, recipe id) -> id of the user whose collection it is in, shared by every request in this worker.
+# Recipes never change owner and are only cached once their index entry is committed, so entries can't go stale
+# and only need evicting for space.
+_authors = LRUCache(maxsize=50000)
+_authors_lock = Lock()
 
 class UserRepository:
-    def __init__(self, user_ref: Annotated[CollectionReference, Depends(user_ref)]):
+    def __init__(self, user_ref: Annotated[CollectionReference, Depends(user_ref)], author_ref: Annotated[CollectionReference, Depends(recipe_author_ref)]):
         self.user_ref = user_ref
+        # recipe_authors/{recipe id} holds the recipe's author_id, so a recipe can be found from its id alone
+        self.author_ref = author_ref
 
     def create_user(self, user: User) -> str:
         self.user_ref.document(user.google_id).set( user.model_dump())
@@ -26,63 +43,237 @@ class UserRepository:
             return None
 
     
-    def get_users(self,white_list: list[str] | None = None) -> list[User]:
+    def get_users(self, white_list: list[str] | None = None, field_paths: list[str] | None = None) -> list[User]:
+        """
+        Returns every user, or only the ones in white_list in the same order.
+        Firestore only allows IN_QUERY_LIMIT values in an 'in' filter, so long white lists are split up and the chunks are queried side by side.
+        field_paths limits which fields are read; the fields a User needs are always included.
+        """
+        if white_list is None:
+            return [User.model_validate(doc.to_dict()) for doc in self._select(self.user_ref, field_paths).get()]
+
+        ids = list(dict.fromkeys(white_list))
+        chunks = [ids[i:i + IN_QUERY_LIMIT] for i in range(0, len(ids), IN_QUERY_LIMIT)]
         user_list = {}
-        if white_list != None:
-            user_docs = self.user_ref.where(FieldPath.document_id(), "in", white_list).get()
-        else:
-            user_docs = self.user_ref.get()
-        for user_data in user_docs:
-            user_list[user_data.id] = User.model_validate(user_data.to_dict())
-        if white_list != None:
-            # if there is a white list, we want to return the values in the same order they were in the list.
-            return [user_list[x] for x in white_list]
+        for user_docs in gather(*[partial(self._get_chunk, chunk, field_paths) for chunk in chunks]):
+            for user_data in user_docs:
+                user_list[user_data.id] = User.model_validate(user_data.to_dict())
+        # users that don't exist anymore are skipped rather than failing the whole list
+        return [user_list[x] for x in white_list if x in user_list]
+
+    def _get_chunk(self, user_ids: list[str], field_paths: list[str] | None):
+        query = self.user_ref.where(FieldPath.document_id(), "in", user_ids)
+        return self._select(query, field_paths).get()
+
+    @staticmethod
+    def _select(query, field_paths: list[str] | None):
+        if field_paths is None:
+            return query
+        return query.select(list(dict.fromkeys(REQUIRED_FIELDS + field_paths)))
+
+    def set_household(self, user_id: str, household_id: str | None, batch: WriteBatch | None = None) -> None:
+        """
+        Records which household the user belongs to on their own document, so it can be found without a query.
+        """
+        ref = self.user_ref.document(user_id)
+        changes = {'household_id': household_id}
+        if batch is not None:
+            batch.set(ref, changes, merge=True)
         else:
-            return list(user_list.values())
+            ref.set(changes, merge=True)
+
+    def _recipes(self, user_id: str) -> CollectionReference:
+        # each recipe is its own document, so a user's document stays small however many recipes they save
+        return self.user_ref.document(user_id).collection('recipes')
 
-    def add_recipe(self, user_id: str, recipe: Recipe) -> str:
+    @staticmethod
+    def _recipe_out(doc) -> RecipeOut:
+        recipe = doc.to_dict()
+        recipe['id'] = doc.id
+        return RecipeOut.model_validate(recipe)
+
+    def add_recipe(self, user_id: str, recipe: Recipe, batch: WriteBatch | None = None) -> str:
         recipe_id = uuid4().__str__()
-        self.user_ref.document(user_id).update({
-            f"recipes.{recipe_id}": recipe.model_dump()
-        })
+        own_batch = batch is None
+        if own_batch:
+            batch = db.batch()
+        batch.set(self._recipes(user_id).document(recipe_id), recipe.model_dump())
+        batch.set(self.author_ref.document(recipe_id), {'author_id': user_id})
+        batch.update(self.user_ref.document(user_id), {'recipe_count': Increment(1)})
+        if own_batch:
+            batch.commit()
+            self._remember_author(recipe_id, user_id)
+        else:
+            after_commit(batch, partial(self._remember_author, recipe_id, user_id))
         return recipe_id
     
+    def _remember_author(self, recipe_id: str, user_id: str) -> None:
+        with _authors_lock:
+            _authors[(self.author_ref.id, recipe_id)] = user_id
+
+    def get_recipe_author(self, recipe_id: str) -> str | None:
+        """
+        Returns who owns the recipe from the index, or None if the recipe isn't in it.
+        """
+        with _authors_lock:
+            if (self.author_ref.id, recipe_id) in _authors:
+                return _authors[(self.author_ref.id, recipe_id)]
+        doc = self.author_ref.document(recipe_id).get()
+        if not doc.exists:
+            return None
+        author_id = doc.to_dict()['author_id']
+        self._remember_author(recipe_id, author_id)
+        return author_id
+
+    def find_recipe_author(self, user_ids: list[str], recipe_id: str) -> str | None:
+        """
+        Returns which of the users owns the recipe, or None if none of them do.
+        """
+        author_id = self.get_recipe_author(recipe_id)
+        if author_id is not None:
+            return author_id if author_id in user_ids else None
+
+        # recipes saved before the index existed are looked for under every user in one get_all, then indexed,
+        # along with the users' documents for recipes that are still in their legacy map
+        ids = list(dict.fromkeys(user_ids))
+        users = [self.user_ref.document(user_id) for user_id in ids]
+        user_paths = {ref.path for ref in users}
+        refs = [self._recipes(user_id).document(recipe_id) for user_id in ids] + users
+        field_paths = ['author_id', FieldPath('recipes', recipe_id).to_api_repr()]
+        found = set()
+        for doc in db.get_all(refs, field_paths=field_paths):
+            if not doc.exists:
+                continue
+            if doc.reference.path not in user_paths:
+                found.add(doc.reference.parent.parent.id)
+            elif recipe_id in ((doc.to_dict() or {}).get('recipes') or {}):
+                found.add(doc.id)
+        if len(found) != 1:
+            return None
+        author_id = found.pop()
+        self.author_ref.document(recipe_id).set({'author_id': author_id})
+        self._remember_author(recipe_id, author_id)
+        return author_id
+
+    def get_recipe_titles(self, user_ids: list[str], recipe_ids: set[str]) -> dict[str, str]:
+        """
+        The titles of whichever of the recipes the users own, keyed by recipe id, in one get_all.
+        Every user's copy of every id is asked for, which is cheaper than looking each author up first.
+        """
+        if len(recipe_ids) == 0:
+            return {}
+        ids = list(dict.fromkeys(user_ids))
+        users = [self.user_ref.document(user_id) for user_id in ids]
+        user_paths = {ref.path for ref in users}
+        refs = [self._recipes(user_id).document(recipe_id) for user_id in ids for recipe_id in recipe_ids] + users
+        field_paths = ['title'] + [FieldPath('recipes', recipe_id, 'title').to_api_repr() for recipe_id in recipe_ids]
+        titles, legacy = {}, {}
+        for doc in db.get_all(refs, field_paths=field_paths):
+            if not doc.exists:
+                continue
+            data = doc.to_dict() or {}
+            if doc.reference.path not in user_paths:
+                titles[doc.id] = data.get('title', '')
+            else:
+                legacy.update((recipe_id, recipe.get('title', '')) for recipe_id, recipe in (data.get('recipes') or {}).items())
+        # the subcollection wins, as in get_user_recipes
+        return {**legacy, **titles}
+
     def find_user_recipe(self, user_ids: list[str], recipe_id: str) -> RecipeOut | None:
-        users = self.get_users(user_ids)
-        user = [x for x in users if recipe_id in x.recipes.keys()]
-        if len(user) == 1:
-            return Recipe.make_recipe_out(user[0].recipes[recipe_id], recipe_id)
-        else:
+        author_id = self.find_recipe_author(user_ids, recipe_id)
+        if author_id is None:
             return None
+        return self.get_recipe(author_id, recipe_id)
 
+    def get_recipe(self, user_id: str, recipe_id: str) -> RecipeOut | None:
+        doc = self._recipes(user_id).document(recipe_id).get()
+        if doc.exists:
+            return self._recipe_out(doc)
+        return self._legacy_recipe(user_id, recipe_id)
 
-    def update_recipe(self, user_id: str, recipe_id: str, recipe: Recipe) -> str:
-        self.user_ref.document(user_id).update({
-            f"recipes.{recipe_id}": recipe.model_dump()
-        })
+    def update_recipe(self, user_id: str, recipe_id: str, recipe: Recipe, batch: WriteBatch | None = None) -> str:
+        ref = self._recipes(user_id).document(recipe_id)
+        if batch is not None:
+            batch.set(ref, recipe.model_dump())
+        else:
+            ref.set(recipe.model_dump())
         return recipe_id
     
+    def get_many(self, user_ids: list[str], field_paths: list[str] | None = None) -> dict[str, dict]:
+        """
+        Reads several user documents in a single get_all round trip, keyed by user id.
+        field_paths limits which fields come back; users without a document are left out.
+        """
+        if len(user_ids) == 0:
+            return {}
+        refs = [self.user_ref.document(user_id) for user_id in dict.fromkeys(user_ids)]
+        return {doc.id: doc.to_dict() for doc in db.get_all(refs, field_paths=field_paths) if doc.exists}
+
     def get_user_recipes(self, user_id: str) -> dict[str,RecipeOut]:
-        user_data = self.user_ref.document(user_id).get().to_dict()
-        recipes = {}
-        if user_data is not None and 'recipes' in user_data:
-            for id, recipe in user_data['recipes'].items():
-                recipe['id'] = id
-                recipes[id] = RecipeOut.model_validate(recipe)
-        return recipes
+        stored, legacy = gather(lambda: {doc.id: self._recipe_out(doc) for doc in self._recipes(user_id).stream()},
+                                partial(self._legacy_recipes, user_id))
+        return {**legacy, **stored}
+
+    # Until moveRecipesToSubcollection has reached a user, some of their recipes are still in a map on their document.
+    # Every read merges them in, and a recipe that is in both is read from the subcollection, since writes go there.
+
+    @staticmethod
+    def _legacy_out(user_id: str, recipe_id: str, recipe: dict) -> RecipeOut:
+        # the migration fills in the author the same way
+        if recipe.get('author_id') is None:
+            recipe['author_id'] = user_id
+        return RecipeOut.model_validate({**recipe, 'id': recipe_id})
+
+    def _legacy_recipes(self, user_id: str) -> dict[str,RecipeOut]:
+        user = self.user_ref.document(user_id).get(field_paths=['recipes']).to_dict() or {}
+        return {recipe_id: self._legacy_out(user_id, recipe_id, recipe) for recipe_id, recipe in (user.get('recipes') or {}).items()}
+
+    def _legacy_recipe(self, user_id: str, recipe_id: str) -> RecipeOut | None:
+        user = self.user_ref.document(user_id).get(field_paths=[FieldPath('recipes', recipe_id).to_api_repr()]).to_dict() or {}
+        recipe = (user.get('recipes') or {}).get(recipe_id)
+        return None if recipe is None else self._legacy_out(user_id, recipe_id, recipe)
+
+    def get_user_recipes_page(self, user_id: str, page_size: int, start_after: str | None = None) -> list[RecipeOut]:
+        """
+        Returns up to page_size of the user's recipes in id order, starting after the recipe id given.
+        Pass the id of the last recipe of a page to get the next one.
+        """
+        query = self._recipes(user_id).order_by(FieldPath.document_id()).limit(page_size)
+        if start_after is not None:
+            query = query.start_after({FieldPath.document_id(): start_after})
+        recipes = {recipe_id: recipe for recipe_id, recipe in self._legacy_recipes(user_id).items()
+                   if start_after is None or recipe_id > start_after}
+        recipes.update((doc.id, self._recipe_out(doc)) for doc in query.stream())
+        return [recipes[recipe_id] for recipe_id in sorted(recipes)[:page_size]]
+
+    def get_users_recipes(self, user_ids: list[str]) -> dict[str, dict[str,RecipeOut]]:
+        """
+        Returns each user's recipes keyed by user id, in the order the ids were given.
+        """
+        ids = list(dict.fromkeys(user_ids))
+        recipes = gather(*[partial(self.get_user_recipes, user_id) for user_id in ids])
+        return dict(zip(ids, recipes))
 
     def get_user_tags(self, user_id: str) -> set[str]:
-        user = self.get_user(user_id)
-        # flatten tags lists
-        return set([tag for r in user.recipes.values() for tag in r.tags])
+        # only the tags are read, not the recipes themselves
+        tags = {doc.id: doc.to_dict().get('tags', []) for doc in self._recipes(user_id).select(['tags']).stream()}
+        legacy = {recipe_id: recipe.tags for recipe_id, recipe in self._legacy_recipes(user_id).items()}
+        return set([tag for recipe_tags in {**legacy, **tags}.values() for tag in recipe_tags])
     
     def search_user_recipes(self, user_id: str, keyword: str) -> list[RecipeOut]:
         return [x for x in self.get_user_recipes(user_id).values() if keyword.upper() in x.title.upper()]
     
-    def add_recipe_record(self, user_id: str, recipe_id: str, record: Record) -> None:
-        res = self.user_ref.document(user_id).update({
-            f"recipes.{recipe_id}.history" : ArrayUnion([record.model_dump()])
-        })
+    def add_recipe_record(self, user_id: str, recipe_id: str, record: Record, batch: WriteBatch | None = None) -> None:
+        ref = self._recipes(user_id).document(recipe_id)
+        changes = {"history" : ArrayUnion([record.model_dump()])}
+        if not ref.get(field_paths=['author_id']).exists and self._legacy_recipe(user_id, recipe_id) is not None:
+            # the migration carries the record over with the rest of the recipe
+            ref = self.user_ref.document(user_id)
+            changes = {FieldPath('recipes', recipe_id, 'history').to_api_repr(): ArrayUnion([record.model_dump()])}
+        if batch is not None:
+            batch.update(ref, changes)
+        else:
+            ref.update(changes)
 
     def get_user_suggestions(self, user_id: str) -> set[str]:
         user = self.get_user(user_id)
@@ -91,4 +282,9 @@ class UserRepository:
     def add_user_suggestion(self, user_id: str, suggestion: str) -> None:
         self.user_ref.document(user_id).update({
             "suggestions":ArrayUnion([suggestion])
+        })
+
+    def add_user_suggestions(self, user_id: str, suggestions: list[str]) -> None:
+        self.user_ref.document(user_id).update({
+            "suggestions":ArrayUnion(suggestions)
         })
\ No newline at end of file
@@ -1,30 +1,47 @@
-import urllib.request, urllib.parse, ssl, json
+import urllib.parse, json
 from models.Recipe import Recipe
 from bs4 import BeautifulSoup
 from pydantic_core import ValidationError
-from functools import lru_cache
 from fastapi import HTTPException
+from resultcache import ResultCache
+from pagecache import PageCache
+from breaker import CircuitOpen
+from deadline import DeadlineExceeded
+from typing import Callable, Any, Hashable
+from os import getenv
 import re
 
+# Parsed results of fetched pages, shared by every request in the worker. The pages themselves aren't kept,
+# since a parsed page is several MB while what we take from it is a few KB.
+_results = ResultCache(max_bytes=int(getenv('WEB_CACHE_BYTES', str(16 * 1024 * 1024))))
+# recipes rarely change once published, but listing pages should pick up new recipes through the day
+RECIPE_TTL = float(getenv('WEB_RECIPE_TTL_SECONDS', str(24 * 60 * 60)))
+PAGE_TTL = float(getenv('WEB_PAGE_TTL_SECONDS', str(60 * 60)))
+# The raw pages, kept on disk so a new worker can start from them. Every worker on a machine shares the directory.
+_pages = PageCache(getenv('WEB_PAGE_CACHE_DIR', '.cache/pages'), fresh_for=PAGE_TTL,
+                   max_bytes=int(getenv('WEB_PAGE_CACHE_BYTES', str(256 * 1024 * 1024))))
+
+def cache_metrics() -> dict:
+    return _results.snapshot()
+
+def prune_pages() -> int:
+    return _pages.prune()
+
 class WebRecipesRepository:
     def get_soup(self,url:str) -> BeautifulSoup:
-        return WebRecipesRepository._get_soup(url)
-    
-    @lru_cache
-    @staticmethod
-    def _get_soup(url:str) -> BeautifulSoup:
         try:
-            req = urllib.request.Request(url)
-            req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36')
-
-            handler = urllib.request.HTTPSHandler(context=ssl._create_unverified_context())
-            opener = urllib.request.build_opener(handler)
-            response = opener.open(req)
-            html_content = response.read()
-
-            return BeautifulSoup(html_content, 'html.parser')
+            html_content = _pages.fetch(url)
+        except (CircuitOpen, DeadlineExceeded):
+            raise HTTPException(status_code=503, detail="The recipe site isn't responding. Try again later.")
         except:
             raise HTTPException(status_code=404, detail="Invalid provided URL.")
+        return BeautifulSoup(html_content, 'html.parser')
+
+    def cached(self, key: Hashable, build: Callable[[], Any], ttl: float = PAGE_TTL) -> Any:
+        """
+        Returns what build made from a page the last time, if it's younger than ttl. Failures aren't cached.
+        """
+        return _results.get(key, build, ttl)
     
     def get_recipe_dict(self, soup):
         info = soup.find("script",attrs={"type":"application/ld+json"})
@@ -46,8 +63,7 @@ class WebRecipesRepository:
         # base_url = "https://allrecipes.com/"
         # url = base_url + uri
 
-        soup = self.get_soup(url)
-        return RecipeData(url, self.get_recipe_dict(soup))
+        return self.cached(('recipe', url), lambda: RecipeData(url, self.get_recipe_dict(self.get_soup(url))), RECIPE_TTL)
 
 class RecipeData:
     def __init__(self, url, recipe_dict):
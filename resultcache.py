@@ -0,0 +1,87 @@
+from cachetools import TLRUCache
+from copy import deepcopy
+from dataclasses import dataclass
+from pydantic import BaseModel
+from threading import Lock
+from typing import Any, Callable, Hashable
+import time
+
+def estimate_size(value: Any) -> int:
+    """
+    Roughly how many bytes value holds, taken from the length of its data rather than Python's own overhead.
+    """
+    if isinstance(value, BaseModel):
+        return len(value.model_dump_json())
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sum(estimate_size(x) for x in value)
+    if hasattr(value, '__dict__'):
+        return estimate_size(vars(value))
+    return 8
+
+@dataclass
+class _Entry:
+    value: Any
+    ttl: float
+    size: int
+
+class _Cache(TLRUCache):
+    def __init__(self, maxsize: int, timer: Callable[[], float]):
+        super().__init__(maxsize, ttu=lambda key, entry, now: now + entry.ttl, timer=timer, getsizeof=lambda entry: entry.size)
+        self.evictions = 0
+
+    def popitem(self):
+        # only called to make room, expired entries are dropped without it
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+class ResultCache:
+    """
+    Keeps results that are slow to build, each for its own ttl, within a budget of max_bytes.
+    The least recently used results are evicted first once the budget is used up.
+    Callers get their own copy of a result, so changing it can't leak into other requests.
+    """
+    def __init__(self, max_bytes: int, timer: Callable[[], float] = time.monotonic):
+        self._cache = _Cache(max_bytes, timer)
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], Any], ttl: float) -> Any:
+        """
+        Returns the cached result for key, or builds and caches it. Exceptions from build are raised and not cached.
+        """
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self.hits += 1
+                return deepcopy(entry.value)
+            self.misses += 1
+
+        # built outside the lock so a slow fetch doesn't hold up hits on other keys
+        value = build()
+        entry = _Entry(value, ttl, estimate_size(value))
+        if entry.size <= self._cache.maxsize:
+            with self._lock:
+                self._cache[key] = entry
+        return deepcopy(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._cache.expire()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self._cache.evictions,
+                'entries': len(self._cache),
+                'bytes': self._cache.currsize,
+                'max_bytes': self._cache.maxsize,
+            }
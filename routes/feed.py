@@ -10,11 +10,11 @@ router = APIRouter(
 )
 
 @router.post("/")
-async def add_recipe(request: Request, recipe: Recipe, controller: Annotated[FeedController, Depends()]) -> str:
-    return controller.add_recipe(request.state.user_id, recipe)
+def add_recipe(request: Request, recipe: Recipe, controller: Annotated[FeedController, Depends()]) -> str:
+    return controller.add_recipe(request.state.user_id, recipe, request.state.household_id)
 
 @router.put("/{recipe_id}")
-async def update_recipe(request: Request,recipe_id: str, recipe: Recipe, controller: Annotated[FeedController, Depends()]) -> str:
+def update_recipe(request: Request,recipe_id: str, recipe: Recipe, controller: Annotated[FeedController, Depends()]) -> str:
     return controller.update_recipe(request.state.household_id, recipe_id, recipe)
 
 @router.post('/upload/image')
@@ -22,15 +22,11 @@ async def upload_image(request: Request, file: UploadFile, controller: Annotated
     return await controller.upload_image(request.state.user_id,file)
 
 @router.get("/")
-async def get_feed(request: Request, controller: Annotated[FeedController, Depends()], page: int = 0) -> list[RecipeLite]:
-    user_recipes = [x[0] for x in controller.get_user_recipes(request.state.household_id, page=page)]
-    suggested_recipes = controller.get_suggested_recipes(page=page)
-    combined_recipes = controller.remove_duplicates(user_recipes, suggested_recipes, request.state.household_id)
-    sorted_recipes = controller.sort_recipes(request.state.household_id, combined_recipes)
-    return sorted_recipes
+def get_feed(request: Request, controller: Annotated[FeedController, Depends()], page: int = 0) -> list[RecipeLite]:
+    return controller.get_feed(request.state.household_id, page=page)
 
 @router.get("/tags")
-async def get_user_tags(request: Request, controller: Annotated[FeedController, Depends()]) -> list[str]:
+def get_user_tags(request: Request, controller: Annotated[FeedController, Depends()]) -> list[str]:
     return controller.get_user_tags(request.state.user_id)
 
 @router.get("/image/{user_id}/{file_path}")
@@ -38,7 +34,7 @@ def get_image(user_id: str, file_path: str, controller: Annotated[FeedController
     return controller.get_image(user_id + "/" + file_path)
 
 @router.get('/search')
-async def search_feed(query: str, request: Request, controller: Annotated[FeedController, Depends()]) -> list[RecipeLite]:
+def search_feed(query: str, request: Request, controller: Annotated[FeedController, Depends()]) -> list[RecipeLite]:
     keywords = [x for x in query.strip().split(' ') if x[0] != '#']
     tags = [x[1:] for x in query.strip().split(' ') if x[0] == '#' and len(x) > 1]
     user_recipes = controller.get_user_recipes(request.state.household_id, keywords=keywords, tags=tags)
@@ -12,11 +12,11 @@ router = APIRouter(
 )
 
 @router.get('/')
-async def get_menu(request: Request, controller: Annotated[MenuController, Depends()]) -> list[MenuItemLite]:
+def get_menu(request: Request, controller: Annotated[MenuController, Depends()]) -> list[MenuItemLite]:
     return controller.get_menu(request.state.household_id)
 
 @router.post('/', description="Either a recipe or recipe_id MUST be present in provided menu_item")
-async def add_recipe(request: Request, 
+def add_recipe(request: Request, 
         menu_item: MenuItem, 
         controller: Annotated[MenuController, Depends()],
         shopping_list_controller: Annotated[ShoppingListController, Depends()]) -> list[MenuItemLite]:
@@ -28,18 +28,18 @@ async def add_recipe(request: Request,
     return controller.get_menu(request.state.household_id)
 
 @router.get("/recipes/{recipe_id}")
-async def get_recipe(request: Request, recipe_id: str, controller: Annotated[MenuController, Depends()]) -> RecipeOut:
+def get_recipe(request: Request, recipe_id: str, controller: Annotated[MenuController, Depends()]) -> RecipeOut:
     res = controller.get_recipe(request.state.household_id, recipe_id)
     if res is None:
         raise HTTPException(404, detail= "Recipe was not found or you do not have permission to access it. Is the user who owns this recipe in your household?")
     return res
 
 @router.get("/index/{index}")
-async def get_recipe_by_index(request: Request, index: str, controller: Annotated[MenuController, Depends()]) -> MenuItemOut:
+def get_recipe_by_index(request: Request, index: str, controller: Annotated[MenuController, Depends()]) -> MenuItemOut:
     return controller.get_menu_item(request.state.household_id, int(index))
 
 @router.get("/recipeId/{recipe_id}")
-async def get_menu_item_by_recipe_id(request: Request, recipe_id: str, controller: Annotated[MenuController, Depends()]) -> MenuItemOut:
+def get_menu_item_by_recipe_id(request: Request, recipe_id: str, controller: Annotated[MenuController, Depends()]) -> MenuItemOut:
 
     menu_item = controller.get_menu_item_by_recipe_id(request.state.household_id, recipe_id)
     if menu_item == None:
@@ -47,28 +47,28 @@ async def get_menu_item_by_recipe_id(request: Request, recipe_id: str, controlle
     return menu_item
 
 @router.get('/online')
-async def get_recipe_online(link:str, controller: Annotated[MenuController, Depends()]) -> Recipe:
+def get_recipe_online(link:str, controller: Annotated[MenuController, Depends()]) -> Recipe:
     recipe = controller.get_recipe_online(link)
     if recipe == None:
         raise HTTPException(status_code=400, detail="Website does not provide formatted recipe data.")
     return recipe
 
 @router.post('/finish/{recipe_id}')
-async def finish_meal(request: Request, recipe_id: str, controller: Annotated[MenuController, Depends()], rating: float | None = None) -> list[MenuItemLite]:
+def finish_meal(request: Request, recipe_id: str, controller: Annotated[MenuController, Depends()], rating: float | None = None) -> list[MenuItemLite]:
     controller.finish_recipe(request.state.household_id, recipe_id, rating)
     return controller.get_menu(request.state.household_id)
 
 @router.delete('/{recipe_id}')
-async def remove_meal(request: Request, recipe_id: str, controller: Annotated[MenuController, Depends()], rating: float | None = None) -> list[MenuItemLite]:
+def remove_meal(request: Request, recipe_id: str, controller: Annotated[MenuController, Depends()], rating: float | None = None) -> list[MenuItemLite]:
     controller.finish_recipe(request.state.household_id, recipe_id, rating)
     return controller.get_menu(request.state.household_id)
 
 @router.patch("/index/{index}")
-async def patch_recipe_by_index(request: Request, index: str, updated: MenuItem, controller: Annotated[MenuController, Depends()]) -> MenuItemOut:
+def patch_recipe_by_index(request: Request, index: str, updated: MenuItem, controller: Annotated[MenuController, Depends()]) -> MenuItemOut:
     controller.update_menu_item(request.state.household_id, int(index), updated)
     return controller.get_menu_item(request.state.household_id, int(index))
 
 @router.patch("/recipeId/{recipe_id}")
-async def patch_recipe_by_recipe_id(request: Request, recipe_id: str, updated: MenuItem, controller: Annotated[MenuController, Depends()]) -> MenuItemOut:
+def patch_recipe_by_recipe_id(request: Request, recipe_id: str, updated: MenuItem, controller: Annotated[MenuController, Depends()]) -> MenuItemOut:
     controller.update_menu_item_by_recipe_id(request.state.household_id, recipe_id, updated)
     return controller.get_menu_item_by_recipe_id(request.state.household_id, recipe_id)
\ No newline at end of file
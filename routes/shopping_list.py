@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Request, Depends
-from models.ShoppingItem import ShoppingItem, ShoppingItemOut
+from models.ShoppingItem import ShoppingItem, ShoppingItemOut, ShoppingListOperation
 from controllers.shoppingListController import ShoppingListController
 from typing import Annotated
 
@@ -9,44 +9,47 @@ router = APIRouter(
 )
 
 @router.get("/")
-async def get_shopping_list(req: Request, controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
-    # removes any items that have been checked for more than 12 hours before returning the list
-    controller.clean_list(req.state.household_id)
-
+def get_shopping_list(req: Request, controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
+    # leaves out items that have been checked for more than 12 hours, the sweeper deletes them later
     return controller.get_shopping_list(req.state.household_id)
 
 @router.post("/")
-async def add_item(req: Request, shopping_item: ShoppingItem,controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
+def add_item(req: Request, shopping_item: ShoppingItem,controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
     if shopping_item.user_id == None:
         shopping_item.user_id = req.state.user_id
     controller.add_item(req.state.household_id, req.state.user_id, shopping_item)
     return controller.get_shopping_list(req.state.household_id)
 
+@router.post("/batch")
+def apply_batch(req: Request, operations: list[ShoppingListOperation], controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
+    controller.apply_operations(req.state.household_id, req.state.user_id, operations)
+    return controller.get_shopping_list(req.state.household_id)
+
 @router.get("/suggestions")
-async def get_suggestions(req: Request, controller: Annotated[ShoppingListController, Depends()]) -> list[str]:
+def get_suggestions(req: Request, controller: Annotated[ShoppingListController, Depends()]) -> list[str]:
     return controller.get_suggestions(req.state.user_id)
 
 @router.post("/check/{id}")
-async def check_item(req: Request, id: str,controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
+def check_item(req: Request, id: str,controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
     controller.check_item(req.state.household_id, id)
     return controller.get_shopping_list(req.state.household_id)
 
 @router.put("/{id}")
-async def edit_item(req: Request, id: str, shopping_item: ShoppingItem,controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
+def edit_item(req: Request, id: str, shopping_item: ShoppingItem,controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
     controller.edit_item(req.state.household_id, id, shopping_item)
     return controller.get_shopping_list(req.state.household_id)
 
 @router.delete("/{index}")
-async def remove_item(req: Request, index: int,controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
+def remove_item(req: Request, index: int,controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
     controller.remove_item(req.state.household_id, index)
     return controller.get_shopping_list(req.state.household_id)
 
 @router.patch("/move")
-async def move_item(req: Request, from_index: str, to_index:str,controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
+def move_item(req: Request, from_index: str, to_index:str,controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
     controller.move_item(req.state.household_id, int(from_index), int(to_index))
     return controller.get_shopping_list(req.state.household_id)
 
 @router.patch("/reorder")
-async def reorder(req: Request, ordered_list: list[ShoppingItem],controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
+def reorder(req: Request, ordered_list: list[ShoppingItem],controller: Annotated[ShoppingListController, Depends()]) -> list[ShoppingItemOut]:
     controller.reorder_items(req.state.household_id, ordered_list)
     return controller.get_shopping_list(req.state.household_id)
\ No newline at end of file
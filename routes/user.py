@@ -8,13 +8,13 @@ router = APIRouter(
     tags= ["User"]
 )
 @router.post("/")
-async def create_user(user: User, controller: Annotated[UserController, Depends()]):
+def create_user(user: User, controller: Annotated[UserController, Depends()]):
     # Create a new user
     user_id = controller.create_user(user)
     return {"message": "User created successfully", "user_id": user_id}
 
 @router.get("/{user_id}")
-async def get_user(user_id: str, controller: Annotated[UserController, Depends()]):
+def get_user(user_id: str, controller: Annotated[UserController, Depends()]):
     # Get user data
     user_data = controller.get_user(user_id)
     if user_data is None:
@@ -22,7 +22,7 @@ async def get_user(user_id: str, controller: Annotated[UserController, Depends()
     return user_data
 
 @router.get("/")
-async def get_users(controller: Annotated[UserController, Depends()]):
+def get_users(controller: Annotated[UserController, Depends()]):
     # Get user data
     user_data = controller.get_users()
     return user_data
\ No newline at end of file
@@ -0,0 +1,65 @@
+from controllers.allRecipes import AllRecipes
+from repositories.webRecipesRepository import WebRecipesRepository
+from models.Recipe import RecipeLite
+from fanout import gather
+from periodic import PeriodicTask
+from functools import partial
+from os import getenv
+import asyncio, threading, time
+
+class SuggestedRecipes:
+    """
+    The allrecipes category pages that feeds mix in, kept warm in the background so a feed never waits on allrecipes.
+    Feeds read whatever was fetched last. If that is older than stale_after, the read also starts a refresh without
+    waiting for it, which covers workers where the refresh loop isn't running or has fallen behind.
+    """
+    def __init__(self, all_recipes: AllRecipes, interval: float = 60 * 60, stale_after: float | None = None):
+        self.all_recipes = all_recipes
+        self.interval = interval
+        self.stale_after = interval if stale_after is None else stale_after
+        self.pages: list[list[RecipeLite]] = [[] for _ in self._fetchers()]
+        self.refreshed_at: float = 0
+        self._refresh_lock = threading.Lock()
+        self._task = PeriodicTask('Suggested recipe refresh', partial(asyncio.to_thread, self.refresh),
+                                  lambda: self.refreshed_at + self.interval - time.time())
+
+    def _fetchers(self) -> list:
+        return [self.all_recipes.get_main_dishes, self.all_recipes.get_soups, self.all_recipes.get_breakfasts, self.all_recipes.get_desserts]
+
+    def refresh(self) -> None:
+        requested_at = time.time()
+        with self._refresh_lock:
+            # whoever held the lock has just refreshed
+            if self.refreshed_at >= requested_at:
+                return
+            pages = gather(*self._fetchers())
+            # a page that failed keeps what it had, rather than dropping out of every feed until the next refresh
+            self.pages = [new if len(new) else old for new, old in zip(pages, self.pages)]
+            self.refreshed_at = time.time()
+
+    def _refresh_quietly(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            print('Suggested recipe refresh failed: ', e)
+
+    def get_pages(self) -> list[list[RecipeLite]]:
+        """
+        The pages as of the last refresh, in the order main dishes, soups, breakfasts, desserts. Never blocks on a refresh.
+        """
+        if time.time() - self.refreshed_at > self.stale_after and not self._refresh_lock.locked():
+            threading.Thread(target=self._refresh_quietly, daemon=True).start()
+        # feeds score the recipes they're given, so each gets its own copies
+        return [[recipe.model_copy() for recipe in page] for page in self.pages]
+
+    def start(self) -> None:
+        if self.interval > 0:
+            self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
+
+suggested_recipes = SuggestedRecipes(AllRecipes(WebRecipesRepository()), interval=float(getenv("SUGGESTED_REFRESH_SECONDS", "3600")))
+
+def get_suggested_recipes() -> SuggestedRecipes:
+    return suggested_recipes
@@ -0,0 +1,109 @@
+from controllers.shoppingListController import is_expired
+from repositories.householdRepository import HouseholdRepository
+from models.Household import HouseholdMenu
+from google.cloud.firestore_v1.field_path import FieldPath
+from google.cloud.firestore_v1.collection import CollectionReference
+from google.cloud.firestore_v1.document import DocumentReference
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+from firebase import db
+from datetime import datetime, timezone
+from periodic import PeriodicTask
+from functools import partial
+from uuid import uuid4
+import asyncio, time
+
+class ShoppingListSweeper:
+    """
+    Deletes expired shopping list items in the background, so reading the list never has to.
+    Households are read a page at a time with only the fields the check needs, and only the ones with something
+    to delete are written, through the repository so the write can't clobber a concurrent edit.
+    Every worker runs one, but only the worker holding the lease document sweeps, so the households are scanned once
+    per interval rather than once per worker. The lease runs out after lease_for seconds without being renewed,
+    so another worker takes over if the holder goes away. Without a lease document every sweeper sweeps,
+    which is harmless, since sweeping a household a second time finds nothing to delete.
+    """
+    def __init__(self, household_ref: CollectionReference, interval: float = 600, page_size: int = 200,
+                 lease: DocumentReference | None = None, lease_for: float | None = None):
+        self.household_ref = household_ref
+        self.interval = interval
+        self.page_size = page_size
+        self.lease = lease
+        # long enough that the holder renews it before it runs out, even if its sweep runs late
+        self.lease_for = 2 * interval if lease_for is None else lease_for
+        self.holder = uuid4().__str__()
+        # waits before the first sweep too, so starting a worker doesn't sweep right away
+        self._task = PeriodicTask('Shopping list sweep', partial(asyncio.to_thread, self.sweep), lambda: self.interval, retry_after=0)
+
+    def acquire(self) -> bool:
+        """
+        Takes or renews the lease, and returns whether this sweeper holds it.
+        The write is conditional on the lease document not having changed since it was read, so only one worker can win.
+        """
+        if self.lease is None:
+            return True
+        snapshot = self.lease.get()
+        now = time.time()
+        current = snapshot.to_dict() if snapshot.exists else None
+        if current is not None and current.get('holder') != self.holder and current.get('expires_at', 0) > now:
+            return False
+        lease = {'holder': self.holder, 'expires_at': now + self.lease_for}
+        try:
+            if current is None:
+                self.lease.create(lease)
+            else:
+                self.lease.update(lease, option=db.write_option(last_update_time=snapshot.update_time))
+        except (AlreadyExists, FailedPrecondition):
+            return False
+        return True
+
+    def _expired(self, items: list[dict], menu_ids: set[str], now: datetime) -> list[dict]:
+        return [item for item in items if is_expired(item.get('time_checked'), item.get('recipe_id'), menu_ids, now)]
+
+    def sweep_page(self, start_after: str | None = None) -> tuple[int, str | None]:
+        """
+        Sweeps one page of households. Returns how many were cleaned and the id to start the next page after,
+        or None once every household has been seen.
+        """
+        repo = HouseholdRepository(self.household_ref)
+        fields = ['menu_recipes', 'menu'] if repo.items_in_collection else ['menu_recipes', 'menu', 'shopping_list']
+        query = self.household_ref.select(fields).order_by(FieldPath.document_id()).limit(self.page_size)
+        if start_after is not None:
+            query = query.start_after({FieldPath.document_id(): start_after})
+
+        cleaned = 0
+        seen = 0
+        last_id = None
+        now = datetime.now(timezone.utc)
+        for household in query.stream():
+            seen += 1
+            last_id = household.id
+            data = household.to_dict() or {}
+            menu_ids = {x.recipe_id for x in HouseholdMenu.model_validate(data).menu_items()}
+            if repo.items_in_collection:
+                items = [item.model_dump() for item in repo.get_shopping_list(household.id)]
+            else:
+                items = data.get('shopping_list', [])
+            if len(self._expired(items, menu_ids, now)) == 0:
+                continue
+            repo.remove_items(household.id, lambda item: not is_expired(item.get('time_checked'), item.get('recipe_id'), menu_ids, now))
+            cleaned += 1
+        return cleaned, last_id if seen == self.page_size else None
+
+    def sweep(self) -> int:
+        """
+        Sweeps every household and returns how many had items deleted, or 0 straight away if another worker holds the lease.
+        """
+        if not self.acquire():
+            return 0
+        cleaned, last_id = self.sweep_page()
+        while last_id is not None:
+            page_cleaned, last_id = self.sweep_page(last_id)
+            cleaned += page_cleaned
+        return cleaned
+
+    def start(self) -> None:
+        if self.interval > 0:
+            self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
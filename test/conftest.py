@@ -25,7 +25,8 @@ def mock_user(mock_user_dict):
     mock_user = MagicMock(spec=User)
     mock_user.full_name = 'fake'
     mock_user.google_id = 'data'
-    mock_user.recipes = {}
+    mock_user.recipe_count = 0
+    mock_user.household_id = None
     mock_user.model_dump.return_value = mock_user_dict
     return mock_user
 
@@ -115,6 +116,7 @@ def mock_household_dict(mock_join_code_dict):
     "owner_id": "",
     "join_code": mock_join_code_dict,
     "menu_recipes": [],
+    "menu": {},
     "shopping_list": []
     }
 
@@ -0,0 +1,104 @@
+from pytest import fixture
+from unittest.mock import MagicMock
+from datetime import datetime, timezone
+from repositories.householdRepository import HouseholdRepository
+from repositories.userRepository import UserRepository
+from controllers.catalogController import CatalogController
+from models.Recipe import CatalogEntry
+from models.Record import Record
+
+@fixture
+def mock_household_repo():
+    return MagicMock(spec=HouseholdRepository)
+
+@fixture
+def mock_user_repo():
+    return MagicMock(spec=UserRepository)
+
+@fixture
+def catalog_controller(mock_household_repo, mock_user_repo):
+    return CatalogController(mock_household_repo, mock_user_repo)
+
+def test_get_catalog(catalog_controller, mock_household_repo, mock_user_repo):
+    # Arrange
+    catalog = {"10": CatalogEntry(title="fake", img_link="", author_id="1")}
+    mock_household_repo.get_catalog.return_value = catalog
+
+    # Act
+    result = catalog_controller.get_catalog("1")
+    catalog_controller.get_catalog("1")
+
+    # Assert
+    assert result == catalog
+    mock_household_repo.get_catalog.assert_called_once_with("1")
+    mock_user_repo.get_users_recipes.assert_not_called()
+
+def test_get_catalog_rebuilds_missing(catalog_controller, mock_household_repo, mock_user_repo, mock_recipe):
+    # Arrange
+    mock_household_repo.get_catalog.return_value = None
+    mock_household_repo.get_user_ids.return_value = ["1", "2"]
+    mock_user_repo.get_users_recipes.return_value = {"1": {}, "2": {"10": mock_recipe}}
+
+    # Act
+    result = catalog_controller.get_catalog("1")
+
+    # Assert
+    assert result["10"].title == mock_recipe.title
+    assert result["10"].author_id == "2"
+    mock_household_repo.save_catalog.assert_called_once_with("1", result)
+
+def test_get_stored_catalog_does_not_rebuild(catalog_controller, mock_household_repo, mock_user_repo):
+    # Arrange
+    mock_household_repo.get_catalog.return_value = None
+
+    # Act
+    result = catalog_controller.get_stored_catalog("1")
+
+    # Assert
+    assert result == {}
+    mock_user_repo.get_users_recipes.assert_not_called()
+    mock_household_repo.save_catalog.assert_not_called()
+
+def test_add_recipe(catalog_controller, mock_household_repo, mock_user_repo, mock_recipe):
+    # Arrange
+    batch = mock_household_repo.batch.return_value
+    mock_user_repo.add_recipe.return_value = "10"
+
+    # Act
+    result = catalog_controller.add_recipe("1", "2", mock_recipe)
+
+    # Assert
+    assert result == "10"
+    mock_user_repo.add_recipe.assert_called_once_with("2", mock_recipe, batch=batch)
+    assert mock_household_repo.put_catalog_entry.call_args[0][:2] == ("1", "10")
+    assert mock_household_repo.put_catalog_entry.call_args[0][2].author_id == "2"
+    batch.commit.assert_called_once()
+
+def test_update_recipe(catalog_controller, mock_household_repo, mock_user_repo, mock_recipe):
+    # Arrange
+    batch = mock_household_repo.batch.return_value
+
+    # Act
+    catalog_controller.update_recipe("1", "2", "10", mock_recipe)
+
+    # Assert
+    mock_user_repo.update_recipe.assert_called_once_with("2", "10", mock_recipe, batch=batch)
+    assert mock_household_repo.put_catalog_entry.call_args[0][:2] == ("1", "10")
+    batch.commit.assert_called_once()
+
+def test_add_recipe_record_refreshes_catalog(catalog_controller, mock_household_repo, mock_user_repo):
+    # Arrange
+    batch = mock_household_repo.batch.return_value
+    record = Record(household_id="1", timestamp=datetime.now(timezone.utc), rating=4)
+    mock_household_repo.get_catalog.return_value = {}
+    catalog_controller.get_catalog("1")
+
+    # Act
+    catalog_controller.add_recipe_record("1", "2", "10", record)
+    catalog_controller.get_catalog("1")
+
+    # Assert
+    mock_user_repo.add_recipe_record.assert_called_once_with("2", "10", record, batch=batch)
+    mock_household_repo.record_in_catalog.assert_called_once_with("1", "10", record, batch=batch)
+    batch.commit.assert_called_once()
+    assert mock_household_repo.get_catalog.call_count == 2
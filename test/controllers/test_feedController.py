@@ -5,7 +5,9 @@ from repositories.householdRepository import HouseholdRepository
 from repositories.userRepository import UserRepository
 from controllers.feedController import FeedController
 from controllers.allRecipes import AllRecipes
-from models.Recipe import RecipeLite
+from controllers.catalogController import CatalogController
+from models.Recipe import RecipeLite, CatalogEntry
+from suggestions import SuggestedRecipes
 from copy import deepcopy
 @fixture
 def mock_household_repo():
@@ -20,47 +22,70 @@ def mock_all_recipes():
     return MagicMock(spec=AllRecipes)
 
 @fixture
-def feed_controller(mock_household_repo, mock_user_repo, mock_all_recipes):
-    return FeedController(mock_household_repo, mock_user_repo, mock_all_recipes)
+def mock_catalog():
+    return MagicMock(spec=CatalogController)
 
-def test_add_recipe_provides_src_name(feed_controller,mock_user_repo, mock_user, mock_recipe):
+@fixture
+def suggested(mock_all_recipes):
+    return SuggestedRecipes(mock_all_recipes)
+
+@fixture
+def feed_controller(mock_household_repo, mock_user_repo, mock_all_recipes, mock_catalog, suggested):
+    return FeedController(mock_household_repo, mock_user_repo, mock_all_recipes, mock_catalog, suggested)
+
+def catalog_of(recipes: dict, author_id: str = "1") -> dict[str, CatalogEntry]:
+    return {str(recipe_id): CatalogEntry.make_from_recipe(recipe).model_copy(update={'author_id': author_id}) for recipe_id, recipe in recipes.items()}
+
+def test_add_recipe_provides_src_name(feed_controller,mock_user_repo, mock_user, mock_recipe, mock_catalog):
     # Arrange
     mock_recipe.src_name = None
     mock_user.full_name = "Fake Test"
     mock_user_repo.get_user.return_value = mock_user
 
     # Act
-    result = feed_controller.add_recipe("1", mock_recipe)
+    result = feed_controller.add_recipe("1", mock_recipe, "household")
 
     # Assert
-    mock_user_repo.add_recipe.assert_called_once()
-    assert mock_user_repo.add_recipe.call_args[0][1].src_name == "Fake Test"
+    mock_catalog.add_recipe.assert_called_once()
+    assert mock_catalog.add_recipe.call_args[0][:2] == ("household", "1")
+    assert mock_catalog.add_recipe.call_args[0][2].src_name == "Fake Test"
 
-def test_add_recipe_has_src_name(feed_controller,mock_user_repo, mock_user, mock_recipe):
+def test_add_recipe_has_src_name(feed_controller,mock_user_repo, mock_user, mock_recipe, mock_catalog):
     # Arrange
     mock_recipe.src_name = "This Guy's Mom"
     mock_user.full_name = "Fake Test"
     mock_user_repo.get_user.return_value = mock_user
 
     # Act
-    result = feed_controller.add_recipe("1", mock_recipe)
+    result = feed_controller.add_recipe("1", mock_recipe, "household")
 
     # Assert
-    mock_user_repo.add_recipe.assert_called_once()
-    assert mock_user_repo.add_recipe.call_args[0][1].src_name == "This Guy's Mom"
+    mock_catalog.add_recipe.assert_called_once()
+    assert mock_catalog.add_recipe.call_args[0][:2] == ("household", "1")
+    assert mock_catalog.add_recipe.call_args[0][2].src_name == "This Guy's Mom"
 
-def test_update_recipe(feed_controller,mock_user_repo, mock_household_repo, mock_recipe):
+def test_update_recipe(feed_controller,mock_user_repo, mock_household_repo, mock_recipe, mock_catalog):
     # Arrange
     mock_household_repo.get_user_ids.return_value = ["1"]
-    mock_recipe.id = "1"
-    mock_recipe.author_id = "1"
-    mock_user_repo.get_user_recipes.return_value = { "1": mock_recipe }
+    mock_user_repo.find_recipe_author.return_value = "1"
+
+    # Act
+    result = feed_controller.update_recipe("1","1", mock_recipe)
+
+    # Assert
+    mock_user_repo.find_recipe_author.assert_called_once_with(["1"], "1")
+    mock_catalog.update_recipe.assert_called_once_with("1", "1", "1", mock_recipe)
+
+def test_update_recipe_not_found(feed_controller, mock_catalog, mock_user_repo, mock_recipe):
+    # Arrange
+    mock_user_repo.find_recipe_author.return_value = None
 
     # Act
     result = feed_controller.update_recipe("1","1", mock_recipe)
 
     # Assert
-    mock_user_repo.update_recipe.assert_called_once_with("1","1", mock_recipe)
+    assert result == ""
+    mock_catalog.update_recipe.assert_not_called()
 
 def test_get_user_recipes_empty(feed_controller,mock_user_repo, mock_household_repo, mock_recipe):
     # Arrange
@@ -73,11 +98,11 @@ def test_get_user_recipes_empty(feed_controller,mock_user_repo, mock_household_r
     assert result == []
     mock_household_repo.get_user_ids.assert_called_once()
 
-def test_get_user_recipes_no_filter(feed_controller,mock_user_repo, mock_household_repo, mock_recipe):
+def test_get_user_recipes_no_filter(feed_controller,mock_user_repo, mock_household_repo, mock_recipe, mock_catalog):
     # Arrange
     mock_household_repo.get_user_ids.return_value = ["1"]
     mock_recipe.id = "1"
-    mock_user_repo.get_user_recipes.return_value = {'10':mock_recipe}
+    mock_catalog.get_catalog.return_value = catalog_of({'10':mock_recipe})
 
     # Act
     result = feed_controller.get_user_recipes("1")
@@ -86,16 +111,16 @@ def test_get_user_recipes_no_filter(feed_controller,mock_user_repo, mock_househo
     assert len(result) == 1
     assert result[0][0].title == mock_recipe.title
     assert result[0][0].img_link == mock_recipe.img_link
-    assert result[0][0].id == mock_recipe.id
+    assert result[0][0].id == '10'
 
 @mark.parametrize('page,amount_expected',[(-1,15),(0,10),(1,5),(2,0),(200,0)])
-def test_get_user_recipes_no_filter_with_paging(page,amount_expected,feed_controller,mock_user_repo, mock_household_repo, mock_recipe):
+def test_get_user_recipes_no_filter_with_paging(page,amount_expected,feed_controller,mock_user_repo, mock_household_repo, mock_recipe, mock_catalog):
     # Arrange
     mock_household_repo.get_user_ids.return_value = ["1"]
     mock_recipe.id = "1"
     fake_recipes = {}
-    [fake_recipes.setdefault(x,mock_recipe) for x in range(15)]
-    mock_user_repo.get_user_recipes.return_value = fake_recipes
+    [fake_recipes.setdefault(str(x),mock_recipe) for x in range(15)]
+    mock_catalog.get_catalog.return_value = catalog_of(fake_recipes)
 
     # Act
     result = feed_controller.get_user_recipes("1",page=page)
@@ -139,14 +164,14 @@ def test_keyword_hits(feed_controller, mock_recipe):
      (['fake'],['fake','test'],102),
      (['fake', 'test'],['fake'],201)
      ])
-def test_get_user_recipes_filtered(keywords, tags, expected_amount, feed_controller,mock_user_repo, mock_household_repo, mock_recipe):
+def test_get_user_recipes_filtered(keywords, tags, expected_amount, feed_controller,mock_user_repo, mock_household_repo, mock_recipe, mock_catalog):
     # Arrange
     mock_household_repo.get_user_ids.return_value = ["1"]
     mock_recipe.id = "1"
     mock_recipe.title = "fake test"
     mock_recipe.tags = ["fake","test"]
     mock_recipe.rate = None
-    mock_user_repo.get_user_recipes.return_value = { '10': mock_recipe }
+    mock_catalog.get_catalog.return_value = catalog_of({ '10': mock_recipe })
 
     # Act
     result = feed_controller.get_user_recipes("1", keywords=keywords, tags=tags)
@@ -184,12 +209,13 @@ def test_search_all_recipes(keywords, tags, expected_amount, feed_controller, mo
     else:
         assert len(result) == 0
 
-def test_get_suggested_recipes(feed_controller, mock_all_recipes, mock_recipe):
+def test_get_suggested_recipes(feed_controller, mock_all_recipes, mock_recipe, suggested):
     # Arrange
     mock_all_recipes.get_main_dishes.return_value = [mock_recipe for _ in range(50)]
     mock_all_recipes.get_soups.return_value = [mock_recipe for _ in range(50)]
     mock_all_recipes.get_breakfasts.return_value = [mock_recipe for _ in range(50)]
     mock_all_recipes.get_desserts.return_value = [mock_recipe for _ in range(50)]
+    suggested.refresh()
 
     # Act
     result = feed_controller.get_suggested_recipes()
@@ -197,12 +223,13 @@ def test_get_suggested_recipes(feed_controller, mock_all_recipes, mock_recipe):
     # Assert
     assert len(result) == 50
 
-def test_get_suggested_recipes_all_recipes_fails(feed_controller, mock_all_recipes, mock_recipe):
+def test_get_suggested_recipes_all_recipes_fails(feed_controller, mock_all_recipes, mock_recipe, suggested):
     # Arrange
     mock_all_recipes.get_main_dishes.return_value = [mock_recipe for _ in range(50)]
     mock_all_recipes.get_soups.return_value = [mock_recipe for _ in range(50)]
     mock_all_recipes.get_breakfasts.return_value = [mock_recipe for _ in range(50)]
     mock_all_recipes.get_desserts.return_value = [mock_recipe for _ in range(40)]
+    suggested.refresh()
 
     # Act
     result = feed_controller.get_suggested_recipes()
@@ -211,12 +238,13 @@ def test_get_suggested_recipes_all_recipes_fails(feed_controller, mock_all_recip
     assert len(result) < 50 # the last page failed to provide 50 items so was ignored.
 
 @mark.parametrize('page',[(0),(3),(5),(400)])
-def test_get_suggested_recipes_handles_any_page(feed_controller, mock_all_recipes, mock_recipe, page):
+def test_get_suggested_recipes_handles_any_page(feed_controller, mock_all_recipes, mock_recipe, page, suggested):
     # Arrange
     mock_all_recipes.get_main_dishes.return_value = [mock_recipe for _ in range(50)]
     mock_all_recipes.get_soups.return_value = [mock_recipe for _ in range(50)]
     mock_all_recipes.get_breakfasts.return_value = [mock_recipe for _ in range(50)]
     mock_all_recipes.get_desserts.return_value = [mock_recipe for _ in range(50)]
+    suggested.refresh()
 
     # Act
     result = feed_controller.get_suggested_recipes(page=page)
@@ -224,6 +252,26 @@ def test_get_suggested_recipes_handles_any_page(feed_controller, mock_all_recipe
     # Assert
     assert len(result) == 50
 
+def test_get_feed(feed_controller, mock_all_recipes, mock_household_repo, mock_user_repo, mock_recipe_dict, mock_catalog, suggested):
+    # Arrange
+    recipe = CatalogEntry(title=mock_recipe_dict['title'], img_link="", author_id="1")
+    page = [RecipeLite(title=f"recipe {i}", img_link="", src_link=f"{i}") for i in range(50)]
+    mock_all_recipes.get_main_dishes.return_value = page
+    mock_all_recipes.get_soups.return_value = page
+    mock_all_recipes.get_breakfasts.return_value = page
+    mock_all_recipes.get_desserts.return_value = page
+    mock_household_repo.get_user_ids.return_value = ["1"]
+    mock_household_repo.get_menu_items.return_value = []
+    mock_catalog.get_catalog.return_value = {"junk": recipe}
+    suggested.refresh()
+
+    # Act
+    result = feed_controller.get_feed("1")
+
+    # Assert
+    assert recipe.title in [x.title for x in result]
+    assert len(result) > 1
+
 def test_get_user_tags(feed_controller,mock_user_repo,):
     # Arrange
     mock_user_repo.get_user_tags.return_value = set(['fakeTag'])
@@ -235,10 +283,10 @@ def test_get_user_tags(feed_controller,mock_user_repo,):
     assert len(result) == 5 # At the moment, the allrecipes tags are added directly in the code here. Likely to change later.
     assert 'fakeTag' in result
 
-def test_remove_duplicates_has_duplicate( feed_controller, mock_recipe, mock_household_repo, mock_user_repo):
+def test_remove_duplicates_has_duplicate( feed_controller, mock_recipe, mock_household_repo, mock_user_repo, mock_catalog):
     # Arrange
     mock_household_repo.get_user_ids.return_value = ["1"]
-    mock_user_repo.get_user_recipes.return_value = {"1":mock_recipe}
+    mock_catalog.get_catalog.return_value = catalog_of({"1":mock_recipe})
 
     # Act
     result = feed_controller.remove_duplicates([mock_recipe], [mock_recipe],"1")
@@ -246,12 +294,12 @@ def test_remove_duplicates_has_duplicate( feed_controller, mock_recipe, mock_hou
     # Assert
     assert len(result) == 1
 
-def test_remove_duplicates_unique( feed_controller, mock_recipe, mock_household_repo, mock_user_repo):
+def test_remove_duplicates_unique( feed_controller, mock_recipe, mock_household_repo, mock_user_repo, mock_catalog):
     # Arrange
     mock2 = deepcopy(mock_recipe)
     mock2.title = "not the same"
     mock_household_repo.get_user_ids.return_value = ["1"]
-    mock_user_repo.get_user_recipes.return_value = {"1":mock_recipe}
+    mock_catalog.get_catalog.return_value = catalog_of({"1":mock_recipe})
 
     # Act
     result = feed_controller.remove_duplicates([mock_recipe], [mock2],"1")
@@ -259,10 +307,10 @@ def test_remove_duplicates_unique( feed_controller, mock_recipe, mock_household_
     # Assert
     assert len(result) == 2
 
-def test_remove_duplicates_search_has_duplicate( feed_controller, mock_recipe, mock_household_repo, mock_user_repo):
+def test_remove_duplicates_search_has_duplicate( feed_controller, mock_recipe, mock_household_repo, mock_user_repo, mock_catalog):
     # Arrange
     mock_household_repo.get_user_ids.return_value = ["1"]
-    mock_user_repo.get_user_recipes.return_value = {"1":mock_recipe}
+    mock_catalog.get_catalog.return_value = catalog_of({"1":mock_recipe})
 
     # Act
     result = feed_controller.remove_duplicates_search([(mock_recipe,1)], [(mock_recipe,1)],"1")
@@ -270,12 +318,12 @@ def test_remove_duplicates_search_has_duplicate( feed_controller, mock_recipe, m
     # Assert
     assert len(result) == 1
 
-def test_remove_duplicates_search_unique( feed_controller, mock_recipe, mock_household_repo, mock_user_repo):
+def test_remove_duplicates_search_unique( feed_controller, mock_recipe, mock_household_repo, mock_user_repo, mock_catalog):
     # Arrange
     mock2 = deepcopy(mock_recipe)
     mock2.title = "not the same"
     mock_household_repo.get_user_ids.return_value = ["1"]
-    mock_user_repo.get_user_recipes.return_value = {"1":mock_recipe}
+    mock_catalog.get_catalog.return_value = catalog_of({"1":mock_recipe})
 
     # Act
     result = feed_controller.remove_duplicates_search([(mock_recipe,1)], [(mock2,1)],"1")
@@ -41,6 +41,17 @@ def test_get_household_users(household_controller, mock_user_repo, mock_user):
     # Assert
     assert result[0].id == mock_user.google_id
 
+def test_find_household_from_user_document(household_controller,mock_household_repo):
+    # Arrange
+
+    # Act
+    result = household_controller.find_household("1", "household")
+
+    # Assert
+    mock_household_repo.find_household.assert_not_called()
+    mock_household_repo.remember_membership.assert_called_once_with("1", "household")
+    assert result == "household"
+
 def test_find_household(household_controller,mock_household_repo):
     # Arrange
 
@@ -179,7 +190,10 @@ def test_join_household_no_old_household(household_controller,mock_household_rep
     # Assert
     mock_household_repo.get_household_by_code.assert_called_once_with("code")
     mock_household_repo.find_household.assert_called_once_with("1")
-    mock_household_repo.add_user.assert_called_once_with(mock_household.id, "1")
+    mock_household_repo.add_user.assert_called_once_with(mock_household.id, "1", batch=mock_household_repo.batch.return_value)
+    mock_user_repo.set_household.assert_called_with("1", mock_household.id, batch=mock_household_repo.batch.return_value)
+    mock_household_repo.forget_catalog.assert_called_once_with(mock_household.id, batch=mock_household_repo.batch.return_value)
+    mock_household_repo.batch.return_value.commit.assert_called_once()
     assert len(result) == 1
     assert result[0].id == mock_user.google_id
 
@@ -202,7 +216,9 @@ def test_join_household_leave_old_household(household_controller,mock_household_
     mock_household_repo.delete_household.assert_called_once()
     mock_household_repo.get_household_by_code.assert_called_once_with("code")
     mock_household_repo.find_household.assert_called_once_with("1")
-    mock_household_repo.add_user.assert_called_once_with(mock_household.id, "1")
+    mock_household_repo.add_user.assert_called_once_with(mock_household.id, "1", batch=mock_household_repo.batch.return_value)
+    mock_user_repo.set_household.assert_called_with("1", mock_household.id, batch=mock_household_repo.batch.return_value)
+    mock_household_repo.batch.return_value.commit.assert_called_once()
     assert len(result) == 1
     assert result[0].id == mock_user.google_id
 
@@ -229,7 +245,7 @@ def test_join_household_same_household(household_controller,mock_household_repo,
     assert len(result) == 1
     assert result[0].id == mock_user.google_id
 
-def test_kick_user_owner(household_controller,mock_household_repo):
+def test_kick_user_owner(household_controller,mock_household_repo, mock_user_repo):
     # Arrange
     mock_household_repo.get_user_ids.return_value = ["1","2"]
 
@@ -239,6 +255,8 @@ def test_kick_user_owner(household_controller,mock_household_repo):
     # Assert
     mock_household_repo.get_user_ids.assert_called_once_with("1")
     mock_household_repo.delete_household.assert_called_once()
+    # every member loses their household, not just the owner
+    assert mock_user_repo.set_household.call_count == 2
     assert result == None
 
 def test_kick_user(household_controller,mock_household_repo, mock_user_repo, mock_user):
@@ -251,7 +269,9 @@ def test_kick_user(household_controller,mock_household_repo, mock_user_repo, moc
 
     # Assert
     mock_household_repo.delete_household.assert_not_called()
-    mock_household_repo.kick_user.assert_called_once_with("1","1")
+    mock_household_repo.kick_user.assert_called_once_with("1","1", batch=mock_household_repo.batch.return_value)
+    mock_user_repo.set_household.assert_called_once_with("1", None, batch=mock_household_repo.batch.return_value)
+    mock_household_repo.forget_catalog.assert_called_once_with("1", batch=mock_household_repo.batch.return_value)
     assert len(result) == 1
 
 def test_kick_user_wrong_id(household_controller,mock_household_repo):
@@ -266,7 +286,7 @@ def test_kick_user_wrong_id(household_controller,mock_household_repo):
     mock_household_repo.delete_household.assert_not_called()
     assert result == None
 
-def test_create_household(household_controller,mock_household_repo):
+def test_create_household(household_controller,mock_household_repo, mock_user_repo):
     # Arrange
     mock_household_repo.create_household.return_value = "household"
 
@@ -274,5 +294,7 @@ def test_create_household(household_controller,mock_household_repo):
     result = household_controller.create_household("1")
 
     # Assert
-    mock_household_repo.create_household.assert_called_once_with("1")
+    mock_household_repo.create_household.assert_called_once_with("1", batch=mock_household_repo.batch.return_value)
+    mock_user_repo.set_household.assert_called_once_with("1", "household", batch=mock_household_repo.batch.return_value)
+    mock_household_repo.batch.return_value.commit.assert_called_once()
     assert result == 'household'
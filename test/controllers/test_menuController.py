@@ -3,6 +3,7 @@ from unittest.mock import MagicMock
 from repositories.householdRepository import HouseholdRepository
 from repositories.userRepository import UserRepository
 from controllers.menuController import MenuController
+from controllers.catalogController import CatalogController
 from repositories.webRecipesRepository import RecipeData, WebRecipesRepository
 from fastapi import HTTPException
 
@@ -19,8 +20,12 @@ def mock_webRecipesRepo():
     return MagicMock(spec=WebRecipesRepository)
 
 @fixture
-def menu_controller(mock_household_repo, mock_user_repo, mock_webRecipesRepo):
-    return MenuController(mock_household_repo, mock_user_repo, mock_webRecipesRepo)
+def mock_catalog():
+    return MagicMock(spec=CatalogController)
+
+@fixture
+def menu_controller(mock_household_repo, mock_user_repo, mock_webRecipesRepo, mock_catalog):
+    return MenuController(mock_household_repo, mock_user_repo, mock_webRecipesRepo, mock_catalog)
 
 
 def test_add_recipe(menu_controller,mock_household_repo, mock_menu_item, mock_recipe):
@@ -32,10 +37,25 @@ def test_add_recipe(menu_controller,mock_household_repo, mock_menu_item, mock_re
     # Assert
     mock_household_repo.add_recipe_to_menu.assert_called_once()
 
+def test_add_recipe_new_recipe(menu_controller, mock_household_repo, mock_catalog, mock_menu_item, mock_recipe):
+    # Arrange
+    mock_menu_item.recipe_id = None
+    mock_menu_item.recipe = mock_recipe
+    mock_catalog.add_recipe.return_value = "10"
+    mock_household_repo.get_menu_items.return_value = []
+
+    # Act
+    menu_controller.add_recipe("1", mock_menu_item, "2")
+
+    # Assert
+    mock_catalog.add_recipe.assert_called_once_with("1", "2", mock_recipe)
+    assert mock_menu_item.recipe_id == "10"
+    mock_household_repo.add_recipe_to_menu.assert_called_once()
+
 def test_add_recipe_already_there(menu_controller,mock_household_repo, mock_menu_item, mock_recipe):
     # Arrange
     mock_menu_item.recipe_id = '1'
-    mock_household_repo.get_menu_items.return_value = [mock_menu_item]
+    mock_household_repo.add_recipe_to_menu.side_effect = HTTPException(status_code=409)
 
     # Act
     with raises(HTTPException) as exception:
@@ -44,14 +64,12 @@ def test_add_recipe_already_there(menu_controller,mock_household_repo, mock_menu
         # Assert
         assert exception.errisinstance(HTTPException)
 
-def test_get_menu(menu_controller,mock_household_repo, mock_menu_item, mock_recipe, mock_user_repo):
+def test_get_menu(menu_controller,mock_household_repo, mock_menu_item, mock_recipe, mock_catalog):
     # Arrange
     mock_menu_item.recipe_id = "10"
 
     mock_household_repo.get_menu_items.return_value = [mock_menu_item]
-    mock_household_repo.get_user_ids.return_value = ["1"]
-    mock_recipe.id = "10"
-    mock_user_repo.get_user_recipes.return_value = {"10" : mock_recipe}
+    mock_catalog.get_catalog.return_value = {"10": mock_recipe}
 
     # Act
     result = menu_controller.get_menu("1")
@@ -61,14 +79,12 @@ def test_get_menu(menu_controller,mock_household_repo, mock_menu_item, mock_reci
     assert result[0].img_link == mock_recipe.img_link
     assert result[0].title == mock_recipe.title
 
-def test_get_menu_recipes_not_found(menu_controller,mock_household_repo, mock_menu_item, mock_recipe, mock_user_repo):
+def test_get_menu_recipes_not_found(menu_controller,mock_household_repo, mock_menu_item, mock_recipe, mock_catalog):
     # Arrange
     mock_menu_item.recipe_id = "11"
 
     mock_household_repo.get_menu_items.return_value = [mock_menu_item]
-    mock_household_repo.get_user_ids.return_value = ["1"]
-    mock_recipe.id = "10"
-    mock_user_repo.get_user_recipes.return_value = {"10" : mock_recipe}
+    mock_catalog.get_catalog.return_value = {"10": mock_recipe}
 
     # Act
     result = menu_controller.get_menu("1")
@@ -85,7 +101,7 @@ def test_get_menu_item(menu_controller,mock_household_repo, mock_menu_item, mock
     mock_household_repo.get_menu_items.return_value = [mock_menu_item]
     mock_household_repo.get_user_ids.return_value = ["1"]
     mock_recipe.id = "10"
-    mock_user_repo.get_user_recipes.return_value = {"10" : mock_recipe}
+    mock_user_repo.find_user_recipe.return_value = mock_recipe
 
     # Act
     result = menu_controller.get_menu_item("1",0)
@@ -117,7 +133,7 @@ def test_get_menu_item_by_recipe_id(menu_controller,mock_household_repo, mock_me
     mock_household_repo.get_menu_items.return_value = [mock_menu_item]
     mock_household_repo.get_user_ids.return_value = ["1"]
     mock_recipe.id = "10"
-    mock_user_repo.get_user_recipes.return_value = {"10" : mock_recipe}
+    mock_user_repo.find_user_recipe.return_value = mock_recipe
 
     # Act
     result = menu_controller.get_menu_item_by_recipe_id("1",'10')
@@ -138,7 +154,7 @@ def test_get_menu_item_by_recipe_id_wrong_id(menu_controller,mock_household_repo
     mock_household_repo.get_menu_items.return_value = [mock_menu_item]
     mock_household_repo.get_user_ids.return_value = ["1"]
     mock_recipe.id = "10"
-    mock_user_repo.get_user_recipes.return_value = {"10" : mock_recipe}
+    mock_user_repo.find_user_recipe.return_value = mock_recipe
 
     # Act
     result = menu_controller.get_menu_item_by_recipe_id("1",'wrong')
@@ -146,60 +162,57 @@ def test_get_menu_item_by_recipe_id_wrong_id(menu_controller,mock_household_repo
     # Assert
     assert result is None
 
-def test_get_household_recipes(menu_controller,mock_household_repo, mock_recipe, mock_user_repo):
+@mark.parametrize('recipe_id',['10','5'])
+def test_get_recipe(recipe_id, menu_controller,mock_household_repo, mock_recipe, mock_user_repo):
     # Arrange
-    mock_recipe.id = "10"
-    mock_user_repo.get_user_recipes.return_value = {"10": mock_recipe}
-    mock_household_repo.get_user_ids.return_value = ["1"]
+    mock_household_repo.get_user_ids.return_value = ["1", "2"]
+    mock_user_repo.find_user_recipe.return_value = mock_recipe
 
     # Act
-    result = menu_controller._get_household_recipes("1")
+    result = menu_controller.get_recipe("1",recipe_id)
 
     # Assert
-    assert len(result) == 1
-    assert '10' in result
-    assert result['10'].title == mock_recipe.title
+    mock_user_repo.find_user_recipe.assert_called_once_with(["1", "2"], recipe_id)
+    assert result == mock_recipe
 
-@mark.parametrize('recipe_id,correct',[('10',True),('5',False),('0', False)])
-def test_get_recipe(recipe_id, correct, menu_controller,mock_household_repo, mock_recipe, mock_user_repo):
+def test_finish_recipe(menu_controller,mock_household_repo, mock_recipe, mock_user_repo, mock_catalog):
     # Arrange
-    mock_recipe.id = "10"
     mock_household_repo.get_user_ids.return_value = ["1"]
-    mock_user_repo.get_user_recipes.return_value = {"10": mock_recipe}
+    mock_user_repo.find_recipe_author.return_value = "1"
 
     # Act
-    result = menu_controller.get_recipe("1",recipe_id)
+    result = menu_controller.finish_recipe("1","10",5)
 
     # Assert
-    if correct:
-        assert result != None
-        assert result.title == mock_recipe.title
-    else:
-        assert result == None
+    mock_household_repo.remove_menu_item.assert_called_once()
+    mock_user_repo.find_recipe_author.assert_called_once_with(["1"], "10")
+    mock_catalog.add_recipe_record.assert_called_once()
+    assert mock_catalog.add_recipe_record.call_args[0][:3] == ("1", "1", "10")
+    assert mock_catalog.add_recipe_record.call_args[0][3].rating == 5
 
-def test_finish_recipe(menu_controller,mock_household_repo, mock_recipe, mock_user_repo):
+def test_finish_recipe_no_rating(menu_controller,mock_household_repo, mock_user_repo, mock_recipe, mock_catalog):
     # Arrange
     mock_household_repo.get_user_ids.return_value = ["1"]
-    mock_user_repo.get_user_recipes.return_value = {"10":mock_recipe}
+    mock_user_repo.find_recipe_author.return_value = "1"
 
     # Act
-    result = menu_controller.finish_recipe("1","10",5)
+    menu_controller.finish_recipe("1","10")
 
     # Assert
     mock_household_repo.remove_menu_item.assert_called_once()
-    mock_user_repo.add_recipe_record.assert_called_once()
+    mock_catalog.add_recipe_record.assert_called_once()
 
-def test_finish_recipe_no_rating(menu_controller,mock_household_repo, mock_user_repo, mock_recipe):
+def test_finish_recipe_missing(menu_controller,mock_household_repo, mock_user_repo, mock_catalog):
     # Arrange
     mock_household_repo.get_user_ids.return_value = ["1"]
-    mock_user_repo.get_user_recipes.return_value = {"10":mock_recipe}
+    mock_user_repo.find_recipe_author.return_value = None
 
     # Act
-    menu_controller.finish_recipe("1","10")
+    with raises(HTTPException):
+        menu_controller.finish_recipe("1","10")
 
     # Assert
-    mock_household_repo.remove_menu_item.assert_called_once()
-    mock_user_repo.add_recipe_record.assert_called_once()
+    mock_catalog.add_recipe_record.assert_not_called()
 
 def test_update_menu_item(menu_controller, mock_household_repo, mock_menu_item):
     #Act
@@ -1,8 +1,14 @@
-from pytest import fixture
+from pytest import fixture, raises
+from fastapi import HTTPException
 from unittest.mock import MagicMock
 from repositories.userRepository import UserRepository
 from repositories.householdRepository import HouseholdRepository
 from controllers.shoppingListController import ShoppingListController
+from controllers.catalogController import CatalogController
+from models.Recipe import CatalogEntry
+from models.ShoppingItem import ShoppingItem, ShoppingListOperation, AddOperation, CheckOperation, EditOperation, MoveOperation, RemoveOperation, ReorderOperation
+from pydantic import TypeAdapter
+from datetime import datetime, timezone, timedelta
 
 @fixture
 def mock_user_repo():
@@ -13,40 +19,136 @@ def mock_household_repo():
     return MagicMock(spec=HouseholdRepository)
 
 @fixture
-def shopping_list_controller(mock_household_repo, mock_user_repo):
-    return ShoppingListController(mock_household_repo, mock_user_repo)
+def mock_catalog():
+    return MagicMock(spec=CatalogController)
+
+@fixture
+def shopping_list_controller(mock_household_repo, mock_user_repo, mock_catalog):
+    return ShoppingListController(mock_household_repo, mock_user_repo, mock_catalog)
 
 
-def test_get_shopping_list(shopping_list_controller, mock_household_repo, mock_shopping_item, mock_user_repo, mock_user, mock_recipe):
+def test_get_shopping_list(shopping_list_controller, mock_household_repo, mock_shopping_item, mock_user_repo, mock_catalog, mock_menu_item):
     # Arrange
+    mock_shopping_item.time_checked = None
     mock_household_repo.get_shopping_list.return_value = [mock_shopping_item]
-    mock_user.full_name = "Bob Joe"
-    mock_user_repo.get_user.return_value = mock_user
-    mock_recipe.title = "Fake Soup"
-    mock_user_repo.find_user_recipe.return_value = mock_recipe
+    mock_menu_item.recipe_id = mock_shopping_item.recipe_id
+    mock_household_repo.get_menu_items.return_value = [mock_menu_item]
+    mock_user_repo.get_many.return_value = {mock_shopping_item.user_id: {'full_name': "Bob Joe"}}
+    mock_catalog.get_stored_catalog.return_value = {mock_shopping_item.recipe_id: CatalogEntry(title="Fake Soup", img_link="")}
     # Act
     result = shopping_list_controller.get_shopping_list("1")
     # Assert
+    mock_user_repo.get_many.assert_called_once_with([mock_shopping_item.user_id], field_paths=['full_name'])
+    mock_catalog.get_stored_catalog.assert_called_once_with("1")
+    mock_user_repo.get_recipe_titles.assert_not_called()
+    mock_user_repo.get_user.assert_not_called()
+    mock_user_repo.find_user_recipe.assert_not_called()
     assert result[0].user_id == mock_shopping_item.user_id
     assert result[0].recipe_id == mock_shopping_item.recipe_id
     assert result[0].name == mock_shopping_item.name
     assert result[0].user_initial == "B"
     assert result[0].recipe_title == "Fake Soup"
 
-def test_clean_list(shopping_list_controller, mock_household_repo, mock_household, mock_menu_item):
+def test_get_shopping_list_titles_missing_from_catalog(shopping_list_controller, mock_household_repo, mock_user_repo, mock_catalog):
     # Arrange
-    mock_menu_item.recipe_id = "101"
-    mock_household.menu_recipes = [mock_menu_item]
-    mock_household_repo.get_household.return_value = mock_household
+    mock_household_repo.get_shopping_list.return_value = [
+        ShoppingItem(name="eggs", id="1", user_id="1", recipe_id="10"),
+        ShoppingItem(name="milk", id="2", user_id="1", recipe_id="11"),
+    ]
+    mock_household_repo.get_menu_items.return_value = [MagicMock(recipe_id="10"), MagicMock(recipe_id="11")]
+    mock_household_repo.get_user_ids.return_value = ["1", "2"]
+    mock_user_repo.get_many.return_value = {"1": {'full_name': "Bob Joe"}}
+    # a catalog waiting to be rebuilt, or one that hasn't caught up with a recipe yet
+    mock_catalog.get_stored_catalog.return_value = {"10": CatalogEntry(title="Omelette", img_link="")}
+    mock_user_repo.get_recipe_titles.return_value = {"11": "Pancakes"}
 
+    # Act
+    result = shopping_list_controller.get_shopping_list("1")
+
+    # Assert
+    mock_user_repo.get_recipe_titles.assert_called_once_with(["1", "2"], {"11"})
+    assert [item.recipe_title for item in result] == ["Omelette", "Pancakes"]
+
+def test_get_shopping_list_hides_expired(shopping_list_controller, mock_household_repo, mock_user_repo):
+    # Arrange
+    mock_household_repo.get_shopping_list.return_value = [
+        ShoppingItem(name="old", id="1", checked=True, time_checked=datetime.now(timezone.utc) - timedelta(hours=13), user_id="1"),
+        ShoppingItem(name="orphaned", id="2", user_id="1", recipe_id="10"),
+        ShoppingItem(name="fresh", id="3", checked=True, time_checked=datetime.now(timezone.utc), user_id="1"),
+    ]
+    mock_household_repo.get_menu_items.return_value = []
+    mock_user_repo.get_many.return_value = {"1": {'full_name': "Bob Joe"}}
+
+    # Act
+    result = shopping_list_controller.get_shopping_list("1")
+
+    # Assert
+    assert [item.name for item in result] == ["fresh"]
+    mock_household_repo.remove_items.assert_not_called()
+
+def test_get_shopping_list_skips_menu_without_recipe_items(shopping_list_controller, mock_household_repo, mock_user_repo, mock_catalog):
+    # Arrange
+    mock_household_repo.get_shopping_list.return_value = [ShoppingItem(name="eggs", id="1", user_id="1")]
+    mock_user_repo.get_many.return_value = {"1": {'full_name': "Bob Joe"}}
+
+    # Act
+    shopping_list_controller.get_shopping_list("1")
+
+    # Assert
+    mock_household_repo.get_menu_items.assert_not_called()
+    mock_catalog.get_stored_catalog.assert_not_called()
+
+def test_clean_list(shopping_list_controller, mock_household_repo, mock_menu_item):
+    # Arrange
+    mock_menu_item.recipe_id = "101"
+    mock_household_repo.get_menu_items.return_value = [mock_menu_item]
 
     # Act
     shopping_list_controller.clean_list("1")
 
     # Assert
     mock_household_repo.remove_items.assert_called_once()
+    keep = mock_household_repo.remove_items.call_args[0][1]
+    assert keep({'recipe_id': "101", 'time_checked': None})
+    assert not keep({'recipe_id': "102", 'time_checked': None})
+    assert not keep({'recipe_id': None, 'time_checked': datetime(2000, 1, 1)})
+
+def test_remove_item_by_shown_index(shopping_list_controller, mock_household_repo):
+    # Arrange
+    mock_household_repo.get_shopping_list.return_value = [
+        ShoppingItem(name="old", id="1", checked=True, time_checked=datetime.now(timezone.utc) - timedelta(hours=13), user_id="1"),
+        ShoppingItem(name="eggs", id="2", user_id="1"),
+    ]
 
+    # Act
+    shopping_list_controller.remove_item("1", 0)
 
+    # Assert
+    mock_household_repo.remove_items.assert_not_called()
+    mock_household_repo.get_menu_items.assert_not_called()
+    mock_household_repo.remove_item.assert_called_once_with("1", "2")
+
+def test_remove_item_bad_index(shopping_list_controller, mock_household_repo):
+    # Arrange
+    mock_household_repo.get_shopping_list.return_value = []
+
+    # Act / Assert
+    with raises(HTTPException) as e:
+        shopping_list_controller.remove_item("1", 0)
+    assert e.value.status_code == 400
+    mock_household_repo.remove_item.assert_not_called()
+
+def test_move_item_by_shown_index(shopping_list_controller, mock_household_repo):
+    # Arrange
+    mock_household_repo.get_shopping_list.return_value = [ShoppingItem(name=id, id=id, user_id="1") for id in ["a", "b", "c"]]
+
+    # Act
+    shopping_list_controller.move_item("1", 2, 0)
+    shopping_list_controller.move_item("1", 0, 2)
+
+    # Assert
+    assert mock_household_repo.move_item.call_args_list[0][0] == ("1", "c", "a")
+    assert mock_household_repo.move_item.call_args_list[1][0] == ("1", "a", None)
 
 def test_add_item(shopping_list_controller, mock_household_repo, mock_user_repo, mock_shopping_item):
     # Arrange
@@ -108,9 +210,53 @@ def test_edit_item(shopping_list_controller, mock_household_repo, mock_shopping_
 
 def test_remove_item(shopping_list_controller, mock_household_repo):
     # Arrange
+    mock_household_repo.get_shopping_list.return_value = [ShoppingItem(name="eggs", id="1", user_id="1")]
 
     # Act
     shopping_list_controller.remove_item("1", 0)
 
     # Assert
-    mock_household_repo.remove_item.assert_called_once()
\ No newline at end of file
+    mock_household_repo.remove_item.assert_called_once()
+
+def test_apply_operations(shopping_list_controller, mock_household_repo, mock_user_repo):
+    # Arrange
+    mock_household_repo.get_shopping_list.return_value = [ShoppingItem(name=id, id=id, user_id="1") for id in ["a", "b"]]
+    operations = [
+        AddOperation(op='add', item=ShoppingItem(name="eggs")),
+        CheckOperation(op='check', id="1"),
+        EditOperation(op='edit', id="1", item=ShoppingItem(name="milk")),
+        MoveOperation(op='move', from_index=0, to_index=1),
+        RemoveOperation(op='remove', index=0),
+        ReorderOperation(op='reorder', items=[])
+    ]
+
+    # Act
+    shopping_list_controller.apply_operations("1", "2", operations)
+
+    # Assert
+    assert mock_household_repo.add_item.call_args[0][1].user_id == "2"
+    mock_household_repo.check_item.assert_called_once_with("1", "1")
+    mock_household_repo.update_item.assert_called_once_with("1", "1", operations[2].item)
+    mock_household_repo.move_item.assert_called_once_with("1", "a", None)
+    # the mock repository doesn't apply the move, so index 0 is still the first item
+    mock_household_repo.remove_item.assert_called_once_with("1", "a")
+    mock_household_repo.reorder_items.assert_called_once_with("1", [])
+    mock_user_repo.add_user_suggestions.assert_called_once_with("2", ["eggs"])
+
+def test_apply_operations_parses_ops():
+    # Act
+    operations = TypeAdapter(list[ShoppingListOperation]).validate_python([
+        {"op": "check", "id": "1"},
+        {"op": "move", "from_index": 0, "to_index": 2}
+    ])
+
+    # Assert
+    assert type(operations[0]) == CheckOperation
+    assert type(operations[1]) == MoveOperation
+
+def test_apply_operations_no_suggestions(shopping_list_controller, mock_user_repo):
+    # Act
+    shopping_list_controller.apply_operations("1", "2", [CheckOperation(op='check', id="1")])
+
+    # Assert
+    mock_user_repo.add_user_suggestions.assert_not_called()
@@ -0,0 +1,37 @@
+from pytest import fixture
+from unittest.mock import MagicMock
+from google.cloud.firestore_v1.client import Client
+from migrations import backfillHouseholdIds
+from migrations.backfillHouseholdIds import backfill
+
+@fixture
+def mock_client():
+    return MagicMock(spec=Client)
+
+def test_backfill(mock_client, mock_collection, mock_snapshot):
+    # Arrange
+    mock_snapshot.id = "household"
+    mock_snapshot.to_dict.return_value = {"owner_id": "1", "users": ["2", "3"]}
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+
+    # Act
+    result = backfill(mock_client, mock_collection, mock_collection)
+
+    # Assert
+    assert result == 3
+    batch = mock_client.batch.return_value
+    assert batch.set.call_count == 3
+    assert batch.set.call_args[0][1] == {"household_id": "household"}
+    batch.commit.assert_called_once()
+
+def test_backfill_commits_in_chunks(mock_client, mock_collection, mock_snapshot, monkeypatch):
+    # Arrange
+    monkeypatch.setattr(backfillHouseholdIds, "BATCH_SIZE", 2)
+    mock_snapshot.to_dict.return_value = {"owner_id": "1", "users": ["2", "3"]}
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+
+    # Act
+    backfill(mock_client, mock_collection, mock_collection)
+
+    # Assert
+    assert mock_client.batch.return_value.commit.call_count == 2
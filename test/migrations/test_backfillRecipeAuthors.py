@@ -0,0 +1,57 @@
+from pytest import fixture
+from unittest.mock import MagicMock
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.collection import CollectionReference
+from migrations import backfillRecipeAuthors
+from migrations.backfillRecipeAuthors import backfill
+
+@fixture
+def mock_client():
+    return MagicMock(spec=Client)
+
+@fixture
+def mock_users(mock_snapshot):
+    mock_users = MagicMock(spec=CollectionReference)
+    mock_users.id = "users"
+    mock_snapshot.reference.parent.parent.parent.id = "users"
+    return mock_users
+
+def test_backfill(mock_client, mock_users, mock_collection, mock_snapshot):
+    # Arrange
+    mock_snapshot.id = "10"
+    mock_snapshot.reference.parent.parent.id = "1"
+    mock_client.collection_group.return_value.select.return_value.stream.return_value = [mock_snapshot]
+
+    # Act
+    result = backfill(mock_client, mock_users, mock_collection)
+
+    # Assert
+    assert result == 1
+    mock_client.collection_group.assert_called_once_with('recipes')
+    mock_collection.document.assert_called_once_with("10")
+    batch = mock_client.batch.return_value
+    batch.set.assert_called_once_with(mock_collection.document.return_value, {'author_id': "1"})
+    batch.commit.assert_called_once()
+
+def test_backfill_commits_in_chunks(mock_client, mock_users, mock_collection, mock_snapshot, monkeypatch):
+    # Arrange
+    monkeypatch.setattr(backfillRecipeAuthors, "BATCH_SIZE", 2)
+    mock_client.collection_group.return_value.select.return_value.stream.return_value = [mock_snapshot] * 3
+
+    # Act
+    backfill(mock_client, mock_users, mock_collection)
+
+    # Assert
+    assert mock_client.batch.return_value.commit.call_count == 2
+
+def test_backfill_skips_other_collections(mock_client, mock_users, mock_collection, mock_snapshot):
+    # Arrange
+    mock_snapshot.reference.parent.parent.parent.id = "test_user"
+    mock_client.collection_group.return_value.select.return_value.stream.return_value = [mock_snapshot]
+
+    # Act
+    result = backfill(mock_client, mock_users, mock_collection)
+
+    # Assert
+    assert result == 0
+    mock_collection.document.assert_not_called()
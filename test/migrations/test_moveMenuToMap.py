@@ -0,0 +1,67 @@
+from pytest import fixture
+from unittest.mock import MagicMock
+from datetime import datetime, timezone
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud.firestore_v1.client import Client
+from migrations.moveMenuToMap import move_menus
+
+@fixture
+def mock_client():
+    return MagicMock(spec=Client)
+
+@fixture(autouse=True)
+def household_document(mock_snapshot, mock_document):
+    # read back as the precondition of the write that moves the menu
+    mock_snapshot.update_time = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    return mock_document
+
+def test_move_menus(mock_client, mock_collection, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.id = "1"
+    mock_snapshot.to_dict.return_value = {
+        "menu_recipes": [{"recipe_id": "a", "note": ""}, {"recipe_id": "b-2", "note": "x"}, {"recipe_id": "c"}],
+        "menu": {"c": {"recipe_id": "c", "order": 5}}
+    }
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+
+    # Act
+    result = move_menus(mock_client, mock_collection)
+
+    # Assert
+    assert result == 2
+    mock_document.update.assert_called_once_with({
+        "menu.a": {"recipe_id": "a", "note": "", "order": 0},
+        "menu.`b-2`": {"recipe_id": "b-2", "note": "x", "order": 1},
+        "menu_recipes": []
+    }, option=mock_client.write_option.return_value)
+    mock_client.write_option.assert_called_once_with(last_update_time=mock_snapshot.update_time)
+
+def test_move_menus_skips_empty_menus(mock_client, mock_collection, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {"menu_recipes": [], "menu": {"a": {"recipe_id": "a"}}}
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+
+    # Act
+    result = move_menus(mock_client, mock_collection)
+
+    # Assert
+    assert result == 0
+    mock_document.update.assert_not_called()
+
+def test_move_menus_rereads_changed_household(mock_client, mock_collection, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.side_effect = [
+        {"menu_recipes": [{"recipe_id": "a"}]},
+        {"menu_recipes": [{"recipe_id": "a"}]},
+        {"menu_recipes": [{"recipe_id": "a"}, {"recipe_id": "b"}]}
+    ]
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+    mock_document.update.side_effect = [FailedPrecondition("changed"), None]
+
+    # Act
+    result = move_menus(mock_client, mock_collection)
+
+    # Assert
+    # the item added between the read and the write is moved too
+    assert result == 2
+    assert "menu.b" in mock_document.update.call_args[0][0]
@@ -0,0 +1,92 @@
+from pytest import fixture
+from unittest.mock import MagicMock
+from datetime import datetime, timezone
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud.firestore_v1 import DELETE_FIELD
+from google.cloud.firestore_v1.client import Client
+from migrations import moveRecipesToSubcollection
+from migrations.moveRecipesToSubcollection import move_recipes
+
+@fixture
+def mock_client():
+    return MagicMock(spec=Client)
+
+@fixture(autouse=True)
+def user_document(mock_snapshot, mock_document):
+    # read back as the precondition of the write that deletes the map
+    mock_snapshot.update_time = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    mock_document.id = "1"
+    return mock_document
+
+def test_move_recipes(mock_client, mock_collection, mock_document, mock_snapshot, mock_recipe_dict):
+    # Arrange
+    mock_snapshot.id = "1"
+    del mock_recipe_dict['author_id']
+    mock_snapshot.to_dict.return_value = {"recipes": {"10": mock_recipe_dict, "11": dict(mock_recipe_dict)}}
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+
+    # Act
+    result = move_recipes(mock_client, mock_collection)
+
+    # Assert
+    assert result == 2
+    batch = mock_client.batch.return_value
+    assert batch.set.call_count == 2
+    assert batch.set.call_args[0][1]['author_id'] == "1"
+    mock_document.collection.assert_called_with('recipes')
+    batch.update.assert_called_once()
+    assert batch.update.call_args[0][1]['recipes'] is DELETE_FIELD
+    mock_client.write_option.assert_called_once_with(last_update_time=mock_snapshot.update_time)
+    batch.commit.assert_called_once()
+
+def test_move_recipes_keeps_copied(mock_client, mock_collection, mock_document, mock_snapshot, mock_recipe_dict):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {"recipes": {"10": mock_recipe_dict, "11": dict(mock_recipe_dict)}}
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+    copied = MagicMock()
+    copied.id = "10"
+    mock_document.collection.return_value.select.return_value.stream.return_value = [copied]
+
+    # Act
+    result = move_recipes(mock_client, mock_collection)
+
+    # Assert
+    assert result == 1
+    mock_document.collection.return_value.document.assert_called_once_with("11")
+
+def test_move_recipes_redoes_changed_user(mock_client, mock_collection, mock_snapshot, mock_recipe_dict):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {"recipes": {"10": mock_recipe_dict}}
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+    mock_client.batch.return_value.commit.side_effect = [FailedPrecondition("changed"), None]
+
+    # Act
+    result = move_recipes(mock_client, mock_collection)
+
+    # Assert
+    assert result == 1
+    assert mock_client.batch.return_value.commit.call_count == 2
+
+def test_move_recipes_skips_moved_users(mock_client, mock_collection, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {}
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+
+    # Act
+    result = move_recipes(mock_client, mock_collection)
+
+    # Assert
+    assert result == 0
+    mock_client.batch.return_value.commit.assert_not_called()
+
+def test_move_recipes_commits_in_chunks(mock_client, mock_collection, mock_snapshot, mock_recipe_dict, monkeypatch):
+    # Arrange
+    monkeypatch.setattr(moveRecipesToSubcollection, "BATCH_SIZE", 2)
+    mock_snapshot.to_dict.return_value = {"recipes": {"10": mock_recipe_dict, "11": dict(mock_recipe_dict), "12": dict(mock_recipe_dict)}}
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+
+    # Act
+    move_recipes(mock_client, mock_collection)
+
+    # Assert
+    assert mock_client.batch.return_value.commit.call_count == 2
@@ -0,0 +1,81 @@
+from pytest import fixture
+from unittest.mock import MagicMock
+from datetime import datetime, timezone
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud.firestore_v1.client import Client
+from migrations import moveShoppingListsToCollection
+from migrations.moveShoppingListsToCollection import move_shopping_lists
+
+@fixture
+def mock_client():
+    return MagicMock(spec=Client)
+
+@fixture(autouse=True)
+def household_document(mock_snapshot, mock_document):
+    # read back as the precondition of the write that empties the array
+    mock_snapshot.update_time = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    return mock_document
+
+def test_move_shopping_lists(mock_client, mock_collection, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.id = "1"
+    mock_snapshot.to_dict.return_value = {"shopping_list": [{"id": "a", "name": "eggs"}, {"name": "milk"}]}
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+
+    # Act
+    result = move_shopping_lists(mock_client, mock_collection)
+
+    # Assert
+    assert result == 2
+    mock_document.collection.assert_called_with('shopping_list')
+    batch = mock_client.batch.return_value
+    first, second = [call[0][1] for call in batch.set.call_args_list]
+    assert first['id'] == "a"
+    assert second['id'] is not None
+    assert first['order'] < second['order']
+    batch.update.assert_called_once_with(mock_document, {'shopping_list': []}, option=mock_client.write_option.return_value)
+    mock_client.write_option.assert_called_once_with(last_update_time=mock_snapshot.update_time)
+    batch.commit.assert_called_once()
+
+def test_move_shopping_lists_skips_empty_lists(mock_client, mock_collection, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {"shopping_list": []}
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+
+    # Act
+    result = move_shopping_lists(mock_client, mock_collection)
+
+    # Assert
+    assert result == 0
+    mock_client.batch.return_value.set.assert_not_called()
+    mock_client.batch.return_value.commit.assert_not_called()
+
+def test_move_shopping_lists_commits_in_chunks(mock_client, mock_collection, mock_snapshot, monkeypatch):
+    # Arrange
+    monkeypatch.setattr(moveShoppingListsToCollection, "BATCH_SIZE", 2)
+    mock_snapshot.to_dict.return_value = {"shopping_list": [{"id": "a"}, {"id": "b"}, {"id": "c"}]}
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+
+    # Act
+    move_shopping_lists(mock_client, mock_collection)
+
+    # Assert
+    assert mock_client.batch.return_value.commit.call_count == 2
+
+def test_move_shopping_lists_redoes_changed_household(mock_client, mock_collection, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.side_effect = [
+        {"shopping_list": [{"id": "a"}]},
+        {"shopping_list": [{"id": "a"}]},
+        {"shopping_list": [{"id": "a"}, {"id": "b"}]}
+    ]
+    mock_collection.select.return_value.stream.return_value = [mock_snapshot]
+    mock_client.batch.return_value.commit.side_effect = [FailedPrecondition("changed"), None]
+
+    # Act
+    result = move_shopping_lists(mock_client, mock_collection)
+
+    # Assert
+    # the item added between the read and the write is copied too
+    assert result == 2
+    assert mock_client.batch.return_value.set.call_count == 3
@@ -1,4 +1,5 @@
 from repositories.webRecipesRepository import RecipeData, WebRecipesRepository
+from bs4 import BeautifulSoup
 from pytest import fixture
 
 @fixture(scope="function")
@@ -224,4 +225,21 @@ def test_get_handles_essential_not_there(test_recipe_dict):
     # Assert
     assert recipe == None
     assert len(recipe_data.failures) == 1
-    assert recipe_data.failures[0] == 'name'
\ No newline at end of file
+    assert recipe_data.failures[0] == 'name'
+
+def test_get_cached(monkeypatch):
+    # Arrange
+    repo = WebRecipesRepository()
+    pages = []
+    def get_soup(url):
+        pages.append(url)
+        return BeautifulSoup('<script type="application/ld+json">{"name": "Cached"}</script>', 'html.parser')
+    monkeypatch.setattr(repo, 'get_soup', get_soup)
+
+    # Act
+    first = repo.get("https://www.fakerecipes.com/cached")
+    second = repo.get("https://www.fakerecipes.com/cached")
+
+    # Assert
+    assert len(pages) == 1
+    assert first.recipe_dict == second.recipe_dict == {"name": "Cached"}
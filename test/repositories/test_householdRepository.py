@@ -1,10 +1,29 @@
 from pytest import mark, fixture, raises
-from repositories.householdRepository import HouseholdRepository
+from repositories.householdRepository import HouseholdRepository, write_metrics
 from models.Household import Household
+from models.ShoppingItem import ShoppingItem
+from models.Recipe import MenuItem, CatalogEntry
+from models.Record import Record
+from datetime import datetime, timezone, timedelta
 from copy import deepcopy
+from unittest.mock import MagicMock
+from fastapi import HTTPException
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud.firestore_v1 import ArrayUnion, DELETE_FIELD
 
 @fixture
-def repo(mock_collection):
+def mock_transaction():
+    # forwards writes to the documents, so tests can check them the same way as writes made outside a transaction
+    transaction = MagicMock()
+    transaction.update.side_effect = lambda ref, changes: ref.update(changes)
+    transaction.set.side_effect = lambda ref, data: ref.set(data)
+    transaction.delete.side_effect = lambda ref: ref.delete()
+    return transaction
+
+@fixture
+def repo(mock_collection, mock_snapshot):
+    # read back as the precondition of read-modify-write updates
+    mock_snapshot.update_time = datetime(2000, 1, 1, tzinfo=timezone.utc)
     return HouseholdRepository(mock_collection)
 
 def test_find_household(repo, mock_snapshot):
@@ -17,6 +36,42 @@ def test_find_household(repo, mock_snapshot):
     # Assert
     assert result == "1234"
 
+def test_find_household_cached(repo, mock_snapshot, mock_query):
+    # Arrange
+    mock_snapshot.id = "1234"
+    repo.find_household("1")
+
+    # Act
+    result: str = repo.find_household("1")
+
+    # Assert
+    assert result == "1234"
+    mock_query.get.assert_called_once()
+
+def test_find_household_forgets_kicked_user(repo, mock_snapshot, mock_query):
+    # Arrange
+    mock_snapshot.id = "1234"
+    repo.find_household("1")
+
+    # Act
+    repo.kick_user("1234", "1")
+
+    # Assert
+    assert repo.find_cached_household("1") == None
+
+def test_find_household_forgets_deleted_household(repo, mock_snapshot):
+    # Arrange
+    mock_snapshot.id = "1234"
+    repo.find_household("1")
+    repo.add_user("1234", "2")
+
+    # Act
+    repo.delete_household("1234")
+
+    # Assert
+    assert repo.find_cached_household("1") == None
+    assert repo.find_cached_household("2") == None
+
 def test_create_household(mock_collection, repo, mock_snapshot):
     # Arrange
     mock_snapshot.id = "1234"
@@ -28,6 +83,37 @@ def test_create_household(mock_collection, repo, mock_snapshot):
     assert result == "1234"
     mock_collection.add.assert_called_once()
 
+def test_create_household_batch(mock_collection, repo, mock_document):
+    # Arrange
+    mock_document.id = "1234"
+    batch = MagicMock()
+
+    # Act
+    result: str = repo.create_household("1", batch=batch)
+
+    # Assert
+    assert result == "1234"
+    mock_collection.add.assert_not_called()
+    batch.set.assert_called_once()
+    # the membership is only cached once the batch has committed
+    assert repo.find_cached_household("1") == None
+    batch.after_commit.call_args[0][0]()
+    assert repo.find_cached_household("1") == "1234"
+
+def test_kick_user_batch_forgets_after_commit(repo, mock_snapshot):
+    # Arrange
+    mock_snapshot.id = "1234"
+    repo.find_household("1")
+    batch = MagicMock()
+
+    # Act
+    repo.kick_user("1234", "1", batch=batch)
+
+    # Assert
+    assert repo.find_cached_household("1") == "1234"
+    batch.after_commit.call_args[0][0]()
+    assert repo.find_cached_household("1") == None
+
 def test_add_user(repo, mock_document):
     # Arrange
 
@@ -286,12 +372,42 @@ def test_remove_item(repo, mock_snapshot, mock_shopping_item, mock_document, moc
     mock_snapshot.to_dict.return_value = mock_household_dict
 
     # Act
-    repo.remove_item("1", 0)
+    repo.remove_item("1", mock_shopping_item_dict['id'])
 
     # Assert
     mock_document.update.assert_called_once()
     assert mock_document.update.call_args[0][0]['shopping_list'] == []
 
+def test_remove_item_removed_by_someone_else(repo, mock_snapshot, mock_household_dict, mock_shopping_item_dict):
+    # Arrange
+    mock_household_dict['shopping_list'] = [mock_shopping_item_dict, {**mock_shopping_item_dict, 'id': '2'}]
+    mock_snapshot.to_dict.return_value = mock_household_dict
+    repo.defer_writes()
+    repo.remove_item("1", "1")
+    # another request removed the item before this one was written
+    mock_snapshot.to_dict.return_value = {**mock_household_dict, 'shopping_list': [{**mock_shopping_item_dict, 'id': '2'}]}
+
+    # Act / Assert
+    with raises(HTTPException) as e:
+        repo.flush()
+    assert e.value.status_code == 409
+
+def test_move_item_follows_the_item(repo, mock_document, mock_snapshot, mock_household_dict, mock_shopping_item_dict):
+    # Arrange
+    items = {id: {**mock_shopping_item_dict, 'id': id} for id in ['a', 'b', 'c', 'd']}
+    mock_household_dict['shopping_list'] = [items['a'], items['b'], items['c']]
+    mock_snapshot.to_dict.return_value = mock_household_dict
+    repo.defer_writes()
+    repo.move_item("1", 'c', 'a')
+    # another request added an item to the top before this one was written
+    mock_snapshot.to_dict.return_value = {**mock_household_dict, 'shopping_list': [items['d'], items['a'], items['b'], items['c']]}
+
+    # Act
+    repo.flush()
+
+    # Assert
+    assert [x['id'] for x in mock_document.update.call_args[0][0]['shopping_list']] == ['d', 'c', 'a', 'b']
+
 def test_get_menu_items(repo, mock_snapshot, mock_household_dict, mock_menu_item_dict):
     # Arrange
     mock_household_dict['menu_recipes'] = [mock_menu_item_dict]
@@ -316,8 +432,9 @@ def test_get_menu_item_by_index(repo, mock_snapshot, mock_household_dict, mock_m
     # Assert
     assert menu_item.model_dump() == mock_menu_item_dict
 
-def test_add_recipe_to_menu(repo, mock_document, mock_menu_item):
+def test_add_recipe_to_menu(repo, mock_document, mock_snapshot, mock_household_dict, mock_menu_item):
     # Arrange
+    mock_snapshot.to_dict.return_value = mock_household_dict
 
     # Act
     repo.add_recipe_to_menu("1", mock_menu_item)
@@ -326,6 +443,21 @@ def test_add_recipe_to_menu(repo, mock_document, mock_menu_item):
     mock_menu_item.model_dump.assert_called_once()
     mock_document.update.assert_called_once()
 
+def test_add_recipe_to_menu_already_there(repo, mock_document, mock_snapshot, mock_household_dict, mock_menu_item_dict, mock_menu_item):
+    # Arrange
+    mock_menu_item_dict['recipe_id'] = '1'
+    mock_household_dict['menu_recipes'] = [mock_menu_item_dict]
+    mock_snapshot.to_dict.return_value = mock_household_dict
+    mock_menu_item.recipe_id = '1'
+
+    # Act
+    with raises(HTTPException) as exception:
+        repo.add_recipe_to_menu("1", mock_menu_item)
+
+    # Assert
+    assert exception.value.status_code == 409
+    mock_document.update.assert_not_called()
+
 def test_get_user_ids(repo, mock_snapshot, mock_household_dict):
     # Arrange
     mock_household_dict['owner_id'] = "1"
@@ -350,8 +482,12 @@ def test_remove_menu_item(repo, mock_document, mock_household_dict, mock_snapsho
     repo.remove_menu_item("1", input_value)
 
     # Assert
-    mock_document.update.assert_called_once()
-    assert len(mock_document.update.call_args[0][0]['menu_recipes']) == expected_size
+    if expected_size == 0:
+        mock_document.update.assert_called_once()
+        assert len(mock_document.update.call_args[0][0]['menu_recipes']) == expected_size
+    else:
+        # nothing changed, so nothing is written
+        mock_document.update.assert_not_called()
 
 @mark.parametrize('input_value,no_error',[('1',True),('wrongvalue',False)])
 def test_update_menu_item(repo, mock_document, mock_household_dict, mock_snapshot, mock_menu_item_dict, mock_menu_item, input_value, no_error):
@@ -359,6 +495,7 @@ def test_update_menu_item(repo, mock_document, mock_household_dict, mock_snapsho
     mock_household_dict['menu_recipes'] = [mock_menu_item_dict]
     mock_snapshot.to_dict.return_value = mock_household_dict
     mock_menu_item.recipe_id = input_value
+    mock_menu_item.note = "new note"
 
     # Act
     repo.update_menu_item("1", 0, mock_menu_item)
@@ -392,6 +529,7 @@ def test_update_menu_item_by_recipe_id(repo, mock_document, mock_household_dict,
     mock_household_dict['menu_recipes'] = [mock_menu_item_dict]
     mock_snapshot.to_dict.return_value = mock_household_dict
     mock_menu_item.recipe_id = input_value
+    mock_menu_item.note = "new note"
 
     # Act
     repo.update_menu_item_by_recipe_id("1", input_value, mock_menu_item)
@@ -404,4 +542,585 @@ def test_update_menu_item_by_recipe_id(repo, mock_document, mock_household_dict,
         assert updated_items[0]['note'] == mock_menu_item.note
         assert updated_items[0]['date'] == mock_menu_item.date
     else:
-        mock_document.update.assert_not_called()
\ No newline at end of file
+        mock_document.update.assert_not_called()
+
+def test_get_household_reads_once(repo, mock_document, mock_snapshot, mock_household_dict):
+    # Arrange
+    mock_snapshot.to_dict.return_value = mock_household_dict
+
+    # Act
+    household = repo.get_household("1")
+    user_ids = repo.get_user_ids("1")
+    repo.get_shopping_list("1")
+
+    # Assert
+    mock_document.get.assert_called_once()
+    assert repo.get_household("1") == household
+    assert user_ids == [mock_household_dict['owner_id'], *mock_household_dict['users']]
+
+def test_get_household_returns_copy(repo, mock_snapshot, mock_household_dict):
+    # Arrange
+    mock_snapshot.to_dict.return_value = mock_household_dict
+    household = repo.get_household("1")
+
+    # Act
+    household.users.append("intruder")
+    household.owner_id = "intruder"
+
+    # Assert
+    assert "intruder" not in repo.get_household("1").users
+    assert repo.get_user_ids("1") == [mock_household_dict['owner_id'], *mock_household_dict['users']]
+
+def test_reads_see_own_writes(repo, mock_document, mock_snapshot, mock_household_dict, mock_shopping_item_dict):
+    # Arrange
+    mock_household_dict['shopping_list'] = [mock_shopping_item_dict]
+    mock_snapshot.to_dict.return_value = mock_household_dict
+    repo.get_shopping_list("1")
+
+    # Act
+    repo.check_item("1", "1")
+    result = repo.get_shopping_list("1")
+
+    # Assert
+    # the first read, then the one inside the write's transaction
+    assert mock_document.get.call_count == 2
+    mock_document.update.assert_called_once()
+    assert result[0].checked
+
+def test_deferred_writes_flushed_once(repo, mock_document, mock_snapshot, mock_household_dict, mock_shopping_item_dict):
+    # Arrange
+    mock_household_dict['shopping_list'] = [mock_shopping_item_dict]
+    mock_snapshot.to_dict.side_effect = lambda: deepcopy(mock_household_dict)
+    repo.defer_writes()
+
+    # Act
+    repo.check_item("1", "1")
+    repo.update_item("1", "1", ShoppingItem(name="renamed"))
+    mock_document.update.assert_not_called()
+    repo.flush()
+
+    # Assert
+    mock_document.update.assert_called_once()
+    written = mock_document.update.call_args[0][0]['shopping_list']
+    assert written[0]['name'] == "renamed"
+    assert written[0]['checked']
+
+def test_write_has_update_time_precondition(repo, mock_document, mock_snapshot, mock_household_dict, mock_shopping_item_dict):
+    # Arrange
+    mock_household_dict['shopping_list'] = [mock_shopping_item_dict]
+    mock_snapshot.to_dict.return_value = mock_household_dict
+
+    # Act
+    repo.update_item("1", "1", ShoppingItem(name="renamed"))
+
+    # Assert
+    option = mock_document.update.call_args[1]['option']
+    assert option._last_update_time == mock_snapshot.update_time
+
+def test_write_retried_on_conflict(repo, mock_document, mock_snapshot, mock_household_dict, mock_shopping_item_dict, monkeypatch):
+    # Arrange
+    monkeypatch.setattr("writequeue.time.sleep", lambda seconds: None)
+    other = {**mock_shopping_item_dict, 'id': '2', 'name': 'added by someone else'}
+    mock_snapshot.to_dict.side_effect = [{'shopping_list': [dict(mock_shopping_item_dict)]}, {'shopping_list': [other, dict(mock_shopping_item_dict)]}]
+    mock_document.update.side_effect = [FailedPrecondition("changed"), None]
+    conflicts = write_metrics()['contention']['conflicts']
+
+    # Act
+    repo.update_item("1", "1", ShoppingItem(name="renamed"))
+
+    # Assert
+    assert mock_document.update.call_count == 2
+    written = mock_document.update.call_args[0][0]['shopping_list']
+    assert [item['name'] for item in written] == ['added by someone else', 'renamed']
+    assert write_metrics()['contention']['conflicts'] == conflicts + 1
+
+def test_write_gives_up_after_retries(repo, mock_document, mock_snapshot, mock_household_dict, mock_shopping_item_dict, monkeypatch):
+    # Arrange
+    monkeypatch.setattr("writequeue.time.sleep", lambda seconds: None)
+    mock_household_dict['shopping_list'] = [mock_shopping_item_dict]
+    mock_snapshot.to_dict.side_effect = lambda: deepcopy(mock_household_dict)
+    mock_document.update.side_effect = FailedPrecondition("changed")
+
+    # Act
+    with raises(HTTPException) as exception:
+        repo.update_item("1", "1", ShoppingItem(name="renamed"))
+
+    # Assert
+    assert exception.value.status_code == 409
+    assert mock_document.update.call_count == 5
+
+def test_deferred_mutations_reapplied_to_stored_list(repo, mock_document, mock_snapshot, mock_household_dict, mock_shopping_item_dict):
+    # Arrange
+    other = {**mock_shopping_item_dict, 'id': '2', 'name': 'added by someone else'}
+    mock_household_dict['shopping_list'] = [mock_shopping_item_dict]
+    mock_snapshot.to_dict.side_effect = [deepcopy(mock_household_dict), {'shopping_list': [other, mock_shopping_item_dict]}]
+    repo.defer_writes()
+
+    # Act
+    repo.update_item("1", "1", ShoppingItem(name="renamed"))
+    repo.flush()
+
+    # Assert
+    written = mock_document.update.call_args[0][0]['shopping_list']
+    assert [item['name'] for item in written] == ['added by someone else', 'renamed']
+    assert [item.name for item in repo.get_shopping_list("1")] == ['added by someone else', 'renamed']
+
+def test_deferred_no_change_not_written(repo, mock_document, mock_snapshot, mock_household_dict, mock_shopping_item_dict):
+    # Arrange
+    mock_household_dict['shopping_list'] = [mock_shopping_item_dict]
+    mock_snapshot.to_dict.return_value = mock_household_dict
+    repo.defer_writes()
+
+    # Act
+    repo.remove_items("1", lambda x: True)
+    repo.flush()
+
+    # Assert
+    mock_document.update.assert_not_called()
+
+def test_failed_mutation_skipped(repo, mock_document, mock_snapshot, mock_household_dict, mock_shopping_item_dict):
+    # Arrange
+    mock_household_dict['shopping_list'] = [mock_shopping_item_dict]
+    mock_snapshot.to_dict.return_value = mock_household_dict
+
+    # Act
+    with raises(HTTPException):
+        repo.check_item("1", "missing")
+
+    # Assert
+    mock_document.update.assert_not_called()
+
+def test_deferred_array_transform_then_rewrite(repo, mock_document, mock_snapshot, mock_household_dict, mock_menu_item_dict):
+    # Arrange
+    mock_snapshot.to_dict.side_effect = [deepcopy(mock_household_dict), {'menu_recipes': [mock_menu_item_dict]}]
+    repo.get_household("1")
+    repo.defer_writes()
+    batch = MagicMock()
+    repo.batch = MagicMock(return_value=batch)
+
+    # Act
+    repo.add_recipe_to_menu("1", MenuItem.model_validate(mock_menu_item_dict))
+    repo.update_menu_item_by_recipe_id("1", "1", MenuItem(note="note", recipe_id="1"))
+    repo.flush()
+
+    # Assert
+    # the union is committed first, then the edit is applied to what it left behind
+    assert type(batch.update.call_args[0][1]['menu_recipes']) == ArrayUnion
+    written = mock_document.update.call_args[0][0]['menu_recipes']
+    assert written[0]['note'] == "note"
+    assert repo.get_menu_items("1")[0].note == "note"
+
+def test_get_user_ids_reads_only_members(repo, mock_document, mock_snapshot, mock_household_dict):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {'owner_id': mock_household_dict['owner_id'], 'users': mock_household_dict['users']}
+
+    # Act
+    user_ids = repo.get_user_ids("1")
+    repo.get_user_ids("1")
+
+    # Assert
+    mock_document.get.assert_called_once_with(field_paths=['owner_id', 'users'])
+    assert user_ids == [mock_household_dict['owner_id'], *mock_household_dict['users']]
+
+def test_partial_read_then_full_keeps_own_writes(repo, mock_document, mock_snapshot, mock_household_dict, mock_shopping_item_dict):
+    # Arrange
+    mock_household_dict['shopping_list'] = [mock_shopping_item_dict]
+    mock_snapshot.to_dict.side_effect = [{'shopping_list': [dict(mock_shopping_item_dict)]}, mock_household_dict]
+    repo.defer_writes()
+
+    # Act
+    repo.update_item("1", "1", ShoppingItem(name="renamed"))
+    household = repo.get_household("1")
+
+    # Assert
+    assert mock_document.get.call_count == 2
+    assert household.shopping_list[0].name == "renamed"
+    assert household.owner_id == mock_household_dict['owner_id']
+
+def test_get_catalog(repo, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {'recipes': {'10': {'title': 'fake', 'img_link': '', 'author_id': '1', 'times_made': 2}}, 'complete': True}
+    mock_document.collection.return_value.document.return_value = mock_document
+
+    # Act
+    result = repo.get_catalog("1")
+
+    # Assert
+    mock_document.collection.assert_called_once_with('catalog')
+    assert result['10'].title == 'fake'
+    assert result['10'].times_made == 2
+
+@mark.parametrize('stored', [
+    None,
+    {'recipes': {'10': {'times_made': 1}}, 'complete': True},
+    # only what was put after the catalog was forgotten
+    {'recipes': {'10': {'title': 'fake', 'img_link': '', 'author_id': '1'}}}])
+def test_get_catalog_needs_rebuild(stored, repo, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.return_value = stored
+    mock_document.collection.return_value.document.return_value = mock_document
+
+    # Act
+    result = repo.get_catalog("1")
+
+    # Assert
+    assert result is None
+
+def test_record_in_catalog(repo, mock_document):
+    # Arrange
+    batch = MagicMock()
+    catalog_doc = mock_document.collection.return_value.document.return_value
+    record = Record(household_id="1", timestamp=datetime.now(timezone.utc), rating=4)
+
+    # Act
+    repo.record_in_catalog("1", "10", record, batch=batch)
+
+    # Assert
+    assert batch.set.call_args[0][0] == catalog_doc
+    rollup = batch.set.call_args[0][1]['recipes']['10']
+    assert set(rollup.keys()) == {'times_made', 'last_made', 'rating_sum', 'rating_count'}
+    assert batch.set.call_args[1] == {'merge': True}
+
+def test_put_catalog_entry(repo, mock_document):
+    # Arrange
+    catalog_doc = mock_document.collection.return_value.document.return_value
+    entry = CatalogEntry(title="fake", img_link="", author_id="1")
+
+    # Act
+    repo.put_catalog_entry("1", "10", entry)
+
+    # Assert
+    catalog_doc.set.assert_called_once_with({'recipes': {'10': entry.model_dump()}}, merge=True)
+
+def test_save_catalog_merges(repo, mock_document):
+    # Arrange
+    catalog_doc = mock_document.collection.return_value.document.return_value
+    entry = CatalogEntry(title="fake", img_link="", author_id="1")
+
+    # Act
+    repo.save_catalog("1", {"10": entry})
+
+    # Assert
+    catalog_doc.set.assert_called_once_with({'recipes': {'10': entry.model_dump()}, 'complete': True}, merge=True)
+
+def test_catalog_entry_rollup(mock_recipe):
+    # Arrange
+    now = datetime.now(timezone.utc)
+    mock_recipe.history = [Record(household_id="1", timestamp=now, rating=4), Record(household_id="1", timestamp=now - timedelta(days=3), rating=2), Record(household_id="1", timestamp=now - timedelta(days=9))]
+
+    # Act
+    entry = CatalogEntry.make_from_recipe(mock_recipe)
+    lite = entry.to_recipe_lite("10", "1")
+
+    # Assert
+    assert entry.times_made == 3
+    assert entry.last_made == now
+    assert lite.id == "10"
+    assert len(lite.history) == 1
+    assert lite.history[0].timestamp == now
+    assert lite.history[0].rating == 3
+
+@fixture
+def collection_repo(mock_collection, mock_transaction):
+    repo = HouseholdRepository(mock_collection)
+    repo.items_in_collection = True
+    repo._run_transaction = lambda write: write(mock_transaction)
+    return repo
+
+def _stored_items(mock_document, items: list[dict]):
+    snapshots = []
+    for item in items:
+        snapshot = MagicMock()
+        snapshot.id = item['id']
+        snapshot.to_dict.return_value = {k: v for k, v in item.items() if k != 'id'}
+        snapshots.append(snapshot)
+    mock_document.collection.return_value.order_by.return_value.stream.return_value = snapshots
+    return mock_document.collection.return_value
+
+def test_collection_get_shopping_list(collection_repo, mock_document, mock_shopping_item_dict):
+    # Arrange
+    items = _stored_items(mock_document, [{**mock_shopping_item_dict, 'order': 'a0'}])
+
+    # Act
+    result = collection_repo.get_shopping_list("1")
+    collection_repo.get_shopping_list("1")
+
+    # Assert
+    mock_document.collection.assert_called_with('shopping_list')
+    items.order_by.assert_called_once_with('order')
+    assert result[0].name == mock_shopping_item_dict['name']
+    mock_document.get.assert_not_called()
+
+def _snapshots(items: list[dict]) -> list:
+    snapshots = []
+    for item in items:
+        snapshot = MagicMock()
+        snapshot.id = item['id']
+        snapshot.exists = True
+        snapshot.to_dict.return_value = {k: v for k, v in item.items() if k != 'id'}
+        snapshots.append(snapshot)
+    return snapshots
+
+def test_collection_update_item_writes_one_item(collection_repo, mock_document, mock_shopping_item_dict, mock_transaction):
+    # Arrange
+    items = mock_document.collection.return_value
+    mock_transaction.get_all.return_value = _snapshots([{**mock_shopping_item_dict, 'order': 'a0'}])
+
+    # Act
+    collection_repo.update_item("1", "1", ShoppingItem(name="renamed"))
+
+    # Assert
+    items.order_by.return_value.stream.assert_not_called()
+    assert {call[0][0] for call in items.document.call_args_list} == {"1"}
+    written = items.document.return_value.set.call_args[0][0]
+    assert written['name'] == "renamed"
+    assert written['order'] == 'a0'
+    mock_document.update.assert_not_called()
+
+def test_collection_update_item_missing(collection_repo, mock_document, mock_transaction):
+    # Arrange
+    mock_transaction.get_all.return_value = []
+
+    # Act / Assert
+    with raises(HTTPException) as e:
+        collection_repo.update_item("1", "1", ShoppingItem(name="renamed"))
+    assert e.value.status_code == 400
+    mock_transaction.set.assert_not_called()
+
+def test_collection_check_item_moves_only_that_item(collection_repo, mock_document, mock_shopping_item_dict, mock_transaction):
+    # Arrange
+    items = mock_document.collection.return_value
+    mock_transaction.get_all.return_value = _snapshots([{**mock_shopping_item_dict, 'order': 'a0'}])
+    # the checked items, and the item just before the first of them
+    items.where.return_value.select.return_value.stream.return_value = _snapshots([{'id': '3', 'order': 'a2'}, {'id': '4', 'order': 'a3'}])
+    before_checked = items.order_by.return_value.start_after.return_value.limit.return_value.select.return_value
+    before_checked.stream.return_value = _snapshots([{'id': '2', 'order': 'a1'}])
+
+    # Act
+    collection_repo.check_item("1", "1")
+
+    # Assert
+    items.order_by.return_value.stream.assert_not_called()
+    items.order_by.return_value.start_after.assert_called_once_with({'order': 'a2'})
+    assert {call[0][0] for call in items.document.call_args_list} == {"1"}
+    written = items.document.return_value.set.call_args[0][0]
+    assert written['checked']
+    assert 'a1' < written['order'] < 'a2'
+
+def test_collection_check_item_without_checked_items(collection_repo, mock_document, mock_shopping_item_dict, mock_transaction):
+    # Arrange
+    items = mock_document.collection.return_value
+    mock_transaction.get_all.return_value = _snapshots([{**mock_shopping_item_dict, 'order': 'a0'}])
+    items.where.return_value.select.return_value.stream.return_value = []
+    # the item itself is last, so the one before it is what it goes after
+    last = items.order_by.return_value.limit.return_value.select.return_value
+    last.stream.return_value = _snapshots([{'id': '1', 'order': 'a0'}, {'id': '2', 'order': 'a1'}])
+
+    # Act
+    collection_repo.check_item("1", "1")
+
+    # Assert
+    assert items.document.return_value.set.call_args[0][0]['order'] > 'a1'
+
+def test_collection_add_item_keys_before_first(collection_repo, mock_document, mock_shopping_item_dict):
+    # Arrange
+    items = _stored_items(mock_document, [{**mock_shopping_item_dict, 'id': '2', 'order': 'a0'}])
+
+    # Act
+    collection_repo.add_item("1", ShoppingItem(name="eggs", id="1"))
+
+    # Assert
+    items.document.assert_called_once_with("1")
+    assert items.document.return_value.set.call_args[0][0]['order'] < 'a0'
+
+def test_collection_remove_item_deletes_one_item(collection_repo, mock_document, mock_shopping_item_dict, mock_transaction):
+    # Arrange
+    items = mock_document.collection.return_value
+    mock_transaction.get_all.return_value = _snapshots([{**mock_shopping_item_dict, 'order': 'a0'}])
+
+    # Act
+    collection_repo.remove_item("1", "1")
+
+    # Assert
+    items.order_by.return_value.stream.assert_not_called()
+    assert {call[0][0] for call in items.document.call_args_list} == {"1"}
+    items.document.return_value.delete.assert_called_once()
+    items.document.return_value.set.assert_not_called()
+
+def test_collection_deferred_writes_flushed_once(collection_repo, mock_document, mock_shopping_item_dict, mock_transaction):
+    # Arrange
+    items = _stored_items(mock_document, [{**mock_shopping_item_dict, 'order': 'a0'}, {**mock_shopping_item_dict, 'id': '2', 'order': 'a1'}])
+    mock_transaction.get_all.return_value = _snapshots([{**mock_shopping_item_dict, 'order': 'a0'}, {**mock_shopping_item_dict, 'id': '2', 'order': 'a1'}])
+    items.where.return_value.select.return_value.stream.return_value = []
+    collection_repo.defer_writes()
+
+    # Act
+    collection_repo.check_item("1", "1")
+    collection_repo.update_item("1", "1", ShoppingItem(name="renamed"))
+    collection_repo.remove_item("1", "2")
+    items.document.return_value.set.assert_not_called()
+    collection_repo.flush()
+
+    # Assert
+    items.order_by.return_value.stream.assert_called_once()
+    mock_transaction.set.assert_called_once()
+    assert mock_transaction.set.call_args[0][1]['name'] == "renamed"
+    assert mock_transaction.set.call_args[0][1]['checked']
+    mock_transaction.delete.assert_called_once()
+
+@fixture
+def map_repo(repo):
+    repo.menu_in_map = True
+    return repo
+
+def test_get_menu_items_merges_layouts(repo, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {
+        'menu_recipes': [{'recipe_id': 'a'}, {'recipe_id': 'b'}],
+        'menu': {
+            'd': {'recipe_id': 'd', 'order': 20},
+            'b': {'recipe_id': 'b', 'note': 'moved', 'order': 0},
+            'c': {'recipe_id': 'c', 'order': 10},
+            'gone': {'note': 'left by an edit after a delete'}
+        }
+    }
+
+    # Act
+    menu_items = repo.get_menu_items("1")
+
+    # Assert
+    assert [x.recipe_id for x in menu_items] == ['a', 'b', 'c', 'd']
+    assert menu_items[1].note == 'moved'
+
+def test_map_add_recipe_to_menu(map_repo, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {'menu_recipes': []}
+
+    # Act
+    map_repo.add_recipe_to_menu("1", MenuItem(recipe_id="a-1", note="hi"))
+
+    # Assert
+    # only the item itself and the old array are read, not the whole menu
+    mock_document.get.assert_called_once_with(field_paths=['menu.`a-1`', 'menu_recipes'])
+    written = mock_document.update.call_args[0][0]['menu.`a-1`']
+    assert written['note'] == "hi"
+    assert written['order'] > 0
+    assert mock_document.update.call_args[1]['option'] is not None
+
+@mark.parametrize('stored', [
+    {'menu': {'a': {'recipe_id': 'a', 'order': 1}}},
+    {'menu_recipes': [{'recipe_id': 'a'}]}
+])
+def test_map_add_recipe_to_menu_already_there(map_repo, mock_document, mock_snapshot, stored):
+    # Arrange
+    mock_snapshot.to_dict.return_value = stored
+
+    # Act
+    with raises(HTTPException) as exception:
+        map_repo.add_recipe_to_menu("1", MenuItem(recipe_id="a"))
+
+    # Assert
+    assert exception.value.status_code == 409
+    mock_document.update.assert_not_called()
+
+def test_map_remove_menu_item(map_repo, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {'menu': {'a': {'recipe_id': 'a', 'order': 1}}, 'menu_recipes': []}
+
+    # Act
+    map_repo.remove_menu_item("1", "a")
+
+    # Assert
+    mock_document.update.assert_called_once()
+    assert mock_document.update.call_args[0][0] == {'menu.a': DELETE_FIELD}
+
+def test_map_remove_menu_item_from_array(map_repo, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {'menu_recipes': [{'recipe_id': 'a'}, {'recipe_id': 'b'}]}
+
+    # Act
+    map_repo.remove_menu_item("1", "a")
+
+    # Assert
+    mock_document.update.assert_called_once()
+    assert mock_document.update.call_args[0][0] == {'menu_recipes': [{'recipe_id': 'b'}]}
+
+def test_map_update_menu_item_by_recipe_id(map_repo, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {'menu': {'a': {'recipe_id': 'a', 'order': 1}}, 'menu_recipes': []}
+
+    # Act
+    map_repo.update_menu_item_by_recipe_id("1", "a", MenuItem(recipe_id="a", note="new note"))
+
+    # Assert
+    mock_document.update.assert_called_once()
+    assert mock_document.update.call_args[0][0] == {'menu.a.note': "new note", 'menu.a.date': None}
+
+def test_map_update_menu_item_in_array(map_repo, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {'menu_recipes': [{'recipe_id': 'a', 'note': None, 'date': None}]}
+
+    # Act
+    map_repo.update_menu_item_by_recipe_id("1", "a", MenuItem(recipe_id="a", note="new note"))
+
+    # Assert
+    # the item is edited where it is rather than shadowed by a stub in the map
+    mock_document.update.assert_called_once()
+    assert mock_document.update.call_args[0][0] == {'menu_recipes': [{'recipe_id': 'a', 'note': "new note", 'date': None}]}
+
+@mark.parametrize('stored', [{}, {'menu': {'a': {'note': 'left by an edit after a delete'}}}])
+def test_map_update_removed_menu_item(map_repo, mock_document, mock_snapshot, stored):
+    # Arrange
+    mock_snapshot.to_dict.return_value = stored
+
+    # Act
+    map_repo.update_menu_item_by_recipe_id("1", "a", MenuItem(recipe_id="a", note="new note"))
+
+    # Assert
+    mock_document.update.assert_not_called()
+
+def test_map_update_menu_item_removed_meanwhile(map_repo, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.side_effect = [{'menu': {'a': {'recipe_id': 'a', 'order': 1}}}, {}, {}]
+    mock_document.update.side_effect = [FailedPrecondition("changed"), None]
+
+    # Act
+    map_repo.update_menu_item_by_recipe_id("1", "a", MenuItem(recipe_id="a", note="new note"))
+
+    # Assert
+    # the retry sees the item is gone and writes nothing
+    mock_document.update.assert_called_once()
+
+def test_map_update_menu_item_checks_recipe(map_repo, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {'menu': {'a': {'recipe_id': 'a', 'order': 1}}}
+
+    # Act
+    map_repo.update_menu_item("1", 0, MenuItem(recipe_id="b", note="new note"))
+
+    # Assert
+    mock_document.update.assert_not_called()
+
+def test_map_deferred_writes_update_reads(map_repo, mock_document, mock_snapshot):
+    # Arrange
+    mock_snapshot.to_dict.side_effect = [
+        {'menu_recipes': [], 'menu': {'a': {'recipe_id': 'a', 'order': 1}}},
+        {'menu_recipes': []},
+        {'menu': {'a': {'recipe_id': 'a', 'order': 1}}, 'menu_recipes': []}
+    ]
+    map_repo.get_menu_items("1")
+    map_repo.defer_writes()
+    batch = MagicMock()
+    map_repo.batch = MagicMock(return_value=batch)
+
+    # Act
+    map_repo.add_recipe_to_menu("1", MenuItem(recipe_id="b"))
+    map_repo.remove_menu_item("1", "a")
+    menu_items = map_repo.get_menu_items("1")
+    map_repo.flush()
+
+    # Assert
+    assert [x.recipe_id for x in menu_items] == ['b']
+    # written straight away under their precondition, so there is nothing left for flush
+    assert mock_document.update.call_count == 2
+    batch.update.assert_not_called()
@@ -1,11 +1,37 @@
 from pytest import mark, fixture
+from cachetools import LRUCache
+from unittest.mock import MagicMock
 from models.User import User
 from models.Recipe import RecipeOut
 from repositories.userRepository import UserRepository
+from google.cloud.firestore_v1.collection import CollectionReference
+from google.cloud.firestore_v1.document import DocumentReference
 
 @fixture
-def user_repo(mock_collection):
-    return UserRepository(mock_collection)
+def mock_author_ref():
+    return MagicMock(spec=CollectionReference)
+
+@fixture
+def user_repo(mock_collection, mock_author_ref, monkeypatch):
+    monkeypatch.setattr("repositories.userRepository._authors", LRUCache(maxsize=10))
+    return UserRepository(mock_collection, mock_author_ref)
+
+@fixture
+def mock_recipe_document():
+    return MagicMock(spec=DocumentReference)
+
+@fixture
+def mock_recipes(mock_document, mock_recipe_document):
+    mock_recipes = MagicMock(spec=CollectionReference)
+    mock_recipes.document.return_value = mock_recipe_document
+    mock_document.collection.return_value = mock_recipes
+    return mock_recipes
+
+@fixture
+def mock_db(monkeypatch):
+    mock_db = MagicMock()
+    monkeypatch.setattr("repositories.userRepository.db", mock_db)
+    return mock_db
 
 def test_create_user(user_repo, mock_document, mock_user, mock_user_dict):
     # Arrange
@@ -99,15 +125,113 @@ def test_get_users_with_whitelist(mock_collection, user_repo, mock_snapshot, moc
     assert result[0] == User.model_validate(mock_user_dict)
     assert len(result) == 1
 
-def test_add_recipe(user_repo, mock_document, mock_recipe):
+def test_get_users_chunks_large_whitelist(mock_collection, user_repo):
+    # Arrange
+    ids = [str(i) for i in range(65)]
+    def query_for(field, op, chunk):
+        query = MagicMock()
+        docs = []
+        for id in chunk:
+            doc = MagicMock()
+            doc.id = id
+            doc.to_dict.return_value = {"full_name": id, "google_id": id}
+            docs.append(doc)
+        query.get.return_value = docs
+        return query
+    mock_collection.where.side_effect = query_for
+
+    # Act
+    result: list[User] = user_repo.get_users(list(reversed(ids)))
+
+    # Assert
+    assert mock_collection.where.call_count == 3
+    assert max(len(call[0][2]) for call in mock_collection.where.call_args_list) == 30
+    assert [x.google_id for x in result] == list(reversed(ids))
+
+def test_get_users_skips_missing(mock_collection, user_repo, mock_snapshot, mock_user_dict, mock_query):
+    # Arrange
+    mock_snapshot.id = 'fake'
+    mock_snapshot.to_dict.return_value = mock_user_dict
+
+    # Act
+    result: list[User] = user_repo.get_users(["gone", "fake"])
+
+    # Assert
+    assert len(result) == 1
+
+def test_get_users_projection(mock_collection, user_repo, mock_snapshot, mock_user_dict, mock_query):
+    # Arrange
+    mock_snapshot.id = 'fake'
+    mock_query.select.return_value = mock_query
+    mock_snapshot.to_dict.return_value = mock_user_dict
+
+    # Act
+    user_repo.get_users(["fake"], field_paths=["recipes"])
+
+    # Assert
+    mock_query.select.assert_called_once_with(["full_name", "google_id", "recipes"])
+
+def test_add_recipe(user_repo, mock_document, mock_recipes, mock_recipe_document, mock_recipe, mock_db, mock_author_ref):
     # Arrange
     
     # Act
-    user_repo.add_recipe("1", mock_recipe)
+    recipe_id = user_repo.add_recipe("1", mock_recipe)
 
     # Assert
-    mock_document.update.assert_called_once()
-    mock_recipe.model_dump.assert_called_once()
+    mock_document.collection.assert_called_once_with('recipes')
+    mock_recipes.document.assert_called_once_with(recipe_id)
+    batch = mock_db.batch.return_value
+    batch.set.assert_any_call(mock_recipe_document, mock_recipe.model_dump.return_value)
+    batch.set.assert_any_call(mock_author_ref.document.return_value, {'author_id': "1"})
+    assert user_repo.get_recipe_author(recipe_id) == "1"
+    assert batch.update.call_args[0][0] == mock_document
+    assert 'recipe_count' in batch.update.call_args[0][1]
+    batch.commit.assert_called_once()
+    mock_document.update.assert_not_called()
+
+def test_add_recipe_in_batch(user_repo, mock_recipes, mock_recipe, mock_db):
+    # Arrange
+    batch = MagicMock()
+
+    # Act
+    user_repo.add_recipe("1", mock_recipe, batch=batch)
+
+    # Assert
+    assert batch.set.call_count == 2
+    batch.update.assert_called_once()
+    batch.commit.assert_not_called()
+    mock_db.batch.assert_not_called()
+
+def test_add_recipe_in_batch_remembers_author_after_commit(user_repo, mock_recipes, mock_recipe, mock_author_ref, mock_snapshot):
+    # Arrange
+    batch = MagicMock()
+    mock_snapshot.exists = False
+    recipe_id = user_repo.add_recipe("1", mock_recipe, batch=batch)
+    mock_author_ref.document.return_value.get.return_value = mock_snapshot
+
+    # Act
+    before = user_repo.get_recipe_author(recipe_id)
+    batch.after_commit.call_args[0][0]()
+    after = user_repo.get_recipe_author(recipe_id)
+
+    # Assert
+    assert before == None
+    assert after == "1"
+
+def test_recipe_authors_cached_per_index(mock_collection, mock_author_ref, mock_snapshot, user_repo):
+    # Arrange
+    mock_author_ref.id = "recipe_authors"
+    other_ref = MagicMock(spec=CollectionReference)
+    other_ref.id = "test_recipe_authors"
+    other_ref.document.return_value.get.return_value = mock_snapshot
+    mock_snapshot.exists = False
+    user_repo._remember_author("10", "1")
+
+    # Act
+    result = UserRepository(mock_collection, other_ref).get_recipe_author("10")
+
+    # Assert
+    assert result == None
 
 def test_add_user_suggestion(user_repo, mock_document):
     # Arrange
@@ -118,64 +242,347 @@ def test_add_user_suggestion(user_repo, mock_document):
     # Assert
     mock_document.update.assert_called_once()
 
-def test_update_recipe(user_repo, mock_document, mock_recipe):
+def test_add_user_suggestions(user_repo, mock_document):
+    # Act
+    user_repo.add_user_suggestions("1", ["eggs", "milk"])
+
+    # Assert
+    mock_document.update.assert_called_once()
+    assert mock_document.update.call_args[0][0]['suggestions'].values == ["eggs", "milk"]
+
+def test_update_recipe(user_repo, mock_document, mock_recipes, mock_recipe_document, mock_recipe):
     # Arrange
     
     # Act
     user_repo.update_recipe("1","1", mock_recipe)
 
     # Assert
-    mock_document.update.assert_called_once()
-    mock_recipe.model_dump.assert_called_once()
+    mock_recipes.document.assert_called_once_with("1")
+    mock_recipe_document.set.assert_called_once_with(mock_recipe.model_dump.return_value)
+    mock_document.update.assert_not_called()
 
-def test_get_user_recipes_empty(user_repo, mock_snapshot, mock_user_dict):
+def test_get_user_recipes_empty(user_repo, mock_recipes, mock_snapshot):
     # Arrange
-    mock_snapshot.to_dict.return_value = mock_user_dict
-    mock_user_dict['recipes'] = {}
-    
+    mock_recipes.stream.return_value = []
+    mock_snapshot.to_dict.return_value = {}
 
     # Act
-    result: list[RecipeOut] = user_repo.get_user_recipes("1")
+    result: dict[str,RecipeOut] = user_repo.get_user_recipes("1")
 
     # Assert
-    mock_snapshot.to_dict.assert_called_once()
+    mock_recipes.stream.assert_called_once()
     assert len(result) == 0
 
-def test_get_user_recipes(user_repo, mock_snapshot, mock_user_dict, mock_recipe_dict):
+def test_get_user_recipes(user_repo, mock_recipes, mock_recipe_dict):
     # Arrange
-    mock_snapshot.to_dict.return_value = mock_user_dict
-    mock_user_dict["recipes"] = {"10": mock_recipe_dict}
-    
+    mock_recipes.stream.return_value = [_doc("10", mock_recipe_dict)]
 
     # Act
     result: dict[str,RecipeOut] = user_repo.get_user_recipes("1")
 
     # Assert
-    mock_snapshot.to_dict.assert_called_once()
     assert len(result) == 1
     # the result should be the same recipe we entered in the "database"
     assert result['10'].model_dump() == mock_recipe_dict
     assert result['10'].id == "10"
 
+def test_get_user_recipes_legacy(user_repo, mock_recipes, mock_document, mock_snapshot, mock_recipe_dict):
+    # Arrange
+    mock_recipes.stream.return_value = []
+    mock_snapshot.to_dict.return_value = {"recipes": {"10": dict(mock_recipe_dict, author_id=None)}}
+
+    # Act
+    result: dict[str,RecipeOut] = user_repo.get_user_recipes("1")
+
+    # Assert
+    mock_document.get.assert_called_once_with(field_paths=['recipes'])
+    assert result['10'].id == "10"
+    assert result['10'].author_id == "1"
+
+def test_get_user_recipes_legacy_and_added(user_repo, mock_recipes, mock_snapshot, mock_recipe_dict):
+    # Arrange
+    mock_recipes.stream.return_value = [_doc("11", dict(mock_recipe_dict, title="edited")), _doc("12", dict(mock_recipe_dict))]
+    mock_snapshot.to_dict.return_value = {"recipes": {"10": dict(mock_recipe_dict), "11": dict(mock_recipe_dict)}}
+
+    # Act
+    result: dict[str,RecipeOut] = user_repo.get_user_recipes("1")
+
+    # Assert
+    assert sorted(result) == ["10", "11", "12"]
+    # the subcollection is where writes go, so it wins
+    assert result["11"].title == "edited"
+
+def test_get_user_recipes_page(user_repo, mock_recipes, mock_recipe_dict):
+    # Arrange
+    query = mock_recipes.order_by.return_value.limit.return_value
+    query.start_after.return_value = query
+    query.stream.return_value = [_doc("11", dict(mock_recipe_dict))]
+
+    # Act
+    result = user_repo.get_user_recipes_page("1", 1, start_after="10")
+
+    # Assert
+    mock_recipes.order_by.return_value.limit.assert_called_once_with(1)
+    assert list(query.start_after.call_args[0][0].values()) == ["10"]
+    assert [x.id for x in result] == ["11"]
+
+def test_get_recipe(user_repo, mock_recipes, mock_recipe_document, mock_recipe_dict):
+    # Arrange
+    mock_recipe_document.get.return_value = _doc("10", dict(mock_recipe_dict))
+
+    # Act
+    result = user_repo.get_recipe("1", "10")
+
+    # Assert
+    mock_recipes.document.assert_called_once_with("10")
+    assert result.id == "10"
+
+def test_get_user_recipes_page_with_legacy(user_repo, mock_recipes, mock_snapshot, mock_recipe_dict):
+    # Arrange
+    query = mock_recipes.order_by.return_value.limit.return_value
+    query.start_after.return_value = query
+    query.stream.return_value = [_doc("13", dict(mock_recipe_dict))]
+    mock_snapshot.to_dict.return_value = {"recipes": {"09": dict(mock_recipe_dict), "12": dict(mock_recipe_dict), "14": dict(mock_recipe_dict)}}
+
+    # Act
+    result = user_repo.get_user_recipes_page("1", 2, start_after="10")
+
+    # Assert
+    assert [x.id for x in result] == ["12", "13"]
+
+def test_get_recipe_legacy(user_repo, mock_recipes, mock_recipe_document, mock_document, mock_snapshot, mock_recipe_dict):
+    # Arrange
+    mock_recipe_document.get.return_value = _doc("10", None)
+    mock_snapshot.to_dict.return_value = {"recipes": {"10": dict(mock_recipe_dict, author_id=None)}}
+
+    # Act
+    result = user_repo.get_recipe("1", "10")
+
+    # Assert
+    mock_document.get.assert_called_once_with(field_paths=['recipes.`10`'])
+    assert result.id == "10"
+    assert result.author_id == "1"
+
+def test_find_user_recipe(user_repo, mock_author_ref, mock_recipes, mock_recipe_document, mock_recipe_dict, mock_db):
+    # Arrange
+    mock_author_ref.document.return_value.get.return_value = _doc("10", {"author_id": "2"})
+    mock_recipe_document.get.return_value = _doc("10", dict(mock_recipe_dict))
+
+    # Act
+    result = user_repo.find_user_recipe(["1", "2"], "10")
+
+    # Assert
+    mock_author_ref.document.assert_called_once_with("10")
+    mock_recipes.document.assert_called_once_with("10")
+    mock_db.get_all.assert_not_called()
+    assert result.title == mock_recipe_dict['title']
+
+def test_find_recipe_author_cached(user_repo, mock_author_ref):
+    # Arrange
+    mock_author_ref.document.return_value.get.return_value = _doc("10", {"author_id": "2"})
+
+    # Act
+    first = user_repo.find_recipe_author(["1", "2"], "10")
+    second = user_repo.find_recipe_author(["2"], "10")
+
+    # Assert
+    assert first == second == "2"
+    mock_author_ref.document.return_value.get.assert_called_once()
+
+def test_find_recipe_author_other_household(user_repo, mock_author_ref, mock_db):
+    # Arrange
+    mock_author_ref.document.return_value.get.return_value = _doc("10", {"author_id": "3"})
+
+    # Act
+    result = user_repo.find_recipe_author(["1", "2"], "10")
+
+    # Assert
+    assert result is None
+    mock_db.get_all.assert_not_called()
+
+def test_find_recipe_author_not_indexed(user_repo, mock_author_ref, mock_recipes, mock_db):
+    # Arrange
+    mock_author_ref.document.return_value.get.return_value = _doc("10", None)
+    found = _doc("10", {"author_id": "2"})
+    found.reference.parent.parent.id = "2"
+    mock_db.get_all.return_value = [_doc("10", None), found]
+
+    # Act
+    result = user_repo.find_recipe_author(["1", "2"], "10")
+
+    # Assert
+    assert result == "2"
+    # each user's subcollection and their document, for recipes still in the legacy map
+    assert len(mock_db.get_all.call_args[0][0]) == 4
+    mock_author_ref.document.return_value.set.assert_called_once_with({"author_id": "2"})
+
+def test_find_recipe_author_legacy(user_repo, mock_author_ref, mock_document, mock_db):
+    # Arrange
+    mock_author_ref.document.return_value.get.return_value = _doc("10", None)
+    user = _doc("2", {"recipes": {"10": {"title": "old"}}})
+    user.reference.path = mock_document.path
+    mock_db.get_all.return_value = [_doc("10", None), user]
+
+    # Act
+    result = user_repo.find_recipe_author(["1", "2"], "10")
+
+    # Assert
+    assert result == "2"
+    assert mock_db.get_all.call_args[1]["field_paths"] == ["author_id", "recipes.`10`"]
+    mock_author_ref.document.return_value.set.assert_called_once_with({"author_id": "2"})
+
+def test_get_recipe_titles(user_repo, mock_document, mock_db):
+    # Arrange
+    legacy = _doc("2", {"recipes": {"10": {"title": "Omelette"}, "11": {"title": "old title"}}})
+    legacy.reference.path = mock_document.path
+    mock_db.get_all.return_value = [_doc("11", {"title": "Pancakes"}), _doc("10", None), legacy]
+
+    # Act
+    result = user_repo.get_recipe_titles(["1", "2"], {"10", "11"})
+
+    # Assert
+    mock_db.get_all.assert_called_once()
+    # two ids under two users, and the two users' documents
+    assert len(mock_db.get_all.call_args[0][0]) == 6
+    assert result == {"10": "Omelette", "11": "Pancakes"}
+
+def test_find_user_recipe_missing(user_repo, mock_author_ref, mock_recipes, mock_db):
+    # Arrange
+    mock_author_ref.document.return_value.get.return_value = _doc("10", None)
+    mock_db.get_all.return_value = [_doc("10", None)]
+
+    # Act
+    result = user_repo.find_user_recipe(["1"], "10")
+
+    # Assert
+    assert result is None
+
+def test_get_user_tags(user_repo, mock_recipes):
+    # Arrange
+    mock_recipes.select.return_value.stream.return_value = [_doc("1", {"tags": ["a", "b"]}), _doc("2", {"tags": ["b"]}), _doc("3", {})]
+
+    # Act
+    result = user_repo.get_user_tags("1")
+
+    # Assert
+    mock_recipes.select.assert_called_once_with(['tags'])
+    assert result == {"a", "b"}
+
+def test_get_user_tags_legacy(user_repo, mock_recipes, mock_snapshot, mock_recipe_dict):
+    # Arrange
+    mock_recipes.select.return_value.stream.return_value = [_doc("1", {"tags": ["a"]})]
+    mock_snapshot.to_dict.return_value = {"recipes": {"1": dict(mock_recipe_dict, tags=["stale"]), "2": dict(mock_recipe_dict, tags=["c"])}}
+
+    # Act
+    result = user_repo.get_user_tags("1")
+
+    # Assert
+    assert result == {"a", "c"}
+
+def _doc(id, data):
+    doc = MagicMock()
+    doc.id = id
+    doc.exists = data is not None
+    doc.to_dict.return_value = data
+    return doc
+
+def test_get_many(user_repo, mock_collection, monkeypatch):
+    # Arrange
+    mock_db = MagicMock()
+    mock_db.get_all.return_value = [_doc("1", {"full_name": "One"}), _doc("2", None)]
+    monkeypatch.setattr("repositories.userRepository.db", mock_db)
+
+    # Act
+    result = user_repo.get_many(["1", "2", "1"], field_paths=["full_name"])
+
+    # Assert
+    mock_db.get_all.assert_called_once()
+    assert len(mock_db.get_all.call_args[0][0]) == 2
+    assert mock_db.get_all.call_args[1]["field_paths"] == ["full_name"]
+    assert result == {"1": {"full_name": "One"}}
+
+def test_get_many_empty(user_repo, monkeypatch):
+    # Arrange
+    mock_db = MagicMock()
+    monkeypatch.setattr("repositories.userRepository.db", mock_db)
+
+    # Act
+    result = user_repo.get_many([])
+
+    # Assert
+    mock_db.get_all.assert_not_called()
+    assert result == {}
+
+def test_get_users_recipes(user_repo, mock_document, mock_snapshot, mock_recipe_dict):
+    # Arrange
+    mock_snapshot.to_dict.return_value = {}
+    first, second = MagicMock(spec=CollectionReference), MagicMock(spec=CollectionReference)
+    first.stream.return_value = []
+    second.stream.return_value = [_doc("10", dict(mock_recipe_dict))]
+    mock_document.collection.side_effect = [first, second]
+
+    # Act
+    result = user_repo.get_users_recipes(["1", "2", "1"])
+
+    # Assert
+    assert list(result.keys()) == ["1", "2"]
+    assert result["1"] == {}
+    assert result["2"]["10"].id == "10"
+
 @mark.parametrize("test_input, expected", [( "fake", 1 ), ( "FAKE", 1), ("f",1), ("Flake", 0)])
-def test_search_user_recipes(user_repo, mock_snapshot, mock_user_dict, mock_recipe_dict, test_input, expected):
+def test_search_user_recipes(user_repo, mock_recipes, mock_recipe_dict, test_input, expected):
     # Arrange
-    mock_snapshot.to_dict.return_value = mock_user_dict
-    
+    mock_recipes.stream.return_value = [_doc("fake_id", dict(mock_recipe_dict))]
 
     # Act
     result: list[RecipeOut] = user_repo.search_user_recipes("1",test_input)
 
     # Assert
-    mock_snapshot.to_dict.assert_called()
+    mock_recipes.stream.assert_called()
     assert len(result) == expected
 
-def test_add_record(user_repo, mock_document, mock_record):
+def test_add_record(user_repo, mock_document, mock_recipes, mock_recipe_document, mock_record):
     # Arrange
     
     # Act
     user_repo.add_recipe_record("1","1", mock_record)
 
     # Assert
+    mock_recipes.document.assert_called_once_with("1")
+    mock_recipe_document.update.assert_called_once()
+    assert "history" in mock_recipe_document.update.call_args[0][0]
+    mock_record.model_dump.assert_called_once()
+    mock_document.update.assert_not_called()
+
+def test_set_household(user_repo, mock_document):
+    # Arrange
+
+    # Act
+    user_repo.set_household("1", "household")
+
+    # Assert
+    mock_document.set.assert_called_once_with({"household_id": "household"}, merge=True)
+
+def test_set_household_batch(user_repo, mock_document):
+    # Arrange
+    batch = MagicMock()
+
+    # Act
+    user_repo.set_household("1", None, batch=batch)
+
+    # Assert
+    mock_document.set.assert_not_called()
+    batch.set.assert_called_once_with(mock_document, {"household_id": None}, merge=True)
+
+def test_add_record_legacy(user_repo, mock_document, mock_recipes, mock_recipe_document, mock_snapshot, mock_recipe_dict, mock_record):
+    # Arrange
+    mock_recipe_document.get.return_value = _doc("10", None)
+    mock_snapshot.to_dict.return_value = {"recipes": {"10": dict(mock_recipe_dict)}}
+
+    # Act
+    user_repo.add_recipe_record("1", "10", mock_record)
+
+    # Assert
+    mock_recipe_document.update.assert_not_called()
     mock_document.update.assert_called_once()
-    mock_record.model_dump.assert_called_once()
\ No newline at end of file
+    assert list(mock_document.update.call_args[0][0]) == ["recipes.`10`.history"]
@@ -2,9 +2,10 @@ from main import app
 from auth import get_user, get_test_user
 from unittest.mock import MagicMock
 from controllers.allRecipes import AllRecipes
+from suggestions import SuggestedRecipes, get_suggested_recipes
 from models.Recipe import RecipeLite
 from pytest import fixture, mark
-from firebase import user_test_ref as mock_ref, user_ref, household_ref, household_test_ref
+from firebase import user_test_ref as mock_ref, user_ref, household_ref, household_test_ref, recipe_author_ref, recipe_author_test_ref
 from fastapi.testclient import TestClient
 
 def mock_all_recipes():
@@ -17,10 +18,15 @@ def mock_all_recipes():
     mock.get_breakfasts.return_value = [recipe for _ in range(50)]
     return mock
 
+suggested = SuggestedRecipes(mock_all_recipes())
+suggested.refresh()
+
 app.dependency_overrides[user_ref] = mock_ref
+app.dependency_overrides[recipe_author_ref] = recipe_author_test_ref
 app.dependency_overrides[household_ref] = household_test_ref
 app.dependency_overrides[get_user] = get_test_user
 app.dependency_overrides[AllRecipes] = mock_all_recipes
+app.dependency_overrides[get_suggested_recipes] = lambda: suggested
 
 @fixture(scope="module")
 def client():
@@ -3,12 +3,13 @@ from auth import get_user, get_test_user
 from pytest import fixture, mark
 from datetime import datetime
 import json
-from firebase import user_test_ref as mock_ref, user_ref, household_ref, household_test_ref
+from firebase import user_test_ref as mock_ref, user_ref, household_ref, household_test_ref, recipe_author_ref, recipe_author_test_ref
 from fastapi.testclient import TestClient
 from models.Recipe import MenuItemLite, MenuItemOut
 
 
 app.dependency_overrides[user_ref] = mock_ref
+app.dependency_overrides[recipe_author_ref] = recipe_author_test_ref
 app.dependency_overrides[household_ref] = household_test_ref
 app.dependency_overrides[get_user] = get_test_user
 
@@ -1,11 +1,12 @@
 from main import app
 from auth import get_user, get_test_user
 from pytest import fixture, mark
-from firebase import user_test_ref as mock_ref, user_ref, household_ref, household_test_ref
+from firebase import user_test_ref as mock_ref, user_ref, household_ref, household_test_ref, recipe_author_ref, recipe_author_test_ref
 from fastapi.testclient import TestClient
 
 
 app.dependency_overrides[user_ref] = mock_ref
+app.dependency_overrides[recipe_author_ref] = recipe_author_test_ref
 app.dependency_overrides[household_ref] = household_test_ref
 app.dependency_overrides[get_user] = get_test_user
 
@@ -153,4 +154,40 @@ def test_delete_item(client, index_value, safe, fake_header):
         response_list2 = response2.json()
         assert len(response_list2) == 0
     else:
-        assert response2.status_code == 400
\ No newline at end of file
+        assert response2.status_code == 400
+
+def test_apply_batch(client, fake_header):
+    # Arrange
+    uid, header = fake_header
+    response1 = client.post("shopping-list/",json={"name":"first item", "user_id": uid}, headers=header)
+    id = response1.json()[0]['id']
+
+    # Act
+    response2 = client.post("shopping-list/batch", json=[
+        {"op": "add", "item": {"name": "second item"}},
+        {"op": "check", "id": id},
+        {"op": "edit", "id": id, "item": {"name": "changed item"}}
+    ], headers=header)
+
+    # Assert
+    assert response2.status_code == 200
+    response_list = response2.json()
+    assert [item['name'] for item in response_list] == ["second item", "changed item"]
+    assert response_list[0]['user_id'] == uid
+    assert response_list[1]['checked'] == True
+
+def test_apply_batch_bad_operation(client, fake_header):
+    # Arrange
+    uid, header = fake_header
+    client.post("shopping-list/",json={"name":"fake item", "user_id": uid}, headers=header)
+
+    # Act
+    response = client.post("shopping-list/batch", json=[
+        {"op": "add", "item": {"name": "second item"}},
+        {"op": "check", "id": "fake_id"}
+    ], headers=header)
+    response2 = client.get("shopping-list/", headers=header)
+
+    # Assert
+    assert response.status_code == 400
+    assert len(response2.json()) == 1
@@ -0,0 +1,75 @@
+from pytest import fixture, raises
+from unittest.mock import patch
+import asyncio, time
+import auth
+
+@fixture(autouse=True)
+def clear_cache():
+    auth.clear_token_cache()
+    yield
+    auth.clear_token_cache()
+
+@fixture
+def claims():
+    now = int(time.time())
+    return {'uid': '1', 'name': 'Bob Testerman', 'iat': now - 10, 'exp': now + 3600}
+
+def test_verify_token_cached(claims):
+    # Arrange
+    with patch('auth.token_verifier.verify', return_value=claims) as verify:
+
+        # Act
+        first = asyncio.run(auth.verify_token("token"))
+        second = asyncio.run(auth.verify_token("token"))
+
+    # Assert
+    verify.assert_called_once_with("token")
+    assert first == second == claims
+
+def test_verify_token_expired_not_cached(claims):
+    # Arrange
+    claims['exp'] = int(time.time()) - 1
+    with patch('auth.token_verifier.verify', return_value=claims) as verify:
+
+        # Act
+        asyncio.run(auth.verify_token("token"))
+        asyncio.run(auth.verify_token("token"))
+
+    # Assert
+    assert verify.call_count == 2
+
+def test_revoke_token(claims):
+    # Arrange
+    with patch('auth.token_verifier.verify', return_value=claims) as verify:
+        asyncio.run(auth.verify_token("token"))
+
+        # Act
+        auth.revoke_token("token")
+        asyncio.run(auth.verify_token("token"))
+
+    # Assert
+    assert verify.call_count == 2
+
+def test_revoke_user_tokens(claims):
+    # Arrange
+    with patch('auth.token_verifier.verify', return_value=claims):
+        asyncio.run(auth.verify_token("token"))
+
+        # Act
+        auth.revoke_user_tokens('1')
+
+        # Assert
+        with raises(ValueError):
+            asyncio.run(auth.verify_token("token"))
+
+def test_revoke_user_tokens_same_second(claims):
+    # Arrange
+    claims['iat'] = int(time.time())
+    with patch('auth.token_verifier.verify', return_value=claims):
+
+        # Act
+        auth.revoke_user_tokens('1')
+
+        # Assert
+        with raises(ValueError):
+            asyncio.run(auth.verify_token("token"))
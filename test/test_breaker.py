@@ -0,0 +1,124 @@
+from pytest import raises
+from breaker import CircuitBreaker, CircuitOpen
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_stays_closed_below_failure_rate():
+    # Arrange
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=4)
+
+    # Act
+    for ok in [True, True, False, True, False, True]:
+        breaker.allow()
+        breaker.record(ok, 0.1)
+
+    # Assert
+    assert breaker.state == 'closed'
+
+def test_opens_on_failures():
+    # Arrange
+    breaker = CircuitBreaker(failure_rate=0.5, min_calls=4)
+
+    # Act
+    for ok in [True, False, True, False]:
+        breaker.allow()
+        breaker.record(ok, 0.1)
+
+    # Assert
+    assert breaker.state == 'open'
+    with raises(CircuitOpen):
+        breaker.allow()
+    assert breaker.snapshot()['rejected'] == 1
+
+def test_opens_on_slow_calls():
+    # Arrange
+    breaker = CircuitBreaker(slow_after=1, min_calls=2)
+
+    # Act
+    for _ in range(2):
+        breaker.allow()
+        breaker.record(True, 3)
+
+    # Assert
+    assert breaker.state == 'open'
+
+def test_forgets_calls_outside_window():
+    # Arrange
+    timer = FakeTimer()
+    breaker = CircuitBreaker(min_calls=2, window=10, timer=timer)
+    breaker.record(False, 0.1)
+
+    # Act
+    timer.now = 20
+    breaker.record(True, 0.1)
+
+    # Assert
+    assert breaker.state == 'closed'
+    assert breaker.snapshot()['recent_calls'] == 1
+
+def test_half_open_probe_closes():
+    # Arrange
+    timer = FakeTimer()
+    breaker = CircuitBreaker(min_calls=1, open_for=30, timer=timer)
+    breaker.record(False, 0.1)
+    timer.now = 31
+
+    # Act
+    breaker.allow()
+
+    # Assert
+    # only the probe is let through
+    with raises(CircuitOpen):
+        breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == 'closed'
+    breaker.allow()
+
+def test_half_open_probe_failure_reopens():
+    # Arrange
+    timer = FakeTimer()
+    breaker = CircuitBreaker(min_calls=1, open_for=30, timer=timer)
+    breaker.record(False, 0.1)
+    timer.now = 31
+    breaker.allow()
+
+    # Act
+    breaker.record(False, 0.1)
+
+    # Assert
+    assert breaker.state == 'open'
+    timer.now = 40
+    with raises(CircuitOpen):
+        breaker.allow()
+
+def test_release_not_counted():
+    # Arrange
+    breaker = CircuitBreaker(min_calls=1)
+
+    # Act
+    breaker.allow()
+    breaker.release()
+
+    # Assert
+    assert breaker.state == 'closed'
+    assert breaker.snapshot()['recent_calls'] == 0
+
+def test_half_open_release_lets_next_probe():
+    # Arrange
+    timer = FakeTimer()
+    breaker = CircuitBreaker(min_calls=1, open_for=30, timer=timer)
+    breaker.record(False, 0.1)
+    timer.now = 31
+    breaker.allow()
+
+    # Act
+    breaker.release()
+
+    # Assert
+    assert breaker.state == 'half_open'
+    breaker.allow()
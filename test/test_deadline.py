@@ -0,0 +1,40 @@
+from pytest import raises
+from deadline import Deadline, DeadlineExceeded, within, current_deadline
+from fanout import gather
+import time
+
+def test_bound():
+    # Arrange
+    deadline = Deadline(1)
+
+    # Act
+    result = deadline.bound(10)
+
+    # Assert
+    assert 0 < result <= 1
+    assert deadline.bound(0.5) == 0.5
+
+def test_bound_expired():
+    # Arrange
+    deadline = Deadline(0)
+
+    # Act / Assert
+    with raises(DeadlineExceeded):
+        deadline.bound(10)
+
+def test_within_keeps_sooner_outer():
+    # Act
+    with within(1) as outer:
+        with within(10) as inner:
+            # Assert
+            assert inner is outer
+            assert current_deadline() is outer
+    assert current_deadline() is None
+
+def test_within_reaches_gathered_calls():
+    # Act
+    with within(1) as deadline:
+        result = gather(current_deadline, current_deadline)
+
+    # Assert
+    assert result == [deadline, deadline]
@@ -0,0 +1,75 @@
+from pytest import raises
+from fanout import gather
+from deadline import current_deadline
+import threading, time
+
+def test_gather_keeps_order():
+    # Arrange
+    calls = [lambda i=i: (time.sleep(0.01 * (3 - i)), i)[1] for i in range(3)]
+
+    # Act
+    result = gather(*calls)
+
+    # Assert
+    assert result == [0, 1, 2]
+
+def test_gather_runs_concurrently():
+    # Arrange
+    barrier = threading.Barrier(3, timeout=1)
+
+    # Act
+    # would time out on the barrier if the calls ran one at a time
+    result = gather(*[lambda: barrier.wait() is not None for _ in range(3)])
+
+    # Assert
+    assert result == [True, True, True]
+
+def test_gather_timeout_gives_default():
+    # Arrange
+    release = threading.Event()
+
+    # Act
+    result = gather(lambda: "fast", lambda: release.wait(1), timeout=0.05, default=[])
+    release.set()
+
+    # Assert
+    assert result == ["fast", []]
+
+def test_gather_raises():
+    # Arrange
+    def fail():
+        raise ValueError("boom")
+
+    # Act / Assert
+    with raises(ValueError):
+        gather(lambda: 1, fail)
+
+def test_gather_nested():
+    # Arrange
+
+    # Act
+    result = gather(lambda: gather(lambda: 1, lambda: 2), lambda: 3)
+
+    # Assert
+    assert result == [[1, 2], 3]
+
+def test_gather_nested_runs_concurrently():
+    # Arrange
+    barrier = threading.Barrier(3, timeout=1)
+
+    # Act
+    # would time out on the barrier if the nested calls ran one at a time
+    result = gather(lambda: gather(*[lambda: barrier.wait() is not None for _ in range(3)]))
+
+    # Assert
+    assert result == [[True, True, True]]
+
+def test_gather_timeout_bounds_calls():
+    # Arrange
+    remaining = []
+
+    # Act
+    gather(lambda: remaining.append(current_deadline().remaining()), timeout=5)
+
+    # Assert
+    assert 0 < remaining[0] <= 5
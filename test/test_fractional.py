@@ -0,0 +1,70 @@
+from pytest import mark, raises
+from fractional import key_between, keys_between, rekey
+
+@mark.parametrize('a,b,expected', [
+    (None, None, 'a0'),
+    (None, 'a0', 'Zz'),
+    ('a0', None, 'a1'),
+    ('a0', 'a1', 'a0V'),
+    ('a0V', 'a1', 'a0l'),
+    ('Zz', 'a0', 'ZzV'),
+    ('a1', 'a2', 'a1V'),
+    ('az', None, 'b00'),
+    ('b00', 'b01', 'b00V'),
+])
+def test_key_between(a, b, expected):
+    # Act
+    result = key_between(a, b)
+
+    # Assert
+    assert result == expected
+
+@mark.parametrize('a,b', [('a1', 'a0'), ('a0', 'a0'), ('a00', None), ('', None)])
+def test_key_between_invalid(a, b):
+    # Act / Assert
+    with raises(ValueError):
+        key_between(a, b)
+
+@mark.parametrize('a,b', [(None, None), ('a0', None), (None, 'a0'), ('a0', 'a1')])
+def test_keys_between(a, b):
+    # Act
+    result = keys_between(a, b, 10)
+
+    # Assert
+    assert len(set(result)) == 10
+    assert result == sorted(result)
+    assert a is None or a < result[0]
+    assert b is None or result[-1] < b
+
+def test_rekey_keeps_ordered_keys():
+    # Arrange
+    keys = ['a0', 'a1', 'a2', 'a3']
+
+    # Act
+    result = rekey(keys)
+
+    # Assert
+    assert result == keys
+
+def test_rekey_moves_only_what_moved():
+    # Arrange
+    keys = ['a0', 'a3', 'a1', 'a2']
+
+    # Act
+    result = rekey(keys)
+
+    # Assert
+    assert result == sorted(result)
+    assert [old == new for old, new in zip(keys, result)] == [True, False, True, True]
+
+def test_rekey_fills_in_new_items():
+    # Arrange
+    keys = [None, 'a0', None, 'a1', None]
+
+    # Act
+    result = rekey(keys)
+
+    # Assert
+    assert result == sorted(result)
+    assert len(set(result)) == 5
+    assert result[1] == 'a0' and result[3] == 'a1'
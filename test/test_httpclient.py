@@ -0,0 +1,196 @@
+from pytest import fixture, raises
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from httpclient import HttpClient, ResponseTooLarge
+from breaker import CircuitBreaker, CircuitOpen
+from deadline import DeadlineExceeded, within
+from fanout import gather
+import asyncio, threading, time
+import httpx
+
+class Origin:
+    def __init__(self):
+        self.ports = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+@fixture
+def origin():
+    state = Origin()
+
+    class Handler(BaseHTTPRequestHandler):
+        # keeps connections open between requests
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            with state.lock:
+                state.ports.append(self.client_address[1])
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+            try:
+                if self.path == '/slow':
+                    time.sleep(0.5)
+                elif self.path == '/busy':
+                    time.sleep(0.1)
+                elif self.path == '/error':
+                    self.send_response(500)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                elif self.path == '/moved':
+                    self.send_response(302)
+                    self.send_header('Location', '/page')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = b'x' * 2000 if self.path == '/big' else b'<html>page</html>'
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state.base = f'http://127.0.0.1:{server.server_port}'
+    yield state
+    server.shutdown()
+    server.server_close()
+
+@fixture
+def client():
+    client = HttpClient(per_host=2, read_timeout=0.2, max_bytes=1000)
+    yield client
+    client.close()
+
+def test_get(client, origin):
+    # Act
+    response = client.get(origin.base + '/page')
+
+    # Assert
+    assert response.status_code == 200
+    assert response.body == b'<html>page</html>'
+
+def test_http2_enabled():
+    # Act
+    client = HttpClient()
+
+    # Assert
+    # h2 is in requirements.txt, so HTTP/2 is negotiated with the hosts that offer it
+    assert client.http2
+
+def test_get_reuses_connection(client, origin):
+    # Act
+    client.get(origin.base + '/page')
+    client.get(origin.base + '/page')
+
+    # Assert
+    assert len(set(origin.ports)) == 1
+
+def test_get_follows_redirects(client, origin):
+    # Act
+    response = client.get(origin.base + '/moved')
+
+    # Assert
+    assert response.url == origin.base + '/page'
+    assert response.body == b'<html>page</html>'
+
+def test_get_limits_requests_per_host(client, origin):
+    # Act
+    gather(*[lambda: client.get(origin.base + '/busy') for _ in range(6)])
+
+    # Assert
+    assert len(origin.ports) == 6
+    assert origin.max_in_flight == 2
+
+def test_get_times_out(client, origin):
+    # Act / Assert
+    with raises(httpx.ReadTimeout):
+        client.get(origin.base + '/slow')
+
+def test_get_timeout_override(client, origin):
+    # Act
+    response = client.get(origin.base + '/slow', timeout=2)
+
+    # Assert
+    assert response.status_code == 200
+
+def test_get_too_large(client, origin):
+    # Act / Assert
+    with raises(ResponseTooLarge):
+        client.get(origin.base + '/big')
+
+def test_fetch_from_async_code(client, origin):
+    # Act
+    response = asyncio.run(client.fetch(origin.base + '/page'))
+
+    # Assert
+    assert response.body == b'<html>page</html>'
+
+def test_get_under_deadline(origin):
+    # Arrange
+    client = HttpClient(read_timeout=2)
+
+    # Act / Assert
+    with within(0.1):
+        with raises(DeadlineExceeded):
+            client.get(origin.base + '/slow')
+    client.close()
+
+def test_get_cancelled_by_deadline_not_counted(origin):
+    # Arrange
+    breaker = CircuitBreaker(min_calls=1)
+    client = HttpClient(read_timeout=2, breaker=lambda: breaker)
+
+    # Act
+    with within(0.1):
+        with raises(DeadlineExceeded):
+            client.get(origin.base + '/slow')
+    # the request is cancelled on the client's loop, after get has returned
+    time.sleep(0.2)
+
+    # Assert
+    assert breaker.state == 'closed'
+    assert breaker.snapshot()['recent_calls'] == 0
+    client.close()
+
+def test_get_queueing_not_counted_as_slow(origin):
+    # Arrange
+    breaker = CircuitBreaker(slow_after=0.75, min_calls=3)
+    client = HttpClient(per_host=1, read_timeout=2, breaker=lambda: breaker)
+
+    # Act
+    # each answer takes 0.5s, but the last one waits 1.5s for its turn
+    responses = gather(*[lambda: client.get(origin.base + '/slow') for _ in range(4)])
+
+    # Assert
+    assert [response.status_code for response in responses] == [200] * 4
+    assert breaker.state == 'closed'
+    client.close()
+
+def test_get_after_deadline_not_sent(client, origin):
+    # Act
+    with within(0):
+        with raises(DeadlineExceeded):
+            client.get(origin.base + '/page')
+
+    # Assert
+    assert origin.ports == []
+
+def test_get_breaker_opens_per_host(origin):
+    # Arrange
+    client = HttpClient(breaker=lambda: CircuitBreaker(min_calls=2))
+    for _ in range(2):
+        client.get(origin.base + '/error')
+
+    # Act / Assert
+    with raises(CircuitOpen):
+        client.get(origin.base + '/page')
+    assert len(origin.ports) == 2
+    assert client.get(origin.base.replace('127.0.0.1', 'localhost') + '/page').status_code == 200
+    client.close()
@@ -0,0 +1,162 @@
+from pytest import fixture, raises
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pagecache import PageCache, CachedPage, canonical_url
+import os, threading, time
+
+class Origin:
+    def __init__(self):
+        self.body = b'<html>first</html>'
+        self.etag = '"v1"'
+        self.requests = []
+        self.delay = 0
+
+@fixture
+def origin():
+    state = Origin()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state.requests.append(dict(self.headers))
+            time.sleep(state.delay)
+            if self.headers.get('If-None-Match') == state.etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', state.etag)
+            self.send_header('Content-Length', str(len(state.body)))
+            self.end_headers()
+            self.wfile.write(state.body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f'http://127.0.0.1:{server.server_port}/recipes/'
+    yield state
+    server.shutdown()
+    server.server_close()
+
+@fixture
+def cache(tmp_path):
+    return PageCache(str(tmp_path / 'pages'), fresh_for=60, revalidate_timeout=0.2)
+
+def _age(cache, url, seconds):
+    page = cache.read(url)
+    page.fetched_at -= seconds
+    cache.write(page)
+
+def test_canonical_url():
+    # Act
+    result = canonical_url('HTTPS://WWW.Allrecipes.com/search?q=b&a=1#top')
+
+    # Assert
+    assert result == 'https://www.allrecipes.com/search?a=1&q=b'
+
+def test_fetch_stores_compressed(cache, origin):
+    # Act
+    body = cache.fetch(origin.url)
+
+    # Assert
+    assert body == b'<html>first</html>'
+    assert cache.read(origin.url).etag == '"v1"'
+    [name] = os.listdir(cache.directory)
+    assert b'first' not in open(os.path.join(cache.directory, name), 'rb').read()
+
+def test_fetch_fresh_from_disk(cache, origin):
+    # Arrange
+    cache.fetch(origin.url)
+
+    # Act
+    # a new worker starts with an empty memory but the same directory
+    body = PageCache(cache.directory).fetch(origin.url)
+
+    # Assert
+    assert body == b'<html>first</html>'
+    assert len(origin.requests) == 1
+
+def test_fetch_revalidates_stale(cache, origin):
+    # Arrange
+    cache.fetch(origin.url)
+    _age(cache, origin.url, 120)
+
+    # Act
+    body = cache.fetch(origin.url)
+
+    # Assert
+    assert body == b'<html>first</html>'
+    assert origin.requests[1]['If-None-Match'] == '"v1"'
+    assert time.time() - cache.read(origin.url).fetched_at < 60
+
+def test_fetch_replaces_changed(cache, origin):
+    # Arrange
+    cache.fetch(origin.url)
+    _age(cache, origin.url, 120)
+    origin.body = b'<html>second</html>'
+    origin.etag = '"v2"'
+
+    # Act
+    body = cache.fetch(origin.url)
+
+    # Assert
+    assert body == b'<html>second</html>'
+    assert cache.read(origin.url).etag == '"v2"'
+
+def test_fetch_serves_stale_when_origin_slow(cache, origin):
+    # Arrange
+    cache.fetch(origin.url)
+    _age(cache, origin.url, 120)
+    origin.delay = 1
+
+    # Act
+    body = cache.fetch(origin.url)
+
+    # Assert
+    assert body == b'<html>first</html>'
+
+def test_fetch_raises_without_copy(cache):
+    # Act / Assert
+    with raises(Exception):
+        cache.fetch('http://127.0.0.1:1/missing')
+
+def test_prune(cache):
+    # Arrange
+    cache.write(CachedPage('http://a/', b'a', time.time()))
+    cache.write(CachedPage('http://b/', b'b', time.time()))
+    old = os.path.join(cache.directory, os.listdir(cache.directory)[0])
+    os.utime(old, (0, 0))
+
+    # Act
+    removed = cache.prune()
+
+    # Assert
+    assert removed == 1
+    assert len(os.listdir(cache.directory)) == 1
+
+def test_trim(cache):
+    # Arrange
+    for i, url in enumerate(['http://a/', 'http://b/', 'http://c/']):
+        cache.write(CachedPage(url, os.urandom(1000), time.time()))
+        os.utime(cache._path(url), (i, i))
+    cache.max_bytes = 2500
+
+    # Act
+    removed = cache.trim()
+
+    # Assert
+    assert removed == 1
+    assert cache.read('http://a/') is None
+    assert cache.read('http://c/') is not None
+
+def test_write_trims(tmp_path):
+    # Arrange
+    cache = PageCache(str(tmp_path / 'pages'), max_bytes=5000)
+
+    # Act
+    for i in range(20):
+        cache.write(CachedPage(f'http://a/{i}', os.urandom(1000), time.time()))
+
+    # Assert
+    assert sum(os.path.getsize(os.path.join(cache.directory, name)) for name in os.listdir(cache.directory)) <= 5000 + 1500
@@ -0,0 +1,48 @@
+from periodic import PeriodicTask
+import asyncio
+
+def test_runs_until_stopped():
+    # Arrange
+    runs = []
+
+    async def job():
+        runs.append(1)
+
+    task = PeriodicTask('Test job', job, lambda: 0.01)
+
+    async def run():
+        task.start()
+        await asyncio.sleep(0.1)
+        await task.stop()
+
+    # Act
+    asyncio.run(run())
+
+    # Assert
+    assert len(runs) > 1
+    assert not task.running
+
+def test_keeps_running_after_failure():
+    # Arrange
+    runs = []
+
+    async def job():
+        runs.append(1)
+        if len(runs) == 1:
+            raise ValueError("first run fails")
+
+    task = PeriodicTask('Test job', job, lambda: 0, retry_after=0.01)
+
+    async def run():
+        task.start()
+        for _ in range(100):
+            if len(runs) > 1:
+                break
+            await asyncio.sleep(0.01)
+        await task.stop()
+
+    # Act
+    asyncio.run(run())
+
+    # Assert
+    assert len(runs) > 1
@@ -0,0 +1,102 @@
+from pytest import raises
+from resultcache import ResultCache, estimate_size
+from models.Recipe import RecipeLite
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_get_builds_once():
+    # Arrange
+    cache = ResultCache(max_bytes=1000)
+    calls = []
+
+    # Act
+    first = cache.get('a', lambda: calls.append(1) or ['x'], ttl=60)
+    second = cache.get('a', lambda: calls.append(1) or ['y'], ttl=60)
+
+    # Assert
+    assert first == second == ['x']
+    assert len(calls) == 1
+    assert cache.snapshot()['hits'] == 1
+    assert cache.snapshot()['misses'] == 1
+
+def test_get_returns_copies():
+    # Arrange
+    cache = ResultCache(max_bytes=1000)
+    cache.get('a', lambda: [RecipeLite(title='soup', src_link='s', img_link='')], ttl=60)
+
+    # Act
+    cache.get('a', lambda: [], ttl=60)[0].title = 'changed'
+
+    # Assert
+    assert cache.get('a', lambda: [], ttl=60)[0].title == 'soup'
+
+def test_get_expires_per_entry():
+    # Arrange
+    timer = FakeTimer()
+    cache = ResultCache(max_bytes=1000, timer=timer)
+    cache.get('short', lambda: 'old', ttl=10)
+    cache.get('long', lambda: 'old', ttl=100)
+
+    # Act
+    timer.now = 50
+
+    # Assert
+    assert cache.get('short', lambda: 'new', ttl=10) == 'new'
+    assert cache.get('long', lambda: 'new', ttl=100) == 'old'
+    assert cache.snapshot()['evictions'] == 0
+
+def test_get_evicts_least_recently_used_within_budget():
+    # Arrange
+    cache = ResultCache(max_bytes=10)
+    cache.get('a', lambda: 'aaaa', ttl=60)
+    cache.get('b', lambda: 'bbbb', ttl=60)
+    cache.get('a', lambda: 'new', ttl=60)
+
+    # Act
+    cache.get('c', lambda: 'cccc', ttl=60)
+
+    # Assert
+    stats = cache.snapshot()
+    assert stats['evictions'] == 1
+    assert stats['bytes'] == 8
+    assert cache.get('a', lambda: 'new', ttl=60) == 'aaaa'
+    assert cache.get('b', lambda: 'new', ttl=60) == 'new'
+
+def test_get_skips_results_over_budget():
+    # Arrange
+    cache = ResultCache(max_bytes=3)
+
+    # Act
+    result = cache.get('a', lambda: 'too big', ttl=60)
+
+    # Assert
+    assert result == 'too big'
+    assert cache.snapshot()['entries'] == 0
+
+def test_get_does_not_cache_failures():
+    # Arrange
+    cache = ResultCache(max_bytes=1000)
+    def fail():
+        raise ValueError()
+
+    # Act
+    with raises(ValueError):
+        cache.get('a', fail, ttl=60)
+
+    # Assert
+    assert cache.get('a', lambda: 'ok', ttl=60) == 'ok'
+
+def test_estimate_size():
+    # Arrange
+    recipe = RecipeLite(title='soup', src_link='s', img_link='')
+
+    # Act
+    result = estimate_size({'recipes': [recipe, recipe]})
+
+    # Assert
+    assert result == len('recipes') + 2 * len(recipe.model_dump_json())
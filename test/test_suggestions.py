@@ -0,0 +1,105 @@
+from pytest import fixture
+from unittest.mock import MagicMock
+from controllers.allRecipes import AllRecipes
+from models.Recipe import RecipeLite
+from suggestions import SuggestedRecipes
+import asyncio, threading, time
+
+def _page(title: str, n: int = 2) -> list[RecipeLite]:
+    return [RecipeLite(title=f"{title} {i}", img_link="") for i in range(n)]
+
+@fixture
+def mock_all_recipes():
+    mock = MagicMock(spec=AllRecipes)
+    mock.get_main_dishes.return_value = _page("main")
+    mock.get_soups.return_value = _page("soup")
+    mock.get_breakfasts.return_value = _page("breakfast")
+    mock.get_desserts.return_value = _page("dessert")
+    return mock
+
+def test_refresh(mock_all_recipes):
+    # Arrange
+    suggested = SuggestedRecipes(mock_all_recipes)
+
+    # Act
+    suggested.refresh()
+
+    # Assert
+    assert [page[0].title for page in suggested.get_pages()] == ["main 0", "soup 0", "breakfast 0", "dessert 0"]
+
+def test_refresh_keeps_failed_pages(mock_all_recipes):
+    # Arrange
+    suggested = SuggestedRecipes(mock_all_recipes)
+    suggested.refresh()
+    mock_all_recipes.get_soups.return_value = []
+    mock_all_recipes.get_main_dishes.return_value = _page("new main")
+
+    # Act
+    suggested.refresh()
+
+    # Assert
+    pages = suggested.get_pages()
+    assert pages[0][0].title == "new main 0"
+    assert pages[1][0].title == "soup 0"
+
+def test_get_pages_returns_copies(mock_all_recipes):
+    # Arrange
+    suggested = SuggestedRecipes(mock_all_recipes)
+    suggested.refresh()
+
+    # Act
+    suggested.get_pages()[0][0].score = 10
+
+    # Assert
+    assert suggested.get_pages()[0][0].score is None
+
+def test_get_pages_does_not_wait_on_refresh(mock_all_recipes):
+    # Arrange
+    release = threading.Event()
+    mock_all_recipes.get_soups.side_effect = lambda: release.wait(1) and _page("soup")
+    suggested = SuggestedRecipes(mock_all_recipes, stale_after=0)
+
+    # Act
+    started = time.monotonic()
+    pages = suggested.get_pages()
+    elapsed = time.monotonic() - started
+    release.set()
+
+    # Assert
+    assert elapsed < 0.5
+    assert pages == [[], [], [], []]
+    for _ in range(100):
+        if suggested.refreshed_at:
+            break
+        time.sleep(0.01)
+    assert suggested.get_pages()[1][0].title == "soup 0"
+
+def test_get_pages_fresh_does_not_refresh(mock_all_recipes):
+    # Arrange
+    suggested = SuggestedRecipes(mock_all_recipes)
+    suggested.refresh()
+
+    # Act
+    suggested.get_pages()
+
+    # Assert
+    mock_all_recipes.get_soups.assert_called_once()
+
+def test_start_refreshes_right_away(mock_all_recipes):
+    # Arrange
+    suggested = SuggestedRecipes(mock_all_recipes, interval=3600)
+
+    async def run():
+        suggested.start()
+        for _ in range(100):
+            if suggested.refreshed_at:
+                break
+            await asyncio.sleep(0.01)
+        await suggested.stop()
+
+    # Act
+    asyncio.run(run())
+
+    # Assert
+    assert suggested.refreshed_at > 0
+    assert not suggested._task.running
@@ -0,0 +1,125 @@
+from pytest import fixture
+from unittest.mock import MagicMock
+from sweeper import ShoppingListSweeper
+from datetime import datetime, timezone, timedelta
+from google.cloud.firestore_v1.document import DocumentReference
+from google.api_core.exceptions import AlreadyExists
+import time
+
+@fixture
+def sweeper(mock_collection):
+    return ShoppingListSweeper(mock_collection, page_size=2)
+
+def _household(id: str, shopping_list: list[dict], menu_ids: list[str] = []):
+    household = MagicMock()
+    household.id = id
+    household.to_dict.return_value = {'shopping_list': shopping_list, 'menu_recipes': [{'recipe_id': x} for x in menu_ids]}
+    return household
+
+def _pages(mock_collection, *pages):
+    query = mock_collection.select.return_value.order_by.return_value.limit.return_value
+    query.stream.return_value = pages[0]
+    query.start_after.return_value.stream.side_effect = [iter(page) for page in pages[1:]]
+    return query
+
+def test_sweep_page_only_writes_expired(sweeper, mock_collection, mock_document, mock_snapshot):
+    # Arrange
+    expired = {'id': '1', 'name': 'old', 'checked': True, 'time_checked': datetime.now(timezone.utc) - timedelta(days=1), 'recipe_id': None}
+    fresh = {'id': '2', 'name': 'new', 'checked': False, 'time_checked': None, 'recipe_id': '10'}
+    _pages(mock_collection, [_household("a", [fresh], ['10']), _household("b", [expired, fresh], ['10'])])
+    mock_snapshot.to_dict.return_value = {'shopping_list': [expired, fresh]}
+    mock_snapshot.update_time = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+    # Act
+    cleaned, last_id = sweeper.sweep_page()
+
+    # Assert
+    assert cleaned == 1
+    assert last_id == "b"
+    mock_collection.document.assert_called_with("b")
+    mock_document.update.assert_called_once()
+    assert [item['id'] for item in mock_document.update.call_args[0][0]['shopping_list']] == ['2']
+
+def test_sweep_page_removes_orphaned_recipe_items(sweeper, mock_collection, mock_document, mock_snapshot):
+    # Arrange
+    orphaned = {'id': '1', 'name': 'flour', 'checked': False, 'time_checked': None, 'recipe_id': '10'}
+    _pages(mock_collection, [_household("a", [orphaned])])
+    mock_snapshot.to_dict.return_value = {'shopping_list': [orphaned]}
+    mock_snapshot.update_time = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+    # Act
+    cleaned, last_id = sweeper.sweep_page()
+
+    # Assert
+    assert cleaned == 1
+    assert last_id is None
+    assert mock_document.update.call_args[0][0]['shopping_list'] == []
+
+def test_sweep_pages_through_households(sweeper, mock_collection, mock_document):
+    # Arrange
+    query = _pages(mock_collection, [_household("a", []), _household("b", [])], [_household("c", [])])
+
+    # Act
+    cleaned = sweeper.sweep()
+
+    # Assert
+    assert cleaned == 0
+    query.start_after.assert_called_once()
+    assert list(query.start_after.call_args[0][0].values()) == ["b"]
+    mock_document.update.assert_not_called()
+
+@fixture
+def lease():
+    lease = MagicMock(spec=DocumentReference)
+    lease.get.return_value.exists = False
+    return lease
+
+def test_acquire_creates_lease(mock_collection, lease):
+    # Arrange
+    sweeper = ShoppingListSweeper(mock_collection, lease=lease)
+
+    # Act
+    result = sweeper.acquire()
+
+    # Assert
+    assert result
+    assert lease.create.call_args[0][0]['holder'] == sweeper.holder
+
+def test_acquire_lease_held_elsewhere(mock_collection, lease):
+    # Arrange
+    lease.get.return_value.exists = True
+    lease.get.return_value.to_dict.return_value = {'holder': 'other', 'expires_at': time.time() + 60}
+    sweeper = ShoppingListSweeper(mock_collection, lease=lease)
+
+    # Act
+    cleaned = sweeper.sweep()
+
+    # Assert
+    assert cleaned == 0
+    mock_collection.select.assert_not_called()
+    lease.update.assert_not_called()
+
+def test_acquire_expired_lease(mock_collection, lease):
+    # Arrange
+    lease.get.return_value.exists = True
+    lease.get.return_value.to_dict.return_value = {'holder': 'other', 'expires_at': time.time() - 1}
+    sweeper = ShoppingListSweeper(mock_collection, lease=lease)
+
+    # Act
+    result = sweeper.acquire()
+
+    # Assert
+    assert result
+    assert lease.update.call_args[0][0]['holder'] == sweeper.holder
+    assert 'option' in lease.update.call_args[1]
+
+def test_acquire_lost_race(mock_collection, lease):
+    # Arrange
+    lease.create.side_effect = AlreadyExists("taken")
+    sweeper = ShoppingListSweeper(mock_collection, lease=lease)
+
+    # Act
+    result = sweeper.acquire()
+
+    # Assert
+    assert not result
@@ -0,0 +1,82 @@
+from pytest import fixture, raises
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives import serialization
+from verifier import TokenVerifier
+import asyncio, json, time
+import jwt
+
+@fixture(scope="module")
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+@fixture
+def key_file(tmp_path, private_key):
+    pem = private_key.public_key().public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    path = tmp_path / "keys.json"
+    path.write_text(json.dumps({"kid1": pem.decode()}))
+    return str(path)
+
+@fixture
+def verifier(key_file):
+    return TokenVerifier("fake-project", key_file=key_file)
+
+@fixture
+def claims():
+    now = int(time.time())
+    return {
+        "iss": "https://securetoken.google.com/fake-project",
+        "aud": "fake-project",
+        "sub": "1",
+        "iat": now,
+        "exp": now + 3600,
+        "auth_time": now
+    }
+
+def make_token(private_key, claims, kid="kid1"):
+    return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+def test_verify(verifier, private_key, claims):
+    # Arrange
+    token = make_token(private_key, claims)
+
+    # Act
+    result = asyncio.run(verifier.verify(token))
+
+    # Assert
+    assert result["uid"] == "1"
+    assert "kid1" in verifier.keys
+
+def test_verify_wrong_audience(verifier, private_key, claims):
+    # Arrange
+    claims["aud"] = "other-project"
+    token = make_token(private_key, claims)
+
+    # Act / Assert
+    with raises(jwt.InvalidTokenError):
+        asyncio.run(verifier.verify(token))
+
+def test_verify_expired(verifier, private_key, claims):
+    # Arrange
+    claims["exp"] = int(time.time()) - 3600
+    token = make_token(private_key, claims)
+
+    # Act / Assert
+    with raises(jwt.InvalidTokenError):
+        asyncio.run(verifier.verify(token))
+
+def test_verify_unknown_key(verifier, private_key, claims):
+    # Arrange
+    token = make_token(private_key, claims, kid="kid2")
+
+    # Act / Assert
+    with raises(jwt.InvalidTokenError):
+        asyncio.run(verifier.verify(token))
+
+def test_verify_wrong_signature(verifier, claims):
+    # Arrange
+    other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    token = make_token(other_key, claims)
+
+    # Act / Assert
+    with raises(jwt.InvalidTokenError):
+        asyncio.run(verifier.verify(token))
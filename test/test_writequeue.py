@@ -0,0 +1,144 @@
+from pytest import raises
+from concurrent.futures import ThreadPoolExecutor
+from writequeue import WriteQueue, ContentionCounters, retry_on_conflict
+import threading
+
+def _commit_to(store: dict, commits: list):
+    def commit(mutations):
+        commits.append(len(mutations))
+        outcomes = []
+        for mutation in mutations:
+            try:
+                store['value'] = mutation(store['value'])
+                outcomes.append(store['value'])
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+    return commit
+
+def test_run_single():
+    # Arrange
+    queue = WriteQueue(window=0)
+    store, commits = {'value': 1}, []
+
+    # Act
+    result = queue.run("key", lambda x: x + 1, _commit_to(store, commits))
+
+    # Assert
+    assert result == 2
+    assert commits == [1]
+
+def test_run_merges_concurrent_mutations():
+    # Arrange
+    queue = WriteQueue(window=0.2)
+    store, commits = {'value': 0}, []
+    commit = _commit_to(store, commits)
+
+    # Act
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        results = list(executor.map(lambda _: queue.run("key", lambda x: x + 1, commit), range(5)))
+
+    # Assert
+    assert store['value'] == 5
+    assert commits == [5]
+    assert sorted(results) == [1, 2, 3, 4, 5]
+    metrics = queue.metrics.snapshot()
+    assert metrics['batches'] == 1
+    assert metrics['max_batch_size'] == 5
+    assert metrics['max_delay_ms'] > 0
+
+def test_run_keeps_keys_apart():
+    # Arrange
+    queue = WriteQueue(window=0.1)
+    stores = {"a": {'value': 0}, "b": {'value': 0}}
+    commits = []
+
+    # Act
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda key: queue.run(key, lambda x: x + 1, _commit_to(stores[key], commits)), ["a", "b", "a", "b"]))
+
+    # Assert
+    assert stores["a"]['value'] == 2
+    assert stores["b"]['value'] == 2
+    assert sorted(commits) == [2, 2]
+
+def test_run_raises_only_in_failed_mutation():
+    # Arrange
+    queue = WriteQueue(window=0.2)
+    store, commits = {'value': 0}, []
+    commit = _commit_to(store, commits)
+    def fail(x):
+        raise ValueError("boom")
+    started = threading.Barrier(2, timeout=1)
+
+    # Act
+    def run(mutation):
+        started.wait()
+        try:
+            return queue.run("key", mutation, commit)
+        except ValueError as e:
+            return e
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(run, [fail, lambda x: x + 1]))
+
+    # Assert
+    assert type(results[0]) == ValueError
+    assert results[1] == 1
+    assert commits == [2]
+
+def test_run_commit_failure_raises_everywhere():
+    # Arrange
+    queue = WriteQueue(window=0)
+    def commit(mutations):
+        raise ConnectionError("down")
+
+    # Act / Assert
+    with raises(ConnectionError):
+        queue.run("key", lambda x: x, commit)
+    assert queue._keys == {}
+
+def test_retry_on_conflict(monkeypatch):
+    # Arrange
+    sleeps = []
+    monkeypatch.setattr("writequeue.time.sleep", sleeps.append)
+    counters = ContentionCounters()
+    outcomes = [ValueError("conflict"), ValueError("conflict"), "written"]
+    def write():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    # Act
+    result = retry_on_conflict(write, (ValueError,), counters, base_delay=0.1)
+
+    # Assert
+    assert result == "written"
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.1 and 0 <= sleeps[1] <= 0.2
+    assert counters.snapshot() == {'attempts': 3, 'conflicts': 2, 'exhausted': 0, 'conflict_rate': 2 / 3}
+
+def test_retry_on_conflict_gives_up(monkeypatch):
+    # Arrange
+    monkeypatch.setattr("writequeue.time.sleep", lambda seconds: None)
+    counters = ContentionCounters()
+    def write():
+        raise ValueError("conflict")
+
+    # Act / Assert
+    with raises(ValueError):
+        retry_on_conflict(write, (ValueError,), counters, attempts=3)
+    assert counters.exhausted == 1
+    assert counters.attempts == 3
+
+def test_retry_on_conflict_other_errors_raise(monkeypatch):
+    # Arrange
+    counters = ContentionCounters()
+    def write():
+        raise KeyError("not a conflict")
+
+    # Act / Assert
+    with raises(KeyError):
+        retry_on_conflict(write, (ValueError,), counters)
+    assert counters.attempts == 1
+    assert counters.conflicts == 0
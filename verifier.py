@@ -0,0 +1,101 @@
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
+from periodic import PeriodicTask
+import asyncio, json, re, time, urllib.request
+import jwt
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+class TokenVerifier:
+    """
+    Verifies Firebase ID tokens against an in-memory copy of Google's signing keys.
+    The key set is refreshed in the background based on the Cache-Control max-age it was served with,
+    so verifying a token never waits on the network unless the keys are missing or a new key id shows up.
+    Passing key_file uses a local {kid: pem} json file instead of Google's endpoint, which is useful offline.
+    """
+    def __init__(self, project_id: str, certs_url: str = GOOGLE_CERTS_URL, key_file: str | None = None, leeway: int = 60):
+        self.project_id = project_id
+        self.certs_url = certs_url
+        self.key_file = key_file
+        self.leeway = leeway
+        self.keys: dict[str, RSAPublicKey] = {}
+        self.expires_at: float = 0
+        self.refreshed_at: float = 0
+        self._refresh_lock = asyncio.Lock()
+        self._task = PeriodicTask('Signing key refresh', self.refresh, self._refresh_delay)
+
+    @staticmethod
+    def _load_key(pem: str) -> RSAPublicKey:
+        if 'BEGIN CERTIFICATE' in pem:
+            return x509.load_pem_x509_certificate(pem.encode()).public_key()
+        return serialization.load_pem_public_key(pem.encode())
+
+    def _fetch_keys(self) -> tuple[dict[str, str], float]:
+        """
+        Returns the raw key set along with how many seconds it may be cached for.
+        """
+        if self.key_file is not None:
+            with open(self.key_file) as f:
+                return json.load(f), float('inf')
+
+        with urllib.request.urlopen(self.certs_url, timeout=10) as response:
+            max_age = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+            return json.loads(response.read()), int(max_age.group(1)) if max_age else 0
+
+    async def refresh(self) -> None:
+        raw_keys, max_age = await asyncio.to_thread(self._fetch_keys)
+        self.keys = {kid: self._load_key(pem) for kid, pem in raw_keys.items()}
+        self.refreshed_at = time.time()
+        self.expires_at = self.refreshed_at + max_age
+
+    def _needs_refresh(self, kid: str) -> bool:
+        if time.time() >= self.expires_at:
+            return True
+        # an unknown key id usually means Google rotated keys, but don't let bad tokens hammer the endpoint
+        return kid not in self.keys and time.time() - self.refreshed_at > 60
+
+    async def _get_key(self, kid: str) -> RSAPublicKey | None:
+        if self._needs_refresh(kid):
+            async with self._refresh_lock:
+                # another request may have refreshed the keys while we waited
+                if self._needs_refresh(kid):
+                    await self.refresh()
+        return self.keys.get(kid)
+
+    async def verify(self, token: str) -> dict:
+        """
+        Checks the signature and claims of a token and returns its claims.
+        Raises jwt.InvalidTokenError if the token is not valid for this project.
+        """
+        header = jwt.get_unverified_header(token)
+        if header.get('alg') != 'RS256':
+            raise jwt.InvalidAlgorithmError("ID tokens must be signed with RS256")
+        key = await self._get_key(header.get('kid'))
+        if key is None:
+            raise jwt.InvalidTokenError("ID token was signed with an unknown key")
+
+        claims = jwt.decode(token, key,
+                            algorithms=['RS256'],
+                            audience=self.project_id,
+                            issuer=f"https://securetoken.google.com/{self.project_id}",
+                            leeway=self.leeway,
+                            options={'require': ['exp', 'iat', 'sub', 'aud', 'iss']})
+        if not claims['sub'] or len(claims['sub']) > 128:
+            raise jwt.InvalidTokenError("ID token has an invalid subject")
+        if claims.get('auth_time', 0) > time.time() + self.leeway:
+            raise jwt.ImmatureSignatureError("ID token has an auth_time in the future")
+        # match what firebase_admin returns
+        claims['uid'] = claims['sub']
+        return claims
+
+    def _refresh_delay(self) -> float:
+        # refresh a little before the keys expire so requests never see them stale
+        return max(self.expires_at - time.time() - 60, 60) if self.keys else 0
+
+    def start(self) -> None:
+        if self.key_file is None:
+            self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
@@ -0,0 +1,151 @@
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Callable, Any, Hashable
+import random, time
+
+@dataclass
+class _Mutation:
+    apply: Callable[[Any], Any]
+    future: Future = field(default_factory=Future)
+    queued_at: float = field(default_factory=time.monotonic)
+
+@dataclass
+class _Key:
+    pending: list[_Mutation] = field(default_factory=list)
+    # committing one round at a time means everything that arrives during a commit is merged into the next one
+    commit_lock: Lock = field(default_factory=Lock)
+    waiting: int = 0
+
+class WriteQueueMetrics:
+    """
+    Running totals for a WriteQueue.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self.batches = 0
+        self.mutations = 0
+        self.max_batch_size = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+
+    def record(self, batch: list[_Mutation], started_at: float) -> None:
+        with self._lock:
+            self.batches += 1
+            self.mutations += len(batch)
+            self.max_batch_size = max(self.max_batch_size, len(batch))
+            for mutation in batch:
+                delay = started_at - mutation.queued_at
+                self.total_delay += delay
+                self.max_delay = max(self.max_delay, delay)
+
+    def snapshot(self) -> dict:
+        """
+        Reads the totals. Safe to call from any thread.
+        """
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'mutations': self.mutations,
+                'mean_batch_size': self.mutations / self.batches if self.batches else 0,
+                'max_batch_size': self.max_batch_size,
+                'mean_delay_ms': 1000 * self.total_delay / self.mutations if self.mutations else 0,
+                'max_delay_ms': 1000 * self.max_delay,
+            }
+
+class WriteQueue:
+    """
+    Merges mutations of the same key that arrive within window seconds of each other, so they are written together.
+    The first caller for a key becomes the leader: it waits out the window, then hands everything queued for the key to its
+    commit function in one go. Each caller gets back its own result, or its own exception, through a future.
+
+    commit is given the queued mutations in order and must return one outcome per mutation,
+    either the value to hand back to that caller or the exception to raise in it.
+    """
+    def __init__(self, window: float):
+        self.window = window
+        self.metrics = WriteQueueMetrics()
+        self._keys: dict[Hashable, _Key] = {}
+        self._lock = Lock()
+
+    def run(self, key: Hashable, mutation: Callable[[Any], Any], commit: Callable[[list[Callable[[Any], Any]]], list]) -> Any:
+        """
+        Queues the mutation and blocks until the round it was merged into has been committed.
+        """
+        queued = _Mutation(mutation)
+        with self._lock:
+            state = self._keys.setdefault(key, _Key())
+            leader = len(state.pending) == 0
+            state.pending.append(queued)
+            state.waiting += 1
+
+        try:
+            if leader:
+                time.sleep(self.window)
+                with state.commit_lock:
+                    with self._lock:
+                        batch, state.pending = state.pending, []
+                    self._commit(batch, commit)
+            return queued.future.result()
+        finally:
+            with self._lock:
+                state.waiting -= 1
+                if state.waiting == 0:
+                    del self._keys[key]
+
+    def _commit(self, batch: list[_Mutation], commit: Callable[[list[Callable[[Any], Any]]], list]) -> None:
+        self.metrics.record(batch, time.monotonic())
+        try:
+            outcomes = commit([queued.apply for queued in batch])
+        except Exception as e:
+            for queued in batch:
+                queued.future.set_exception(e)
+            return
+        for queued, outcome in zip(batch, outcomes):
+            if isinstance(outcome, BaseException):
+                queued.future.set_exception(outcome)
+            else:
+                queued.future.set_result(outcome)
+
+class ContentionCounters:
+    """
+    Counts how often optimistic writes lose a race.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self.attempts = 0
+        self.conflicts = 0
+        self.exhausted = 0
+
+    def add(self, attempts: int = 0, conflicts: int = 0, exhausted: int = 0) -> None:
+        with self._lock:
+            self.attempts += attempts
+            self.conflicts += conflicts
+            self.exhausted += exhausted
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'attempts': self.attempts,
+                'conflicts': self.conflicts,
+                'exhausted': self.exhausted,
+                'conflict_rate': self.conflicts / self.attempts if self.attempts else 0,
+            }
+
+def retry_on_conflict(write: Callable[[], Any], conflict: tuple[type[BaseException], ...], counters: ContentionCounters,
+                      attempts: int = 5, base_delay: float = 0.02, max_delay: float = 0.5) -> Any:
+    """
+    Calls write until it doesn't raise one of the conflict exceptions, sleeping a random time up to an exponentially
+    growing cap between tries so that writers who collided don't collide again. Re-raises the last conflict once
+    attempts run out.
+    """
+    for attempt in range(attempts):
+        counters.add(attempts=1)
+        try:
+            return write()
+        except conflict:
+            counters.add(conflicts=1)
+            if attempt == attempts - 1:
+                counters.add(exhausted=1)
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))